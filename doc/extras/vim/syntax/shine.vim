@@ -18,6 +18,7 @@ syn keyword shineConfKey    backend
 
 syn keyword shineConfKey    storage_file
 syn keyword shineConfKey    status_dir
+syn keyword shineConfKey    mountdata_cache_ttl
 
 syn keyword shineConfKey    log_file
 syn keyword shineConfKey    log_level
@@ -28,6 +29,9 @@ syn keyword shineConfKey    command_path
 
 syn keyword shineConfKey    ssh_connect_timeout
 syn keyword shineConfKey    ssh_fanout
+syn keyword shineConfKey    ssh_pool
+syn keyword shineConfKey    agent_socket
+syn keyword shineConfKey    summary_threshold
 syn keyword shineConfKey    default_timeout
 syn keyword shineConfKey    start_timeout
 syn keyword shineConfKey    stop_timeout
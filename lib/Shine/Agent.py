@@ -0,0 +1,314 @@
+# Agent.py -- Persistent per-node shine agent
+# Copyright (C) 2013 CEA
+#
+# This file is part of shine
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+
+"""
+Persistent shine agent.
+
+Each remote call (shine <action> -R) normally starts a new Python
+interpreter, imports the whole Shine package, parses shine.conf and loads
+the filesystem configuration before doing any real work.
+
+The agent is a long-lived process, started with `shine agent', which keeps
+all of this loaded and listens on a local unix socket. When a remote call
+finds the agent socket (see SHINE_AGENT_ENV), the `shine' script only
+relays its command line to the agent, which forks a warm child to run it.
+The child output is sent back on the socket, followed by a trailer line
+carrying the command return code.
+
+If the agent is not running, the relay fails and the command is run the
+usual way.
+
+This module is imported before any other Shine module by the `shine' script,
+so it should only import standard modules at top level.
+"""
+
+import os
+import sys
+import errno
+import socket
+import signal
+
+# Environment variable set by proxy actions with the agent socket path.
+SHINE_AGENT_ENV = "SHINE_AGENT_SOCKET"
+
+# Last line sent by the agent, carrying the command return code.
+SHINE_AGENT_TRAILER = "SHINE-AGENT-RC:"
+
+# Return code used when the agent did not send its trailer.
+AGENT_RC_LOST = 16
+
+
+class AgentError(Exception):
+    """Error while setting up the shine agent."""
+
+
+def _pack_request(argv, env):
+    """Encode a command line and its environment for the agent."""
+    fields = ["%s=%s" % (key, val) for key, val in env.iteritems()]
+    data = "\0".join(argv) + "\n" + "\0".join(fields)
+    return "%d\n%s" % (len(data), data)
+
+def _unpack_request(sock):
+    """Read and decode a request written by _pack_request()."""
+    buf = ""
+    while not buf.endswith("\n"):
+        char = sock.recv(1)
+        if not char:
+            raise AgentError("Truncated agent request")
+        buf += char
+    length = int(buf)
+    data = ""
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            raise AgentError("Truncated agent request")
+        data += chunk
+
+    argv, fields = data.split("\n", 1)
+    env = {}
+    for field in fields.split("\0"):
+        if field:
+            key, val = field.split("=", 1)
+            env[key] = val
+    return argv.split("\0"), env
+
+def agent_relay(sockpath, argv, output=None):
+    """
+    Run command line `argv' through the agent listening on `sockpath'.
+
+    Command output is copied to `output' (default is stdout). Return the
+    command return code, or None if the agent could not be reached, so the
+    caller can run the command itself.
+    """
+    if output is None:
+        output = sys.stdout
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(sockpath)
+    except socket.error:
+        sock.close()
+        return None
+
+    rc = None
+    try:
+        # Only forward shine-related environment.
+        env = dict((key, val) for key, val in os.environ.iteritems()
+                   if key.startswith("SHINE_") and key != SHINE_AGENT_ENV)
+        sock.sendall(_pack_request(argv, env))
+        sock.shutdown(socket.SHUT_WR)
+
+        pending = ""
+        while True:
+            chunk = sock.recv(8192)
+            if not chunk:
+                break
+            lines = (pending + chunk).split("\n")
+            pending = lines.pop()
+            for line in lines:
+                if line.startswith(SHINE_AGENT_TRAILER):
+                    rc = int(line[len(SHINE_AGENT_TRAILER):])
+                else:
+                    output.write(line + "\n")
+            output.flush()
+        if pending:
+            output.write(pending)
+            output.flush()
+    finally:
+        sock.close()
+
+    # The agent accepted the command but did not report its end.
+    if rc is None:
+        rc = AGENT_RC_LOST
+    return rc
+
+
+class AgentServer(object):
+    """
+    Listen on a unix socket and run each received shine command line in a
+    child process forked from this warm process.
+    """
+
+    def __init__(self, sockpath):
+        self.sockpath = sockpath
+        self._sock = None
+
+    def preload(self):
+        """
+        Load everything which is common to all commands: Shine modules,
+        global configuration and installed filesystem configurations.
+        """
+        # pylint: disable-msg=W0612
+        from Shine.Controller import Controller
+        from Shine.Commands import COMMAND_LIST
+        from Shine.Configuration.Globals import Globals
+        from Shine.Configuration.FileSystem import FileSystem
+        from Shine.Lustre.Server import Server
+
+        # Commands are imported on demand: do it once for all children.
+        COMMAND_LIST.load_all()
+        Server.hostname_short()
+        FileSystem.enable_cache()
+        self.refresh()
+
+    def refresh(self):
+        """Reload filesystem configurations modified since last call."""
+        from Shine.Configuration.Globals import Globals
+        from Shine.Configuration.FileSystem import FileSystem
+        from Shine.Configuration.Exceptions import ConfigException
+        from Shine.Configuration.ModelFile import ModelFileValueError
+
+        xmfdir = os.path.expandvars(Globals().get_conf_dir())
+        if not os.path.isdir(xmfdir):
+            return
+        for filename in os.listdir(xmfdir):
+            fsname, ext = os.path.splitext(filename)
+            if fsname and ext == '.xmf':
+                try:
+                    FileSystem.load_from_fsname(fsname)
+                except (ConfigException, ModelFileValueError):
+                    # Let the command report the error itself.
+                    pass
+
+    def bind(self):
+        """Create the listening socket, only usable by its owner."""
+        if os.path.exists(self.sockpath):
+            # Do not steal the socket of a running agent.
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                try:
+                    probe.connect(self.sockpath)
+                except socket.error:
+                    os.unlink(self.sockpath)
+                else:
+                    raise AgentError("Agent already running on %s" %
+                                     self.sockpath)
+            finally:
+                probe.close()
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        oldmask = os.umask(0177)
+        try:
+            try:
+                self._sock.bind(self.sockpath)
+            except socket.error, exp:
+                raise AgentError("Cannot bind %s: %s" % (self.sockpath, exp))
+        finally:
+            os.umask(oldmask)
+        self._sock.listen(128)
+
+    def close(self):
+        """Close and remove the listening socket."""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            try:
+                os.unlink(self.sockpath)
+            except OSError:
+                pass
+
+    def reap(self):
+        """Wait for finished children, without blocking."""
+        while True:
+            try:
+                pid = os.waitpid(-1, os.WNOHANG)[0]
+            except OSError:
+                break
+            if pid == 0:
+                break
+
+    def serve_one(self):
+        """Accept one connection and fork a child to handle it."""
+        try:
+            conn = self._sock.accept()[0]
+        except socket.error, exp:
+            if exp.args[0] == errno.EINTR:
+                return
+            raise
+
+        self.refresh()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            self._sock.close()
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            rc = self._run_request(conn)
+            os._exit(rc)
+
+        conn.close()
+
+    def serve_forever(self):
+        """Handle connections until interrupted."""
+        signal.signal(signal.SIGCHLD, lambda signum, frame: self.reap())
+        try:
+            while True:
+                self.serve_one()
+        finally:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            self.close()
+
+    def _run_request(self, conn):
+        """Child side: run the received command with output on `conn'."""
+        try:
+            argv, env = _unpack_request(conn)
+        except (AgentError, ValueError):
+            return 1
+
+        os.environ.update(env)
+
+        # /proc files read by the warm process, or by a previous request
+        # before the fork, are stale.
+        from Shine.Lustre.ProcSnapshot import proc_snapshot
+        proc_snapshot().invalidate()
+
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.close(devnull)
+        os.dup2(conn.fileno(), 1)
+        os.dup2(conn.fileno(), 2)
+        sys.stdout = os.fdopen(1, 'w', 1)
+        sys.stderr = os.fdopen(2, 'w', 0)
+
+        try:
+            rc = self.handle(argv)
+        except SystemExit, exp:
+            rc = exp.code
+        except:
+            import traceback
+            traceback.print_exc()
+            rc = 1
+        if not isinstance(rc, int):
+            rc = int(rc is not None)
+
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.write(1, "%s%d\n" % (SHINE_AGENT_TRAILER, rc))
+        except (IOError, OSError):
+            pass
+        conn.close()
+        return 0
+
+    def handle(self, argv):
+        """Run a shine command line and return its return code."""
+        from Shine.Controller import Controller
+        sys.argv = argv
+        return Controller().run_command()
@@ -23,96 +23,12 @@ Helping method to format filesystem state for text output.
 """
 
 import sys
-from operator import attrgetter
 
 from Shine.Configuration.Globals import Globals
+from Shine.Lustre.Fields import DisplayError, COMP_FIELDS, map_field
 
 from Shine.CLI.TextTable import TextTable
 
-class DisplayError(Exception):
-    """An error prevent display to be done correctly."""
-
-(KILO, MEGA, GIGA, TERA) = (1024.0, 1024.0 ** 2, 1024.0 ** 3, 1024.0 ** 4)
-
-def _human_unit(value):
-    """
-    Format numerical ``value'' to display it using human readable unit like
-    (KB, MB, GB, ...).
-    """
-    if value >= TERA:
-        fmt = "%.1fTB" % (value / TERA)
-    elif value >= GIGA:
-        fmt = "%.1fGB" % (value / GIGA)
-    elif value >= MEGA:
-        fmt = "%.1fMB" % (value / MEGA)
-    elif value >= KILO:
-        fmt = "%.1fKB" % (value / KILO)
-    else:
-        fmt = "%d" % value
-    return fmt
-
-
-COMP_FIELDS = {
-
-        'fsname':  { 'supports': 'fs', 'getter': lambda comp: comp.fs.fs_name },
-        'label':   { 'supports': 'label', 'getter': attrgetter('label') },
-        'node':    { 'supports': 'server',
-                     'getter': lambda comp: str(comp.server.hostname) },
-        'servers': { 'supports': 'allservers',
-                     'getter': lambda comp: str(comp.allservers().nodeset()) },
-        'status':  { 'supports': 'text_status',
-                     'getter': lambda comp: comp.text_status() },
-        'statusonly': { 'supports': 'text_status',
-                     'getter': lambda comp: comp.text_statusonly() },
-        'type':    { 'supports': 'TYPE',
-                     'getter': lambda comp: comp.TYPE.upper()[0:3] },
-
-        # Target specific fields
-        'device':  { 'supports': 'dev', 'getter': attrgetter('dev') },
-        'flags':   { 'supports': 'flags',
-                     'getter': lambda tgt: ' '.join(tgt.flags()) },
-        'hanodes': { 'supports': 'failservers',
-                     'getter': lambda tgt: str(tgt.failservers.nodeset()) },
-        'index':   { 'supports': 'index',
-                     'getter': lambda tgt: str(tgt.index) },
-        'jdev':    { 'supports': 'journal',
-                     'getter': lambda tgt: tgt.journal and tgt.journal.dev },
-        'jsize':   { 'supports': 'journal',
-                     'getter': lambda tgt: tgt.journal and \
-                                           _human_unit(tgt.journal.dev_size) },
-        'network': { 'supports': 'network', 'getter': attrgetter('network') },
-        'size':    { 'supports': 'dev_size',
-                     'getter': lambda tgt: _human_unit(tgt.dev_size) },
-        'tag':     { 'supports': 'tag', 'getter': attrgetter('tag') },
-        'target':  { 'supports': 'get_id', 'getter': lambda tgt: tgt.get_id() },
-
-        # Client specific fields
-        'mntpath': { 'supports': 'mount_path',
-                     'getter': attrgetter('mount_path') },
-        'mntopts': { 'supports': 'mount_options',
-                     'getter': attrgetter('mount_options') },
-
-    }
-
-def map_field(comp, field, dash=True):
-    """
-    Map a field name to a component value, based on rules from COMP_FIELD.
-
-    Mapping, for a known but unsupported field for `comp', depends on `dash' value.
-    If dash is true, '-' is returned, otherwise an empty string is returned.
-
-    Raise DisplayError if field does not exist in COMP_FIELD.
-    """
-    if field not in COMP_FIELDS:
-        raise DisplayError("bad field name '%%%s'" % field)
-
-    if comp.capable(COMP_FIELDS[field]['supports']):
-        return COMP_FIELDS[field]['getter'](comp)
-    elif dash:
-        return '-'
-    else:
-        return ''
-
 def _get_fields(comp, fields):
     """
     Build a dict, with keys taken from ``fields'' and values based on
@@ -141,8 +57,8 @@ def table_fill(tbl, fs, sort_key=None, supports=None, viewsupports=None):
     grp_fields = pat_fields & set(('count', 'labels', 'nodes'))
     pat_fields.difference_update(grp_fields)
 
-    # Grouped by visible fields
-    comps = fs.components.managed(supports=supports)
+    # Grouped by visible fields. Client groups are split by state.
+    comps = fs.components.managed(supports=supports).unfold()
     if viewsupports is not None:
         comps = comps.filter(supports=viewsupports)
     def fieldvals(comp):
@@ -168,7 +84,7 @@ def table_fill(tbl, fs, sort_key=None, supports=None, viewsupports=None):
 
         # Get ComponentGroup fields
         if 'count' in grp_fields:
-            fields['count'] = str(len(compgrp))
+            fields['count'] = str(compgrp.instances())
         if 'labels' in grp_fields:
             fields['labels'] = str(compgrp.labels())
         if 'nodes' in grp_fields:
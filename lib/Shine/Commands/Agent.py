@@ -0,0 +1,73 @@
+# Agent.py -- Agent command
+# Copyright (C) 2013 CEA
+#
+# This file is part of shine
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+
+"""
+Shine `agent' command classes.
+
+Run a persistent shine agent on the local node, see Shine.Agent.
+"""
+
+import sys
+
+from Shine.Agent import AgentServer, AgentError
+from Shine.Configuration.Globals import Globals
+from Shine.Commands.Base.Command import Command, CommandException
+from Shine.Commands.Base.CommandRCDefs import RC_OK
+
+
+class Agent(Command):
+    """
+    shine agent
+    """
+
+    NAME = "agent"
+    DESCRIPTION = "Run a persistent agent for remote shine calls."
+
+    def execute(self):
+
+        # Option sanity check
+        self.forbidden(self.options.fsnames, "-f")
+        self.forbidden(self.options.model, "-m")
+        self.forbidden(self.options.labels, "-l")
+        self.forbidden(self.options.indexes, "-i")
+        self.forbidden(self.options.failover, "-F")
+
+        sockpath = Globals().get_agent_socket()
+        if not sockpath:
+            raise CommandException("agent_socket is not set in shine.conf")
+
+        server = AgentServer(sockpath)
+        try:
+            server.bind()
+        except AgentError, error:
+            raise CommandException(str(error))
+
+        server.preload()
+
+        if self.options.verbose > 1:
+            print "Shine agent listening on %s" % sockpath
+            sys.stdout.flush()
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+        return RC_OK
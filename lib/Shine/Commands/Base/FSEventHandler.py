@@ -26,7 +26,6 @@ import datetime
 
 from ClusterShell.Task import task_self
 
-from Shine.CLI.Display import display
 from Shine.Lustre.EventHandler import EventHandler as LustreEH
 from Shine.Lustre.FileSystem import INPROGRESS
 
@@ -151,6 +150,8 @@ class FSLocalEventHandler(LustreEH):
         SUMMARY is set for this command (True by default).
         """
         if self.SUMMARY and self.verbose > 0:
+            # Remote calls never display anything: load display code here.
+            from Shine.CLI.Display import display
             print display(self.command, fs, supports=self.fs_action)
 
     def post(self, fs):
@@ -201,7 +202,8 @@ class FSGlobalEventHandler(FSLocalEventHandler):
         header = self.command.NAME.capitalize()
         comps = self.fs.components.managed(supports=self.fs_action)
         self.log_verbose("%s of %d component(s) of %s on %s" %
-                         (header, len(comps), self.fs.fs_name, comps.servers()))
+                         (header, comps.instances(), self.fs.fs_name,
+                          comps.servers()))
 
     def pre(self, fs):
         FSLocalEventHandler.pre(self, fs)
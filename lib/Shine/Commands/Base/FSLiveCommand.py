@@ -28,9 +28,10 @@ from Shine.Commands.Base.Command import RemoteCommand, CommandHelpException
 
 # Command helper
 from Shine.FSUtils import open_lustrefs
+from Shine.Lustre.FileSystem import FileSystemGroup
 
 # Error handling
-from Shine.Commands.Base.CommandRCDefs import RC_RUNTIME_ERROR
+from Shine.Commands.Base.CommandRCDefs import RC_RUNTIME_ERROR, RC_FAILURE
 
 class FSLiveCommand(RemoteCommand):
     """
@@ -39,7 +40,10 @@ class FSLiveCommand(RemoteCommand):
     
     GLOBAL_EH = None
     LOCAL_EH = None
-    
+
+    # If True, all filesystems are processed at once, see execute_all().
+    CONCURRENT = False
+
     TARGET_STATUS_RC_MAP = { }
 
     def fs_status_to_rc(self, status):
@@ -66,48 +70,139 @@ class FSLiveCommand(RemoteCommand):
                                     nodes=self.options.nodes,
                                     excluded=self.options.excludes,
                                     labels=self.options.labels,
-                                    event_handler=eh)
+                                    event_handler=eh,
+                                    node_slice=self.options.remote,
+                                    lazy=True)
         return fs_conf, fs
 
-    def execute_fs(self, fs, fs_conf, eh, vlevel):
-        raise NotImplemented("Derived class must implement.")
-
-    def execute(self):
+    def prepare_fs(self, fs, fs_conf, eh):
+        """
+        Check and select the components of `fs' to run the command on, and
+        return them, or None if the command should not be run.
 
-        first = True
+        Used by CONCURRENT commands.
+        """
+        raise NotImplemented("Derived class must implement.")
 
-        # Option sanity check
-        self.forbidden(self.options.model, "-m, use -f")
+    def fs_action_args(self):
+        """Return the FileSystem action arguments of CONCURRENT commands."""
+        return {}
 
-        result = 0
+    def finish_fs(self, fs, fs_conf, eh, status, vlevel):
+        """
+        Report the command result `status' for `fs' and return its
+        return code.
 
-        self.init_execute()
+        Used by CONCURRENT commands.
+        """
+        raise NotImplemented("Derived class must implement.")
 
-        # Install appropriate event handler.
+    def execute_fs(self, fs, fs_conf, eh, vlevel):
+        if not self.CONCURRENT:
+            raise NotImplemented("Derived class must implement.")
+        comps = self.prepare_fs(fs, fs_conf, eh)
+        if comps is None:
+            return RC_FAILURE
+        status = getattr(fs, self.NAME)(comps, **self.fs_action_args())
+        return self.finish_fs(fs, fs_conf, eh, status, vlevel)
+
+    def _new_eventhandler(self):
+        """Create and install the event handler of one filesystem."""
         local_eh = None
         global_eh = None
         if self.LOCAL_EH:
             local_eh = self.LOCAL_EH(self)
         if self.GLOBAL_EH:
             global_eh = self.GLOBAL_EH(self)
-        eh = self.install_eventhandler(local_eh, global_eh)
+        return self.install_eventhandler(local_eh, global_eh)
 
-        for fsname in self.iter_fsname():
+    def execute_all(self, fsnames, eh):
+        """
+        Run a CONCURRENT command on all `fsnames' filesystems at once.
 
-            # Open configuration and instantiate a Lustre FS.
-            fs_conf, fs = self._open_fs(fsname, eh)
+        Their actions are all run in one task run loop and servers of several
+        filesystems run one remote command for all of them. Each filesystem
+        has its own event handler and its result is reported on its own,
+        like when filesystems are processed one after the other.
+        """
+        result = 0
+        vlevel = self.options.verbose
 
-            # Define debuggin level
+        opened = []
+        for fsname in fsnames:
+            # Local event handlers keep the filesystem they display.
+            if not self.options.remote and opened:
+                eh = self._new_eventhandler()
+            fs_conf, fs = self._open_fs(fsname, eh)
             fs.set_debug(self.options.debug)
+            opened.append((fs, fs_conf, eh))
+
+        selected = {}
+        for fs, fs_conf, fseh in opened:
+            comps = self.prepare_fs(fs, fs_conf, fseh)
+            if comps is None:
+                result = max(result, RC_FAILURE)
+            else:
+                selected[fs] = comps
+
+        status = {}
+        if selected:
+            group = FileSystemGroup([fs for fs, fs_conf, fseh in opened
+                                     if fs in selected])
+            status = getattr(group, self.NAME)(selected,
+                                               **self.fs_action_args())
 
+        first = True
+        for fs, fs_conf, fseh in opened:
+            if fs not in status:
+                continue
             # Separate each fsname with a blank line
             if not first:
                 print
             first = False
+            result = max(result, self.finish_fs(fs, fs_conf, fseh, status[fs],
+                                                vlevel))
+        return result
+
+    def execute(self):
+
+        first = True
+
+        # Option sanity check
+        self.forbidden(self.options.model, "-m, use -f")
+
+        result = 0
+
+        self.init_execute()
+
+        # Install appropriate event handler.
+        eh = self._new_eventhandler()
+
+        try:
+            fsnames = list(self.iter_fsname())
+            if self.CONCURRENT and len(fsnames) > 1:
+                return self.execute_all(fsnames, eh)
+
+            for fsname in fsnames:
+
+                # Open configuration and instantiate a Lustre FS.
+                fs_conf, fs = self._open_fs(fsname, eh)
+
+                # Define debuggin level
+                fs.set_debug(self.options.debug)
+
+                # Separate each fsname with a blank line
+                if not first:
+                    print
+                first = False
 
-            # Run the real job
-            vlevel = self.options.verbose
-            result = max(result, self.execute_fs(fs, fs_conf, eh, vlevel))
+                # Run the real job
+                vlevel = self.options.verbose
+                result = max(result, self.execute_fs(fs, fs_conf, eh, vlevel))
+        finally:
+            # Remote events could be batched, send the last ones.
+            if self.options.remote:
+                eh.flush()
 
         return result
 
@@ -125,7 +220,9 @@ class FSTargetLiveCommand(FSLiveCommand):
                                     failover=self.options.failover,
                                     indexes=self.options.indexes,
                                     labels=self.options.labels,
-                                    event_handler=eh)
+                                    event_handler=eh,
+                                    node_slice=self.options.remote,
+                                    lazy=True)
         return fs_conf, fs
 
 class FSTargetLiveCriticalCommand(FSTargetLiveCommand):
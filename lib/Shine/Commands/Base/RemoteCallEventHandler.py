@@ -18,25 +18,107 @@
 # Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
 #
 
+import os
 import sys
 
+from ClusterShell.Event import EventHandler as TimerHandler
+from ClusterShell.Task import task_self
+
 from Shine.Lustre.EventHandler import EventHandler
-from Shine.Lustre.Actions.Proxy import shine_msg_pack
+from Shine.Lustre.Actions.Proxy import shine_msg_pack, shine_msg_record, \
+                                       shine_msg_pack_v4, \
+                                       shine_msg_pack_summary, \
+                                       SHINE_MSG_ENV, SHINE_MSG_VERSION, \
+                                       SHINE_MSG_SUMMARY_ENV
 
 class RemoteCallEventHandler(EventHandler):
     """
     Special shine EventHandler installed when called with -R (remote
     call), which aims to serialize all events instead of printing human
     output.
+
+    If the caller supports it, events are sent using the compact protocol
+    version 4, and events raised in a short period of time are batched in
+    one message.
+
+    If the caller asks for a summary, all events are kept and sent in one
+    message when flush() is called, at the end of the command. This message
+    does not depend on the local node name, so the caller can gather the
+    nodes which sent the same one.
     """
 
+    # Maximum delay, in seconds, an event could wait before being sent.
+    BATCH_DELAY = 0.1
+    # Maximum number of events per message.
+    BATCH_SIZE = 256
+
+    def __init__(self, version=None, summary=None):
+        EventHandler.__init__(self)
+        if version is None:
+            try:
+                version = int(os.environ.get(SHINE_MSG_ENV, 3))
+            except ValueError:
+                version = 3
+        self.version = min(version, SHINE_MSG_VERSION)
+        if summary is None:
+            summary = os.environ.get(SHINE_MSG_SUMMARY_ENV) == '1'
+        # Summaries are only understood by version 4 callers.
+        self.summary = summary and self.version >= 4
+        self._schema = {}
+        self._pending = []
+        self._timer = None
+
     def event_callback(self, compname, action, status, **kwargs):
         """Convert each event it receives into an encoded line on stdout."""
         # For distant message, we do not need to send the node. It will
         # be extract from the incoming server name.
         if 'node' in kwargs:
             del kwargs['node']
-        msg = shine_msg_pack(compname=compname, action=action, status=status,
-                             **kwargs)
-        sys.stdout.write(msg)
-        sys.stdout.flush()
+
+        if self.version < 4:
+            msg = shine_msg_pack(compname=compname, action=action,
+                                 status=status, **kwargs)
+            sys.stdout.write(msg)
+            sys.stdout.flush()
+            return
+
+        # Component fields are read now, as they could change before the
+        # message is sent.
+        self._pending.append(shine_msg_record(self._schema, compname, action,
+                                              status, summary=self.summary,
+                                              **kwargs))
+        if self.summary:
+            return
+        elif len(self._pending) >= self.BATCH_SIZE:
+            self.flush()
+        elif self._timer is None:
+            # Do not prevent the task from ending, see flush().
+            self._timer = task_self().timer(self.BATCH_DELAY,
+                                            _FlushTimer(self), autoclose=True)
+
+    def flush(self):
+        """Send all pending events. Should be called before exiting."""
+        if self._timer is not None:
+            self._timer.invalidate()
+            self._timer = None
+        if self._pending:
+            if self.summary:
+                pack = shine_msg_pack_summary
+            else:
+                pack = shine_msg_pack_v4
+            sys.stdout.write(pack(self._schema, self._pending))
+            sys.stdout.flush()
+            self._schema = {}
+            self._pending = []
+
+
+class _FlushTimer(TimerHandler):
+    """ClusterShell timer handler flushing a RemoteCallEventHandler."""
+
+    def __init__(self, eventhandler):
+        TimerHandler.__init__(self)
+        self._eventhandler = eventhandler
+
+    def ev_timer(self, timer):
+        self._eventhandler._timer = None
+        self._eventhandler.flush()
@@ -20,7 +20,7 @@
 
 from Shine.Configuration.Globals import Globals 
 
-from Shine.FSUtils import create_lustrefs
+from Shine.FSUtils import create_lustrefs, install_lustrefs_slices
 from Shine.Lustre.FileSystem import FSRemoteError
 
 from Shine.Commands.Base.Command import Command, CommandHelpException
@@ -88,6 +88,8 @@ class Install(Command):
         # convenient this way...
         try:
             fs.install(fs_conf.get_cfg_filename()) 
+            # Remote calls only load what they need, see iter_node_slices()
+            install_lustrefs_slices(fs_conf, fs)
 
             tuning_conf = Globals().get_tuning_file()
             if tuning_conf:
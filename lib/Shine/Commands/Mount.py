@@ -80,7 +80,7 @@ class Mount(FSLiveCommand):
                 if vlevel > 0:
                     key = lambda c: c.state == MOUNTED
                     print "%s was successfully mounted on %s" % \
-                        (fs.fs_name, comps.filter(key=key).servers())
+                        (fs.fs_name, comps.unfold().filter(key=key).servers())
 
                 # Apply tuning after successful mount(s)
                 tuning = Tune.get_tuning(fs_conf)
@@ -73,7 +73,7 @@ class Remove(FSTargetLiveCriticalCommand):
             # warnings if filesystem is not OK.
             fs.status()
             for state, targets in \
-                fs.components.managed().groupby(attr='state'):
+                fs.components.managed().unfold().groupby(attr='state'):
 
                 # Mounted filesystem!
                 if state in [MOUNTED, RECOVERING]:
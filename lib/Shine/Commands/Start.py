@@ -26,6 +26,10 @@ of the filesystem targets on local or remote servers. It is available
 for any filesystems previously installed and formatted.
 """
 
+import os
+
+from ClusterShell.NodeSet import NodeSet
+
 from Shine.Commands.Tune import Tune
 
 # Command base class
@@ -39,6 +43,8 @@ from Shine.Commands.Base.FSEventHandler import FSGlobalEventHandler, \
 
 from Shine.Lustre.FileSystem import MOUNTED, RECOVERING, EXTERNAL, OFFLINE, \
                                     TARGET_ERROR, CLIENT_ERROR, RUNTIME_ERROR
+from Shine.Lustre.Component import ComponentGroup
+from Shine.Lustre.Actions.Proxy import SHINE_START_TUNE_ENV, TUNING_EVENT
 
 
 class Start(FSTargetLiveCommand):
@@ -79,30 +85,25 @@ class Start(FSTargetLiveCommand):
         if hasattr(eh, 'pre'):
             eh.pre(fs)
 
-        self.copy_tuning(fs, comps=comps)
+        # Remote servers also apply their tuning, if their tuning file is up
+        # to date. This saves a tuning file copy and a tune command.
+        tuning_digest = None
+        if not self.has_local_flag():
+            tuning_digest = Tune.get_tuning_digest()
 
         status = fs.start(mount_options=mount_options,
                           mount_paths=mount_paths,
                           addopts=self.options.additional,
                           failover=self.options.failover,
-                          mountdata=self.options.mountdata)
+                          mountdata=self.options.mountdata,
+                          tuning=tuning_digest)
 
         rc = self.fs_status_to_rc(status)
 
         if rc == RC_OK:
             if vlevel > 0:
                 print "Start successful."
-            tuning = Tune.get_tuning(fs_conf)
-            status = fs.tune(tuning, comps=comps)
-            if status == MOUNTED:
-                if vlevel > 1:
-                    print "Filesystem tuning applied on %s" % comps.servers()
-            elif status == TARGET_ERROR:
-                print "ERROR: Filesystem tuning failed"
-                rc = RC_RUNTIME_ERROR
-            elif status == RUNTIME_ERROR:
-                rc = RC_RUNTIME_ERROR
-            # XXX improve tuning on start error handling
+            rc = self._tune(fs, fs_conf, comps, vlevel)
         elif vlevel > 0:
             print "Tuning skipped."
 
@@ -113,3 +114,57 @@ class Start(FSTargetLiveCommand):
             eh.post(fs)
 
         return rc
+
+    def _tune(self, fs, fs_conf, comps, vlevel):
+        """
+        Apply tuning on the servers of started components `comps'.
+
+        Servers already tuned by their remote start command are skipped. The
+        others get the tuning file, if needed, and are tuned now.
+
+        When called remotely by a caller which asked for tuning (see
+        SHINE_START_TUNE_ENV), tuning is only applied if the local tuning
+        file is the caller one, and the caller is told about it.
+        """
+        expected = None
+        if self.options.remote:
+            expected = os.environ.get(SHINE_START_TUNE_ENV)
+            if expected is not None and \
+               expected != Tune.get_tuning_digest():
+                # Outdated tuning file, the caller will handle it.
+                return RC_OK
+
+        rc = RC_OK
+        tuned = set()
+        failed = fs.remote_tuning.get('failed', NodeSet())
+        for nodes in fs.remote_tuning.values():
+            tuned.update(nodes)
+        if len(failed) > 0:
+            print "ERROR: Filesystem tuning failed on %s" % failed
+            rc = RC_RUNTIME_ERROR
+        if tuned:
+            comps = ComponentGroup([comp for comp in comps
+                                    if comp.server.hostname not in tuned])
+            if len(comps) == 0:
+                return rc
+
+        self.copy_tuning(fs, comps=comps)
+        tuning = Tune.get_tuning(fs_conf)
+        status = fs.tune(tuning, comps=comps)
+        if status == MOUNTED:
+            if vlevel > 1:
+                print "Filesystem tuning applied on %s" % comps.servers()
+        elif status == TARGET_ERROR:
+            print "ERROR: Filesystem tuning failed"
+            rc = RC_RUNTIME_ERROR
+        elif status == RUNTIME_ERROR:
+            rc = RC_RUNTIME_ERROR
+        # XXX improve tuning on start error handling
+
+        if expected is not None:
+            if status == MOUNTED:
+                fs.local_event(TUNING_EVENT, 'tune', 'done')
+            else:
+                fs.local_event(TUNING_EVENT, 'tune', 'failed')
+
+        return rc
@@ -32,7 +32,7 @@ detailed states.
 from Shine.Commands.Base.FSLiveCommand import FSTargetLiveCommand
 from Shine.Commands.Base.CommandRCDefs import RC_ST_OFFLINE, RC_ST_EXTERNAL, \
                                               RC_ST_ONLINE, RC_ST_RECOVERING, \
-                                              RC_FAILURE, RC_TARGET_ERROR, \
+                                              RC_TARGET_ERROR, \
                                               RC_CLIENT_ERROR, RC_RUNTIME_ERROR
 
 # Lustre events and errors
@@ -62,12 +62,14 @@ class Status(FSTargetLiveCommand):
             CLIENT_ERROR : RC_CLIENT_ERROR,
             RUNTIME_ERROR : RC_RUNTIME_ERROR }
 
-    def execute_fs(self, fs, fs_conf, eh, vlevel):
+    CONCURRENT = True
+
+    def prepare_fs(self, fs, fs_conf, eh):
 
         # Warn if trying to act on wrong nodes
         all_nodes = fs.components.managed().servers()
         if not self.check_valid_list(fs.fs_name, all_nodes, "check"):
-            return RC_FAILURE
+            return None
 
         # Apply 'status' only to required components
         comps = fs.components
@@ -80,7 +82,12 @@ class Status(FSTargetLiveCommand):
         if hasattr(eh, 'pre'):
             eh.pre(fs)
 
-        fs_result = fs.status(comps, failover=self.options.failover)
+        return comps
+
+    def fs_action_args(self):
+        return {'failover': self.options.failover}
+
+    def finish_fs(self, fs, fs_conf, eh, fs_result, vlevel):
 
         if fs_result == RUNTIME_ERROR:
             self.display_proxy_errors(fs)
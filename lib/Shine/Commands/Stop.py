@@ -59,27 +59,27 @@ class Stop(FSTargetLiveCommand):
             CLIENT_ERROR : RC_CLIENT_ERROR,
             RUNTIME_ERROR : RC_RUNTIME_ERROR }
 
-    def execute_fs(self, fs, fs_conf, eh, vlevel):
-    
-        # Prepare options...
-        mount_options = {}
-        mount_paths = {}
-        for tgt_type in [ 'mgt', 'mdt', 'ost' ]:
-            mount_options[tgt_type] = fs_conf.get_target_mount_options(tgt_type)
-            mount_paths[tgt_type] = fs_conf.get_target_mount_path(tgt_type)
+    CONCURRENT = True
+
+    def prepare_fs(self, fs, fs_conf, eh):
 
         # Warn if trying to act on wrong nodes
-        servers = fs.components.managed(supports='stop').servers()
-        if not self.check_valid_list(fs.fs_name, servers, "stop"):
-            return RC_FAILURE
+        comps = fs.components.managed(supports='stop')
+        if not self.check_valid_list(fs.fs_name, comps.servers(), "stop"):
+            return None
 
         # Will call the handle_pre() method defined by the event handler.
         if hasattr(eh, 'pre'):
             eh.pre(fs)
-            
-        status = fs.stop(addopts=self.options.additional,
-                         failover=self.options.failover,
-                         mountdata=self.options.mountdata)
+
+        return comps
+
+    def fs_action_args(self):
+        return {'addopts': self.options.additional,
+                'failover': self.options.failover,
+                'mountdata': self.options.mountdata}
+
+    def finish_fs(self, fs, fs_conf, eh, status, vlevel):
 
         rc = self.fs_status_to_rc(status)
 
@@ -26,6 +26,10 @@ The tune command aims to apply tuning parameters on any components of a
 Lustre filesystem.
 """
 
+import os
+
+from ClusterShell.NodeSet import NodeSet
+
 from Shine.Configuration.Globals import Globals
 
 from Shine.Configuration.TuningModel import TuningModel
@@ -36,10 +40,13 @@ from Shine.Commands.Base.CommandRCDefs import RC_OK, RC_FAILURE, \
                                               RC_RUNTIME_ERROR
 
 from Shine.Lustre.FileSystem import RUNTIME_ERROR, MOUNTED
+from Shine.Lustre.Actions.Install import file_digest
+from Shine.Lustre.Actions.Proxy import SHINE_TUNE_PERSISTENT_ENV
+from Shine.Lustre.Actions.Tune import UNCHECKED_MARK
 
 
 class Tune(FSTargetLiveCommand):
-    """shine tune [-v]"""
+    """shine tune [-v] [--check]"""
 
     NAME = "tune"
     DESCRIPTION = "Tune file system servers."
@@ -66,10 +73,19 @@ class Tune(FSTargetLiveCommand):
         if not self.options.remote and vlevel > 1:
             print tuning
 
-        status = fs.tune(tuning, addopts=self.options.additional)
+        # Only an explicit tune sets persistent tunings, see Tune action.
+        persistent = not self.options.remote or \
+                     os.environ.get(SHINE_TUNE_PERSISTENT_ENV) == '1'
+        status = fs.tune(tuning, addopts=self.options.additional,
+                         check=self.options.check, persistent=persistent)
         if status == RUNTIME_ERROR:
             self.display_proxy_errors(fs)
             return RC_RUNTIME_ERROR
+        elif self.options.check:
+            # Remote differences are sent back with events.
+            if self.options.remote:
+                return RC_OK
+            return self.display_tuning_drift(fs)
         elif status == MOUNTED:
             print "Filesystem %s successfully tuned." % fs.fs_name
         else:
@@ -78,6 +94,40 @@ class Tune(FSTargetLiveCommand):
 
         return RC_OK
 
+    @classmethod
+    def display_tuning_drift(cls, fs):
+        """
+        Display the tuning values which differ, grouping the nodes with the
+        same differences, and return the command return code.
+
+        Values which could not be checked are displayed, but they are not
+        differences.
+        """
+        drift = NodeSet()
+        unchecked = NodeSet()
+        for msg, nodes in fs.tuning_drift.walk():
+            nodes = NodeSet.fromlist(nodes)
+            lines = str(msg).splitlines()
+            if [line for line in lines if UNCHECKED_MARK not in line]:
+                drift.update(nodes)
+            else:
+                unchecked.update(nodes)
+            print "%s (%d):" % (nodes, len(nodes))
+            for line in lines:
+                print "    %s" % line
+
+        if len(drift) == 0:
+            if len(unchecked) > 0:
+                print "Tuning of filesystem %s is up to date, except values " \
+                      "not checked on %d node(s): %s" % \
+                      (fs.fs_name, len(unchecked), unchecked)
+            else:
+                print "Tuning of filesystem %s is up to date." % fs.fs_name
+            return RC_OK
+        print "Tuning of filesystem %s differs on %d node(s): %s" % \
+              (fs.fs_name, len(drift), drift)
+        return RC_FAILURE
+
     @classmethod
     def get_tuning(cls, fs_conf):
         """
@@ -92,7 +142,7 @@ class Tune(FSTargetLiveCommand):
         # Is the tuning configuration file name specified?
         if Globals().get_tuning_file():
             # Load the tuning configuration file
-            tuning.parse(filename=Globals().get_tuning_file())
+            tuning.parse(filename=Globals().get_tuning_file(), compiled=True)
 
         # Add the quota tuning parameters to the tuning model.
         if Globals().lustre_version_is_smaller('2.4'):
@@ -100,6 +150,16 @@ class Tune(FSTargetLiveCommand):
 
         return tuning
 
+    @classmethod
+    def get_tuning_digest(cls):
+        """
+        Tune class method: return the digest of the tuning configuration
+        file, 'none' if there is no such file, or None if it cannot be read.
+        """
+        tuning_conf = Globals().get_tuning_file()
+        if not tuning_conf:
+            return 'none'
+        return file_digest(tuning_conf)
 
     @classmethod
     def _add_quota_tuning(cls, tunings, fs_conf):
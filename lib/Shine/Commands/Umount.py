@@ -56,18 +56,25 @@ class Umount(FSLiveCommand):
             CLIENT_ERROR : RC_CLIENT_ERROR,
             RUNTIME_ERROR : RC_RUNTIME_ERROR }
 
-    def execute_fs(self, fs, fs_conf, eh, vlevel):
+    CONCURRENT = True
+
+    def prepare_fs(self, fs, fs_conf, eh):
 
         # Warn if trying to act on wrong nodes
         comps = fs.components.managed(supports='umount')
         if not self.check_valid_list(fs.fs_name, comps.servers(), "unmount"):
-            return RC_FAILURE
+            return None
 
         # Will call the handle_pre() method defined by the event handler.
         if hasattr(eh, 'pre'):
             eh.pre(fs)
 
-        status = fs.umount(addopts=self.options.additional)
+        return comps
+
+    def fs_action_args(self):
+        return {'addopts': self.options.additional}
+
+    def finish_fs(self, fs, fs_conf, eh, status, vlevel):
 
         rc = self.fs_status_to_rc(status)
 
@@ -75,8 +82,9 @@ class Umount(FSLiveCommand):
             if rc == RC_OK:
                 if vlevel > 0:
                     key = lambda c: c.state == OFFLINE
+                    comps = fs.components.managed(supports='umount')
                     print "%s was successfully unmounted on %s" % \
-                        (fs.fs_name, comps.filter(key=key).servers())
+                        (fs.fs_name, comps.unfold().filter(key=key).servers())
             elif rc == RC_RUNTIME_ERROR:
                 self.display_proxy_errors(fs)
 
@@ -28,7 +28,8 @@ from Shine.Commands.Base.Command import Command, CommandHelpException
 from Shine.Commands.Base.CommandRCDefs import RC_OK, RC_FAILURE
 
 from Shine.FSUtils import open_model, open_lustrefs, create_lustrefs, \
-                          convert_comparison, instantiate_lustrefs
+                          convert_comparison, instantiate_lustrefs, \
+                          install_lustrefs_slices
 
 from Shine.Commands.Base.FSEventHandler import FSGlobalEventHandler
 
@@ -160,12 +161,17 @@ class Update(Command):
                 raise CannotApplyError(actiontxt, "those servers")
 
 
-    def _copy(self, fs, conf_file):
-        """Install a configuration on needed nodes."""
+    def _copy(self, fs, conf_file, fs_conf=None):
+        """
+        Install a configuration on needed nodes, and the node slices of
+        `fs_conf' if provided.
+        """
         
         try:
             self.__verbose("Update configuration file: %s" % conf_file)
             fs.install(conf_file)
+            if fs_conf:
+                install_lustrefs_slices(fs_conf, fs)
         except FSRemoteError, error:
             self.__warning("Due to error, configuration update skipped on %s" \
                % error.nodes)
@@ -320,7 +326,7 @@ class Update(Command):
         # Update with new conf
         # Note: For user convenience, we always copy configuration, this could
         # help when nodes are misinstalled.
-        self._copy(newfs, newconf.get_cfg_filename())
+        self._copy(newfs, newconf.get_cfg_filename(), newconf)
         if Globals().get_tuning_file():
             self._copy(newfs, Globals().get_tuning_file())
 
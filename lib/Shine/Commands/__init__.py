@@ -24,9 +24,45 @@
 # List of enabled commands classes.
 # ----------------------------------------------------------------------
 
-COMMAND_LIST = {}
+class CommandRegistry(object):
+    """
+    Command classes, by command name.
 
-for cmd in [ "Show",
+    Each command module is only imported when its class is first requested,
+    so running a command does not load the code of all the others.
+    """
+
+    def __init__(self, modules):
+        # Command name -> module and class name
+        self._modules = modules
+        self._classes = {}
+
+    def __contains__(self, name):
+        return name in self._modules
+
+    def __iter__(self):
+        return iter(self._modules)
+
+    def __len__(self):
+        return len(self._modules)
+
+    def __getitem__(self, name):
+        cls = self._classes.get(name)
+        if cls is None:
+            modname = self._modules[name]
+            # Import command class file
+            mod = __import__(modname, globals(), locals(), [modname])
+            cls = self._classes[name] = getattr(mod, modname)
+        return cls
+
+    def load_all(self):
+        """Import all command classes."""
+        for name in self._modules:
+            self[name]
+
+
+COMMAND_LIST = CommandRegistry(dict((cmd.lower(), cmd) for cmd in [
+             "Show",
              "Config",
              "List",
              "Install",
@@ -41,11 +77,5 @@ for cmd in [ "Show",
              "Umount",
              "Tune",
              "Tunefs",
-             "Execute"]:
-
-    # Import command class file
-    mod = __import__(cmd, globals(), locals(), [cmd])
-
-    # Add class to global command list
-    cls = getattr(mod, cmd)
-    COMMAND_LIST[cls.NAME] = cls
+             "Execute",
+             "Agent"]))
@@ -0,0 +1,125 @@
+# Compiled.py -- Compiled cache of configuration files
+# Copyright (C) 2013 CEA
+#
+# This file is part of shine
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+
+"""
+Compiled cache of configuration files.
+
+Parsing and validating a big configuration file is done again by each shine
+command, on each node. Once validated, its content could be saved, as Python
+built-in objects, in a compiled file next to it and loaded back with one
+marshal call.
+
+A compiled file is only used if it was written by the same shine and Python
+versions, for a source file with the same path, size and modification time.
+Otherwise, it is ignored and should be written again.
+"""
+
+import os
+import sys
+import stat
+import marshal
+import tempfile
+
+import Shine
+
+# Appended to the source file path to name its compiled file.
+COMPILED_SUFFIX = 'c'
+
+
+class CompiledFile(object):
+    """
+    Compiled cache of the file `filename'.
+
+    Cache errors are never fatal: an unreadable or outdated compiled file is
+    seen as missing and a compiled file which cannot be written is skipped.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.path = filename + COMPILED_SUFFIX
+        self._stamp = None
+
+    def _source_stamp(self):
+        """Return what identifies the current source file content."""
+        try:
+            srcstat = os.stat(self.filename)
+        except OSError:
+            return None
+        return (os.path.abspath(self.filename), srcstat.st_size,
+                srcstat.st_mtime, Shine.__version__, sys.hexversion)
+
+    def load(self):
+        """
+        Return data saved for the current source file, or None if there is
+        no such data.
+
+        This should be called before reading the source file, so a later
+        save() is not recorded for a source file modified meanwhile.
+        """
+        self._stamp = self._source_stamp()
+        if self._stamp is None:
+            return None
+        try:
+            fobj = open(self.path, 'rb')
+            try:
+                stamp, data = marshal.load(fobj)
+            finally:
+                fobj.close()
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+        if stamp != self._stamp:
+            return None
+        return data
+
+    def save(self, data):
+        """
+        Atomically write `data' for the source file seen by load().
+
+        `data' should only contain built-in objects supported by marshal.
+        """
+        if self._stamp is None:
+            return
+        dirname, basename = os.path.split(self.path)
+        try:
+            fd, tmppath = tempfile.mkstemp(prefix='.%s.' % basename,
+                                           dir=dirname or '.')
+        except (IOError, OSError):
+            return
+        try:
+            fobj = os.fdopen(fd, 'wb')
+            try:
+                marshal.dump((self._stamp, data), fobj)
+            finally:
+                fobj.close()
+            mode = stat.S_IMODE(os.stat(self.filename).st_mode)
+            os.chmod(tmppath, mode)
+            os.rename(tmppath, self.path)
+        except (IOError, OSError, ValueError):
+            try:
+                os.unlink(tmppath)
+            except OSError:
+                pass
+
+    def remove(self):
+        """Remove the compiled file, if any."""
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -31,9 +31,9 @@ class Configuration:
         self._fs = None
 
     @classmethod
-    def load_from_cache(cls, fsname):
+    def load_from_cache(cls, fsname, node_slice=False):
         conf = Configuration()
-        conf._fs = FileSystem.load_from_fsname(fsname)
+        conf._fs = FileSystem.load_from_fsname(fsname, node_slice)
         return conf
 
     @classmethod
@@ -130,6 +130,21 @@ class Configuration:
             opts = clnt.get_mount_options() or self.get_default_mount_options()
             yield clnt.get_nodes(), path, opts
 
+    def iter_client_groups(self):
+        """
+        Iterate over (nodes, mount_path, mount_options), gathering in one
+        NodeSet all the client nodes with the same mount path and options.
+        """
+        groups = {}
+        order = []
+        for node, path, opts in self.iter_clients():
+            if (path, opts) not in groups:
+                groups[(path, opts)] = []
+                order.append((path, opts))
+            groups[(path, opts)].append(node)
+        for path, opts in order:
+            yield NodeSet.fromlist(groups[(path, opts)]), path, opts
+
     def iter_routers(self):
         """
         Iterate over (node)
@@ -150,6 +165,18 @@ class Configuration:
         """
         return self._fs.xmf_path
 
+    def get_slice_filename(self):
+        """
+        Return FS node slice file path.
+        """
+        return FileSystem._slice_path(self.get_fs_name())
+
+    def iter_node_slices(self, nodes):
+        """
+        Iterate over (node, content) of the configuration slices of `nodes'.
+        """
+        return self._fs.iter_node_slices(nodes)
+
     def get_description(self):
         return self._fs.get('description')
 
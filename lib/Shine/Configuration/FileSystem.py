@@ -19,10 +19,12 @@
 #
 
 import copy
+import gc
 import os
 
 from Shine.Configuration.Globals import Globals
 from Shine.Configuration.Model import Model
+from Shine.Configuration.Compiled import CompiledFile
 from Shine.Configuration.Exceptions import ConfigInvalidFileSystem, \
                                            ConfigDeviceNotFoundError, \
                                            ConfigException
@@ -37,7 +39,15 @@ class ModelFileIOError(ConfigException):
 class Target:
     def __init__(self, type, cf_target):
         self.type = type
-        self.dic = cf_target.as_dict()
+        self._cf_target = cf_target
+        self._dic = None
+
+    @property
+    def dic(self):
+        """Target configuration as a dict, only built when needed."""
+        if self._dic is None:
+            self._dic = self._cf_target.as_dict()
+        return self._dic
 
     def get(self, key, default=None):
         return self.dic.get(key, default)
@@ -75,11 +85,13 @@ class Target:
     def get_jdev_size(self):
         return self.dic.get('jsize')
 
+    # Index and group are read for each target by filters, do not build the
+    # whole dict for them.
     def get_index(self):
-        return int(self.dic.get('index', 0))
+        return int(self._cf_target.get('index', 0))
 
     def get_group(self):
-        return self.dic.get('group')
+        return self._cf_target.get('group')
     
     def get_mode(self):
         return self.dic.get('mode', 'managed')
@@ -134,14 +146,20 @@ class FileSystem(object):
     Lustre File System Configuration class.
     """
 
-    def __init__(self, filename):
+    # In-memory cache of loaded configurations, see enable_cache().
+    _cache = None
+
+    def __init__(self, filename, compiled=False):
 
         self.backend = None
         self.xmf_path = None
         self.model = Model()
 
         try:
-            self.model.load(filename)
+            if compiled:
+                self._load_compiled(filename)
+            else:
+                self.model.load(filename)
         except IOError:
             raise ModelFileIOError("Could not read %s" % filename)
 
@@ -152,6 +170,31 @@ class FileSystem(object):
         # is provided
         self.tuning_model = TuningModel()
 
+    def _load_compiled(self, filename):
+        """
+        Load model from the compiled cache of `filename', and parse it only
+        if it is missing or outdated. The cache is then written again.
+        """
+        compiled = CompiledFile(filename)
+        data = compiled.load()
+        if data is not None:
+            # Restoring creates many objects but no reference cycles, do
+            # not let the garbage collector run again and again meanwhile.
+            gcenabled = gc.isenabled()
+            gc.disable()
+            try:
+                try:
+                    self.model.restore(data)
+                    return
+                except (KeyError, TypeError, ValueError, AttributeError):
+                    self.model = Model()
+            finally:
+                if gcenabled:
+                    gc.enable()
+
+        self.model.load(filename)
+        compiled.save(self.model.dump())
+
     @property
     def fs_name(self):
         return self.get('fs_name')
@@ -169,6 +212,11 @@ class FileSystem(object):
                                   fs_conf_dir)
         return "%s/%s.xmf" % (os.path.normpath(fs_conf_dir), fsname)
 
+    @classmethod
+    def _slice_path(cls, fsname):
+        """Build a node slice file path from filesystem name."""
+        return "%s.sxmf" % os.path.splitext(cls._cache_path(fsname))[0]
+
     @classmethod
     def create_from_model(cls, lmf, update_mode=False):
         """Save to cache."""
@@ -185,14 +233,106 @@ class FileSystem(object):
         return cls.load_from_fsname(fsmodel.fs_name)
 
     @classmethod
-    def load_from_fsname(cls, fsname):
-        """Load from cache."""
-        conf_file = cls._cache_path(fsname)
-        fsconf = FileSystem(conf_file)
-        fsconf.xmf_path = conf_file
+    def enable_cache(cls):
+        """
+        Keep configurations loaded by load_from_fsname() in memory.
+
+        A cached configuration is reused as long as its file is not modified.
+        This is only useful for long-lived processes, like shine agent.
+        """
+        if cls._cache is None:
+            cls._cache = {}
+
+    @classmethod
+    def load_from_fsname(cls, fsname, node_slice=False):
+        """
+        Load from cache.
+
+        If `node_slice' is True, the node slice of the configuration is
+        loaded instead, if it is installed and not older than the full one.
+        """
+        xmf_file = cls._cache_path(fsname)
+        conf_file = xmf_file
+        if node_slice:
+            slice_file = cls._slice_path(fsname)
+            try:
+                if os.stat(slice_file).st_mtime >= \
+                   os.stat(xmf_file).st_mtime:
+                    conf_file = slice_file
+            except OSError:
+                pass
+
+        if cls._cache is not None:
+            try:
+                stat = os.stat(conf_file)
+                stamp = (stat.st_ino, stat.st_size, stat.st_mtime)
+            except OSError:
+                stamp = None
+            if stamp and cls._cache.get(conf_file, (None,))[0] == stamp:
+                return cls._cache[conf_file][1]
+
+        fsconf = FileSystem(conf_file, compiled=True)
+        fsconf.xmf_path = xmf_file
+
+        if cls._cache is not None and stamp:
+            cls._cache[conf_file] = (stamp, fsconf)
         return fsconf
 
 
+    # Model elements only needed by the nodes they are declared on.
+    NODE_ELEMENTS = ('mdt', 'ost', 'client', 'router')
+
+    def iter_node_slices(self, nodes):
+        """
+        Iterate over (node, content) for each node of `nodes', where content
+        is the text of a configuration file with only what this node needs:
+        its own targets, clients and routers, the MGT, all filesystem-wide
+        settings, and the NIDs of the nodes all of these are declared on.
+
+        A node slice is loaded by shine commands called remotely (-R) on a
+        node, as its size does not depend on the filesystem size.
+        """
+        common = []
+        common_nodes = set()
+        per_node = {}
+        for key, value in self.model.iteritems():
+            if key == 'nid_map':
+                continue
+            line = "%s%s%s" % (key, self.model._sep, value)
+            if key not in self.NODE_ELEMENTS:
+                common.append(line)
+            if key not in self.NODE_ELEMENTS + ('mgt',):
+                continue
+
+            elemnodes = [value.get('node')]
+            if value.is_element('ha_node'):
+                elemnodes += value.get('ha_node', [])
+            if key == 'mgt':
+                common_nodes.update(elemnodes)
+            else:
+                for node in elemnodes:
+                    per_node.setdefault(node, []).append((line, elemnodes))
+
+        for node in nodes:
+            lines = list(common)
+            needed = set(common_nodes)
+            needed.add(node)
+            for line, elemnodes in per_node.get(node, []):
+                lines.append(line)
+                needed.update(elemnodes)
+            for nidnode in sorted(needed):
+                try:
+                    nids = self.nid_map[nidnode]
+                except KeyError:
+                    # Full configuration will not load either.
+                    continue
+                for nid in nids:
+                    lines.append("nid_map%snodes=%s nids=%s" %
+                                 (self.model._sep, nidnode, nid))
+            header = "# Shine Lustre file system config slice of %s for %s" \
+                     % (self.fs_name, node)
+            yield node, "%s\n%s\n" % (header, "\n".join(lines))
+
     def _start_backend(self):
         """
         Load and start backend subsystem once
@@ -473,6 +613,11 @@ class FileSystem(object):
 
         if not result:
             os.unlink(self.xmf_path)
+            CompiledFile(self.xmf_path).remove()
+            slice_file = self._slice_path(self.fs_name)
+            if os.path.exists(slice_file):
+                os.unlink(slice_file)
+            CompiledFile(slice_file).remove()
 
         return result
 
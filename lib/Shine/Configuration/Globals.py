@@ -65,6 +65,8 @@ class Globals(object):
                     default='/etc/shine/storage.conf')
             self.add_element('status_dir',          check='path',
                     default='/var/cache/shine/status')
+            self.add_element('mountdata_cache_ttl', check='digit',
+                    default=600)
 
             # Config dirs
             self.add_element('conf_dir',            check='path',
@@ -78,6 +80,11 @@ class Globals(object):
                     default=30)
             self.add_element('ssh_fanout',          check='digit',
                     default=0)
+            self.add_element('ssh_pool',            check='boolean',
+                    default=False)
+            self.add_element('agent_socket',        check='path')
+            self.add_element('summary_threshold',   check='digit',
+                    default=32)
             self.add_element('default_timeout',     check='digit',
                     default=30)
 
@@ -128,6 +135,9 @@ class Globals(object):
         def get_status_dir(self):
             return self.get('status_dir')
 
+        def get_mountdata_cache_ttl(self):
+            return self.get('mountdata_cache_ttl')
+
         def get_conf_dir(self):
             return self.get('conf_dir')
 
@@ -143,6 +153,15 @@ class Globals(object):
         def get_ssh_fanout(self):
             return self.get('ssh_fanout')
 
+        def get_ssh_pool(self):
+            return self.get('ssh_pool')
+
+        def get_agent_socket(self):
+            return self.get('agent_socket')
+
+        def get_summary_threshold(self):
+            return self.get('summary_threshold')
+
 
 class DefaultElement(SimpleElement):
     """
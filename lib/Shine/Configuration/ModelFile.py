@@ -64,7 +64,12 @@ class SimpleElement(object):
 
     def emptycopy(self):
         """Return a new empty copy of this element, with the same attributes."""
-        return type(self)(self._check, self._default, self._values)
+        # Do not call __init__(), this is done for each element of each
+        # loaded line.
+        newone = object.__new__(type(self))
+        newone.__dict__.update(self.__dict__)
+        newone._content = None
+        return newone
 
     def copy(self):
         """Return a deep copy of an SimpleElement."""
@@ -111,6 +116,10 @@ class SimpleElement(object):
         """
         return self.get()
 
+    def dump(self):
+        """Return the raw element content, see ModelFile.dump()."""
+        return self._content
+
     def diff(self, other):
         """
         Compare this SimpleElement with another one and return a tuple with 3
@@ -199,6 +208,10 @@ class SimpleElement(object):
         """
         self.add(data)
 
+    def restore(self, data):
+        """Set content from dump() output, without validation."""
+        self._content = data
+
 
 class MultipleElement(object):
     """
@@ -266,6 +279,10 @@ class MultipleElement(object):
         """
         return [elem.as_dict() for elem in self.elements()]
 
+    def dump(self):
+        """Return a list of all element dump(), see ModelFile.dump()."""
+        return [elem.dump() for elem in self.elements()]
+
     def diff(self, other):
         """Compare a MultipleElement with another one.
 
@@ -342,6 +359,13 @@ class MultipleElement(object):
             newone.parse(data)
             self._elements.append(newone)
 
+    def restore(self, data):
+        """Add new elements from dump() output, without validation."""
+        for item in data:
+            newone = self._origelem.emptycopy()
+            newone.restore(item)
+            self._elements.append(newone)
+
     def replace(self, value):
         """Replace current content with `value'."""
         self.clear()
@@ -382,12 +406,12 @@ class ModelFile(object):
 
     def emptycopy(self):
         """Return a new empty copy of this element, with the same attributes."""
-        newone = type(self)(self._sep, self._linesep)
-        # Some elements could be defined in __init__, or added manually.
-        # Add what's missing
-        missing = set(self.elements()) - set(newone.elements())
-        for name in missing:
-            newone.add_custom(name, self.elements()[name].emptycopy())
+        # Elements could be defined in __init__, or added manually. Copy
+        # them all, without calling __init__() which is slow.
+        newone = object.__new__(type(self))
+        newone.__dict__.update(self.__dict__)
+        newone._elements = dict((name, elem.emptycopy())
+                                for name, elem in self._elements.iteritems())
         return newone
 
     def copy(self):
@@ -554,6 +578,23 @@ class ModelFile(object):
         return dict([(key, self._elements[key].as_dict())
             for key in self.iterkeys()])
 
+    def dump(self):
+        """Return the content of all elements, using only Python built-in
+        objects.
+
+        Unlike as_dict(), default values are not included. The result
+        could be saved, with marshal for instance, and given back to
+        restore() to rebuild this content without parsing nor validating it
+        again.
+        """
+        return dict([(key, self._elements[key].dump())
+            for key in self.iterkeys()])
+
+    def restore(self, data):
+        """Set elements content from dump() output, without validation."""
+        for key, value in data.iteritems():
+            self._elements[key].restore(value)
+
     def parse(self, data):
         """Parse @data based on separators and declared elements."""
         for line in data.split(self._linesep):
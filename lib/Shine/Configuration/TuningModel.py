@@ -30,12 +30,23 @@ import glob
 from ClusterShell.NodeSet import NodeSet
 
 from Shine.Configuration.Exceptions import ConfigException
+from Shine.Configuration.Compiled import CompiledFile
 
 NODE_TYPES = set(['mgs', 'mds', 'oss', 'client', 'router'])
 TYPE_ALIASES = {
     'clt': 'client',
     'rtr': 'router',
 }
+_SUPPORTED_TYPES = NODE_TYPES | set(TYPE_ALIASES)
+
+# Lustre parameter paths, see TuningParameter.lctl_name()
+_LUSTRE_PATHS = ('/proc/fs/lustre/', '/sys/fs/lustre/')
+
+# Tuning values written as is by echo, without shell expansion nor echo
+# options.
+_PLAIN_VALUE_RE = re.compile(r'^[^-\s"\'$`\\*?[\]{}()<>|&;~#!]'
+                             r'[^\s"\'$`\\*?[\]{}()<>|&;~]*$')
+_QUOTED_VALUE_RE = re.compile(r'^"((?:[^-"$`\\!][^"$`\\!]*)?)"$')
 
 class TuningError(ConfigException):
     """
@@ -53,16 +64,23 @@ class TuningParameter(object):
         - a value
         - a tuning parameter name
         - a list of node type or node name
+
+    A persistent parameter is not applied on each node but once, on the MGS,
+    with 'lctl set_param -P', for all nodes.
     """
     
-    def __init__(self, name, value, node_types=None, node_list=None):
+    def __init__(self, name, value, node_types=None, node_list=None,
+                 persistent=False):
         self.name = name
         self.value = value
+        self.persistent = persistent
         self._node_types = set()
 
         self.node_types = node_types or set()
         self.node_list = NodeSet()
-        if node_list is not None:
+        if isinstance(node_list, NodeSet):
+            self.node_list = node_list
+        elif node_list is not None:
             self.node_list = NodeSet.fromlist(node_list)
 
     def _get_node_types(self):
@@ -77,7 +95,8 @@ class TuningParameter(object):
 
     def __eq__(self, other):
         return other.name == self.name and other.node_types == self.node_types \
-            and other.value == self.value and other.node_list == self.node_list
+            and other.value == self.value and other.node_list == self.node_list \
+            and other.persistent == self.persistent
 
     def __str__(self):
         output = "%s=%s" % (self.name, self.value)
@@ -85,12 +104,12 @@ class TuningParameter(object):
             output += " types=%s" % ",".join(self.node_types)
         if self.node_list:
             output += " nodes=%s" % self.node_list
+        if self.persistent:
+            output += " persistent"
         return output
-        
-    def build_tuning_command(self, fs_name):
-        """
-        This function aims to apply the tuning parameter to the local node
-        """
+
+    def _substitute(self, fs_name):
+        """Return the parameter name with variables of `fs_name'."""
         path_pattern = self.name
         
         # Replace variables in the command string
@@ -100,15 +119,61 @@ class TuningParameter(object):
         path_pattern = path_pattern.replace("${ost}", "%s-OST" % fs_name)
         path_pattern = path_pattern.replace("${mdt}", "%s-MDT" % fs_name)
         path_pattern = path_pattern.replace("${fsname}", "%s" % fs_name)
-                    
+        return path_pattern
+
+    def lctl_name(self, fs_name):
+        """
+        Return the 'lctl set_param' name of this parameter, for file system
+        `fs_name', or None if it is not a Lustre parameter.
+
+        Parameter could be a Lustre path (ie: /proc/fs/lustre/osc/*/foo) or
+        already a lctl name (ie: osc.*.foo).
+        """
+        name = self._substitute(fs_name)
+        for prefix in _LUSTRE_PATHS:
+            if name.startswith(prefix):
+                return name[len(prefix):].replace('/', '.')
+        if name.startswith('/'):
+            return None
+        return name
+        
+    def build_tuning_paths(self, fs_name, snapshot=None):
+        """
+        Return the list of local files this tuning parameter applies to,
+        for file system `fs_name'.
+
+        If `snapshot' is set (see Shine.Lustre.ProcSnapshot), directories
+        are listed through its cache.
+        """
+        if snapshot is None:
+            return glob.glob(self._substitute(fs_name))
+        return snapshot.glob(self._substitute(fs_name))
+
+    def build_tuning_command(self, fs_name, snapshot=None):
+        """
+        This function aims to apply the tuning parameter to the local node
+        """
         # Walk through path list and create a command for each one
         command_list = []
-        for path in glob.glob(path_pattern):
+        for path in self.build_tuning_paths(fs_name, snapshot):
             command_list.append("echo %s > %s" % (self.value, path))
 
         # Return the newly created commands to the caller
         return command_list
 
+    def file_value(self):
+        """
+        Return the content written to tuning files, like the commands of
+        build_tuning_command() do, or None if the value needs a shell to be
+        interpreted.
+        """
+        value = str(self.value)
+        match = _QUOTED_VALUE_RE.match(value)
+        if match:
+            return "%s\n" % match.group(1)
+        if _PLAIN_VALUE_RE.match(value):
+            return "%s\n" % value
+        return None
 
 
 class TuningModel:
@@ -123,13 +188,25 @@ class TuningModel:
         alias <alias_name>=<tuning_file_path>
         
     A tuning configuration is of the following form::
-        "<string value>"    <alias_name>     <node_type>[,<node_type>]+
+        [persistent] "<string value>"    <alias_name>     <node_type>[,<node_type>]+
+
+    Parameters are indexed by node type and by node name when they are
+    added, so the parameters of a node are found without testing all of
+    them. A parsed tuning file could be saved with its index in a compiled
+    cache, next to it, see parse().
     """
     
     def __init__(self, filename=None):
         self.filename = filename
         self.aliases = {}
         self._parameter_dict = {}
+        # All parameters, in creation order, and their position in this
+        # list, by node type and by node name. Persistent parameters are
+        # not indexed, they are only applied on the MGS.
+        self._parameters = []
+        self._type_index = {}
+        self._node_index = {}
+        self._persistent = []
 
     def convert_parameter_aliases(self, check=True):
         """
@@ -149,19 +226,36 @@ class TuningModel:
                 else:
                     param.name = self.aliases[name]
         
-    def parse(self, filename=None):
+    def parse(self, filename=None, compiled=False):
         """
         Function called to parse the content of the tuning configuratio file
         and store the configuration in the object.
+
+        If `compiled' is set, the compiled cache of the file is used if it is
+        up to date, or written again.
         """
+        filename = filename or self.filename
+        cache = None
+        data = None
+        if compiled:
+            cache = CompiledFile(filename)
+            data = cache.load()
+        if data is not None:
+            try:
+                self.restore(data)
+                return
+            except (KeyError, TypeError, ValueError, IndexError):
+                self.__init__(self.filename)
+
         # Build the patterns to retrieve alias and parameter declaration
         alias_re = re.compile("alias\s+(\S+)\s*=\s*(\S+)$")
-        parameter_re = re.compile('("[^"]+"|\S+)\s+(\S+)\s+(\S+)$')
-        supported = NodeSet.fromlist(list(NODE_TYPES) + TYPE_ALIASES.keys())
+        parameter_re = re.compile('(?:(persistent)\s+)?'
+                                  '("[^"]+"|\S+)\s+(\S+)\s+(\S+)$')
+        supported = NodeSet.fromlist(_SUPPORTED_TYPES)
 
         # Open the file to read each lines
         try:
-            tuning_file = open(filename or self.filename)
+            tuning_file = open(filename)
 
             for line in tuning_file.readlines():
 
@@ -180,10 +274,24 @@ class TuningModel:
 
                 elif m_param:
                     # This line is a parameter instanciation
-                    nodes = NodeSet.fromlist(
-                                           m_param.group(3).lower().split(';'))
-                    self.create_parameter(m_param.group(2), m_param.group(1),
-                                          nodes & supported, nodes - supported)
+                    # Node types are simple words, only node names need a
+                    # NodeSet.
+                    words = m_param.group(4).lower().split(';')
+                    types = [word for word in words
+                             if word in _SUPPORTED_TYPES]
+                    names = [word for word in words
+                             if word not in _SUPPORTED_TYPES]
+                    nodes = None
+                    if names:
+                        nodes = NodeSet.fromlist(names)
+                        types += list(nodes & supported)
+                        nodes.difference_update(supported)
+                    if m_param.group(1) and nodes:
+                        raise TuningError("Persistent tuning '%s' could not "
+                                          "be set for nodes" % line)
+                    self.create_parameter(m_param.group(3), m_param.group(2),
+                                          types, nodes,
+                                          bool(m_param.group(1)))
 
                 else:
                     # This line is not recognized
@@ -197,7 +305,45 @@ class TuningModel:
 
         # Call the alias to full name convertion function
         self.convert_parameter_aliases()
-        
+
+        for param in self.get_persistent_params():
+            if param.lctl_name('') is None:
+                raise TuningError("Persistent tuning '%s' is not a Lustre "
+                                  "parameter" % param.name)
+
+        if cache is not None:
+            cache.save(self.dump())
+
+    def dump(self):
+        """
+        Return the aliases, parameters and index of this model, as built-in
+        objects, see restore().
+        """
+        params = [(param.name, param.value, list(param.node_types),
+                   str(param.node_list), param.persistent)
+                  for param in self._parameters]
+        return {'aliases': self.aliases, 'params': params,
+                'types': self._type_index, 'nodes': self._node_index,
+                'persistent': self._persistent}
+
+    def restore(self, data):
+        """
+        Add aliases and parameters from dump() output, without validation.
+        """
+        self.aliases.update(data['aliases'])
+        first = len(self._parameters)
+        for name, value, types, nodes, persistent in data['params']:
+            param = TuningParameter(name, value, types, NodeSet(nodes or None),
+                                    persistent)
+            self._parameter_dict.setdefault(name, []).append(param)
+            self._parameters.append(param)
+        for index, dumped in ((self._type_index, data['types']),
+                              (self._node_index, data['nodes'])):
+            for key, positions in dumped.iteritems():
+                index.setdefault(key, []).extend([first + pos
+                                                  for pos in positions])
+        self._persistent.extend([first + pos for pos in data['persistent']])
+
     def __str__(self):
         """
         Function used to build the string representation of the TuningModel
@@ -220,31 +366,37 @@ class TuningModel:
         This function returns a list of tuning parameters that must be applied :
             -  to the node named <node_named>
             -  to the node of type stored in node_type
+
+        `node_name' could be a node set: node name parameters should apply
+        to all its nodes.
         """
-        # Initialize thelist of tuning parameter that mus be applied to
-        # the node identified by the node_name and the node_type
-        params = []
-
-        # Walk through the list of tuning parameters
-        for parameters in self._parameter_dict.values():
-
-            # Walk through the list of parameters to identify the one that must
-            # be applied to the considered node.
-            for parameter in parameters:
-
-                # Is the node type one of the type supported by this tuning
-                # parameter?
-                if set(node_type) & parameter.node_types:
-                    # Save the parameter to the list that will be returned
-                    params.append(parameter)
-
-                # Is the node name in the node name list of the tuning
-                # parameter?
-                elif node_name in parameter.node_list:
-                    # Save the parameter to the list that will be returned
-                    params.append(parameter)
-        
-        return params
+        positions = set()
+        for nodetype in node_type:
+            positions.update(self._type_index.get(nodetype, ()))
+
+        if node_name is not None:
+            common = None
+            for node in NodeSet(node_name):
+                found = self._node_index.get(node, ())
+                if common is None:
+                    common = set(found)
+                else:
+                    common.intersection_update(found)
+                if not common:
+                    break
+            positions.update(common or ())
+
+        positions = list(positions)
+        positions.sort()
+        return [self._parameters[pos] for pos in positions]
+
+    def get_persistent_params(self):
+        """
+        Return the list of persistent tuning parameters, which should be
+        applied once, on the MGS. They are not returned by
+        get_params_for_name().
+        """
+        return [self._parameters[pos] for pos in self._persistent]
         
     def _add_parameter(self, new_parameter):
         """
@@ -277,8 +429,20 @@ class TuningModel:
         # If the tuning parameter is already known add a value to the list
         self._parameter_dict[new_parameter.name].append(new_parameter)
 
+        # Index it by node type and node name
+        position = len(self._parameters)
+        self._parameters.append(new_parameter)
+        if new_parameter.persistent:
+            self._persistent.append(position)
+            return
+        for nodetype in new_parameter.node_types:
+            self._type_index.setdefault(nodetype, []).append(position)
+        for node in new_parameter.node_list:
+            self._node_index.setdefault(node, []).append(position)
+
     def create_parameter(self, parameter_name, parameter_value,
-                         node_type_list=None, node_name_list=None):
+                         node_type_list=None, node_name_list=None,
+                         persistent=False):
         """
         Function used to create a new tuning parameter and add it to the tuning
         configuration model. 
@@ -289,7 +453,8 @@ class TuningModel:
         """
         # Create the new parameter by using given parameters.
         new_parameter = TuningParameter(parameter_name, parameter_value,
-                                        node_type_list, node_name_list)
+                                        node_type_list, node_name_list,
+                                        persistent)
 
         # Register the parameter in the tuning configuration model
         self._add_parameter(new_parameter)
@@ -30,13 +30,14 @@ from Shine.Configuration.Globals import Globals
 from Shine.Configuration.ModelFile import ModelFileValueError
 from Shine.Configuration.Exceptions import ConfigException
 
-from Shine.CLI.Display import DisplayError
+from Shine.Lustre.Fields import DisplayError
 from Shine.Commands import COMMAND_LIST
 from Shine.Commands.Base.Command import CommandHelpException, CommandException
 from Shine.Commands.Base.CommandRCDefs import RC_RUNTIME_ERROR
 
 from Shine.Lustre.FileSystem import FSRemoteError
 from Shine.Lustre.Component import ComponentError
+from Shine.SshPool import SshPool
 
 from ClusterShell.Task import task_self
 from ClusterShell.NodeSet import NodeSet, NodeSetException, NodeSetParseError, \
@@ -192,6 +193,9 @@ class Controller:
                           choices=['auto', 'never', 'always'], default='auto',
                           help="analyze target mountdata (never, always"
                                " or auto)", metavar='WHEN')
+        parser.add_option("--check", dest="check", action="store_true",
+                          help="only report differences, do not change"
+                               " anything (tune)")
         # Parse command line
         (options, args) = parser.parse_args()
 
@@ -238,38 +242,49 @@ class Controller:
 
         (options, args, cmdname) = self.handle_options()
 
+        # Remote calls do not run ssh commands themselves.
+        pool = None
+        if Globals().get_ssh_pool() and not options.remote:
+            pool = SshPool(task_self())
+            pool.enable()
+
         try:
+            try:
 
-            # Execute and filter rc
-            command = COMMAND_LIST[cmdname](options, args)
-            rc = command.filter_rc(command.execute())
-
-        except CommandHelpException, error:
-            self.print_error(error)
-
-        # Command exceptions
-        except DisplayError, error:
-            self.print_error(error)
-        except CommandException, error:
-            self.print_error(error)
-
-        # Configuration exceptions
-        except ConfigException, error:
-            self.print_error("Configuration - %s" % error)
-        except ModelFileValueError, error:
-            self.print_error(error)
-
-        # File system exceptions
-        except FSRemoteError, error:
-            self.print_error(error)
-            rc = error.rc
-        except [ComponentError, NodeSetParseError, RangeSetParseError], error:
-            self.print_error(error)
-
-        # Special error
-        except KeyboardInterrupt:
-            print >> sys.stderr, "Exiting."
-            rc = 0
+                # Execute and filter rc
+                command = COMMAND_LIST[cmdname](options, args)
+                rc = command.filter_rc(command.execute())
+
+            except CommandHelpException, error:
+                self.print_error(error)
+
+            # Command exceptions
+            except DisplayError, error:
+                self.print_error(error)
+            except CommandException, error:
+                self.print_error(error)
+
+            # Configuration exceptions
+            except ConfigException, error:
+                self.print_error("Configuration - %s" % error)
+            except ModelFileValueError, error:
+                self.print_error(error)
+
+            # File system exceptions
+            except FSRemoteError, error:
+                self.print_error(error)
+                rc = error.rc
+            except [ComponentError, NodeSetParseError,
+                    RangeSetParseError], error:
+                self.print_error(error)
+
+            # Special error
+            except KeyboardInterrupt:
+                print >> sys.stderr, "Exiting."
+                rc = 0
+        finally:
+            if pool is not None:
+                pool.close()
 
         # Avoid BrokenPipe error if stdout is closed before we exit
         try:
@@ -18,26 +18,35 @@
 # Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
 #
 
+import os
+import shutil
+import tempfile
 
 from ClusterShell.NodeSet import NodeSet, RangeSet
 
 from Shine.Configuration.Configuration import Configuration
 
-from Shine.Lustre.FileSystem import FileSystem, MGT, MDT, OST, Client, Router
+from Shine.Lustre.FileSystem import FileSystem, MGT, MDT, OST, Router
 from Shine.Lustre.Component import ComponentGroup
 from Shine.Lustre.Server import Server
 
+TARGET_CLASSES = {MGT.TYPE: MGT, MDT.TYPE: MDT, OST.TYPE: OST}
+
 
 def _create_comp(fs_conf, fs, comp):
 
     comp_type = comp.get_type()
     newcomp = None
-    server = Server(comp.get_nodename(), fs_conf.get_nid(comp.get_nodename()))
     if comp_type == 'client':
-        newcomp = Client(fs, server,
-               comp.get_mount_path() or fs_conf.get_default_mount_path(),
-               comp.get_mount_options() or fs_conf.get_default_mount_options())
-    elif comp_type == 'mgt':
+        # Clients are in groups, move this one in its own group.
+        mount_path = comp.get_mount_path() or fs_conf.get_default_mount_path()
+        group = fs.client_group(comp.get_nodename(), mount_path)
+        if len(group.server.hostname) == 1:
+            return group
+        return group.carve(comp.get_nodename())
+
+    server = _get_servers(comp.get_nodename(), fs_conf)
+    if comp_type == 'mgt':
         newcomp = MGT(fs, server, comp.get_index(), comp.get_dev(),
                       comp.get_jdev())
     elif comp_type == 'mdt':
@@ -62,24 +71,49 @@ def convert_comparison(fsconf, fs, actions):
     return ComponentGroup((_create_comp(fsconf, fs, elem) for elem in actions))
 
 
-_SERVERS = {}
 def _get_servers(nodename, fs_conf):
-    """Instantiate Server and cache them in _SERVERS"""
-    if nodename not in _SERVERS:
-        _SERVERS[nodename] = Server(nodename, fs_conf.get_nid(nodename))
-    return _SERVERS[nodename]
+    """Return the shared Server instance of `nodename'."""
+    return Server.get(nodename, fs_conf.get_nid(nodename))
+
+def _create_target(fs, fs_conf, cf_target, enabled):
+    """Create the target from `cf_target' configuration, and its servers."""
+    server = _get_servers(cf_target.get_nodename(), fs_conf)
+    target = fs.new_target(server, cf_target.get_type(),
+                           cf_target.get_index(), cf_target.get_dev(),
+                           cf_target.get_jdev(), cf_target.get_group(),
+                           cf_target.get_tag(), enabled,
+                           cf_target.get_mode(), cf_target.get_network())
+
+    # add failover hosts
+    for ha_node in cf_target.ha_nodes():
+        server = _get_servers(ha_node, fs_conf)
+        target.add_server(server)
+
+    return target
 
 def instantiate_lustrefs(fs_conf, target_types=None, nodes=None, excluded=None,
         failover=None, indexes=None, labels=None, groups=None,
-        event_handler=None):
+        event_handler=None, lazy=False):
     """
     Instantiate shine Lustre filesystem classes from configuration.
+
+    If `lazy' is True, targets which are disabled by `target_types',
+    `indexes', `groups' or `labels' are only created when needed, see
+    LazyComponentGroup.
     """
     # Arguments interpretation
     assert indexes is None or isinstance(indexes, RangeSet)
     assert labels is None or isinstance(labels, NodeSet)
 
-    _SERVERS.clear()
+    # NodeSet membership tests parse their argument each time, use sets
+    # for per-target tests.
+    if labels is not None:
+        labels = set(labels)
+    nodeset = excludedset = None
+    if nodes is not None:
+        nodeset = set(nodes)
+    if excluded is not None:
+        excludedset = set(excluded)
 
     # Create file system instance
     fs = FileSystem(fs_conf.get_fs_name(), event_handler)
@@ -87,66 +121,63 @@ def instantiate_lustrefs(fs_conf, target_types=None, nodes=None, excluded=None,
     # Create attached file system targets...
     for cf_target in fs_conf.iter_targets():
 
-        server = _get_servers(cf_target.get_nodename(), fs_conf)
-
         # retrieve config variables
         cf_t_type = cf_target.get_type()
-        cf_t_mode = cf_target.get_mode()
         cf_t_index = cf_target.get_index()
-        cf_t_dev = cf_target.get_dev()
-        cf_t_jdev = cf_target.get_jdev()
         cf_t_group = cf_target.get_group()
-        cf_t_tag = cf_target.get_tag()
-        cf_t_net = cf_target.get_network()
+        label = TARGET_CLASSES[cf_t_type].build_label(fs.fs_name, cf_t_index)
 
-        # filter on target types, indexes, groups and nodes
+        # filter on target types, indexes, groups and labels
         target_action_enabled = True
         if (target_types is not None and cf_t_type not in target_types) or \
            (indexes is not None and cf_t_index not in indexes) or \
            (groups is not None and \
-            (cf_t_group is None or cf_t_group not in groups)):
+            (cf_t_group is None or cf_t_group not in groups)) or \
+           (labels is not None and label not in labels):
             target_action_enabled = False
 
-        target = fs.new_target(server, cf_t_type, cf_t_index, cf_t_dev,
-                               cf_t_jdev, cf_t_group, cf_t_tag,
-                               target_action_enabled, cf_t_mode, cf_t_net)
+        # MGT is always needed, for its NIDs.
+        if lazy and not target_action_enabled and cf_t_type != MGT.TYPE:
+            fs.components.defer(label, _create_target, fs, fs_conf,
+                                cf_target, False)
+            continue
 
-        # Now the device is instanciated, we could check label name
-        if labels is not None and target.label not in labels:
-            target.action_enabled = False
-
-        # add failover hosts
-        for ha_node in cf_target.ha_nodes():
-            server = _get_servers(ha_node, fs_conf)
-            target.add_server(server)
+        target = _create_target(fs, fs_conf, cf_target, target_action_enabled)
 
         # Change current server if failover nodes are used.
         if failover and len(failover) and target.action_enabled:
             target.action_enabled = target.failover(failover)
 
         # Now that server is set, check explicit nodes and exclusion
-        if (nodes is not None and target.server.hostname not in nodes) or \
-           (excluded is not None and target.server.hostname in excluded):
+        if (nodeset is not None and target.server.hostname not in nodeset) or \
+           (excludedset is not None and target.server.hostname in excludedset):
             target.action_enabled = False
 
 
-    # Create attached file system clients...
-    for client_node, mount_path, mount_options in fs_conf.iter_clients():
-        server = _get_servers(client_node, fs_conf)
-
-        # filter on target types and nodes
-        client_action_enabled = True
+    # Create attached file system clients, in groups of nodes...
+    client_label = "%s-client" % fs.fs_name
+    for client_nodes, mount_path, mount_options in \
+                                            fs_conf.iter_client_groups():
+        # filter on target types, labels and nodes
+        enabled = NodeSet(client_nodes)
         if (target_types is not None and 'client' not in target_types) or \
-            (nodes is not None and server.hostname not in nodes) or \
-            (excluded is not None and server.hostname in excluded):
-            client_action_enabled = False
-
-        client = fs.new_client(server, mount_path, mount_options, \
-                               client_action_enabled)
-
-        # Now the device is instanciated, we could check label name
-        if (labels is not None and client.label not in labels):
-            client.action_enabled = False
+           (labels is not None and client_label not in labels):
+            enabled = NodeSet()
+        if nodes is not None:
+            enabled.intersection_update(nodes)
+        if excluded is not None:
+            enabled.difference_update(excluded)
+
+        # The local node has its own group, to be handled locally.
+        local = enabled.intersection(Server.hostname_short())
+        local.update(enabled.intersection(Server.hostname_long()))
+        enabled.difference_update(local)
+
+        for grpnodes, grpenabled in ((local, True), (enabled, True),
+                                     (client_nodes - enabled - local, False)):
+            if len(grpnodes) > 0:
+                fs.new_client_group(grpnodes, mount_path, mount_options,
+                                    grpenabled)
 
     # Create attached file system routers...
     for router_node in fs_conf.iter_routers():
@@ -155,8 +186,8 @@ def instantiate_lustrefs(fs_conf, target_types=None, nodes=None, excluded=None,
         # filter on target types and nodes
         router_action_enabled = True
         if (target_types is not None and 'router' not in target_types) or \
-            (nodes is not None and server.hostname not in nodes) or \
-            (excluded is not None and server.hostname in excluded):
+            (nodeset is not None and server.hostname not in nodeset) or \
+            (excludedset is not None and server.hostname in excludedset):
             router_action_enabled = False
 
         router = fs.new_router(server, router_action_enabled)
@@ -184,19 +215,54 @@ def create_lustrefs(fs_model_file, event_handler=None, nodes=None,
     return fs_conf, fs
 
 
+def install_lustrefs_slices(fs_conf, fs, servers=None):
+    """
+    Install on each server its slice of the filesystem configuration, see
+    Configuration.iter_node_slices().
+
+    Like fs.install(), it raises a FSRemoteError if it fails on some
+    servers.
+    """
+    if servers is None:
+        servers = fs.components.managed().allservers()
+    slice_file = fs_conf.get_slice_filename()
+    distant = Server.distant_servers(servers)
+
+    tmpdir = tempfile.mkdtemp(prefix='shine-slices-')
+    try:
+        slices = {}
+        for node, content in fs_conf.iter_node_slices(servers):
+            if node in distant:
+                slices[node] = os.path.join(tmpdir, node)
+                path = slices[node]
+            else:
+                path = slice_file
+            fobj = open(path, 'w')
+            fobj.write(content)
+            fobj.close()
+
+        if slices:
+            fs.install_slices(slices, slice_file)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
 def open_lustrefs(fs_name, target_types=None, nodes=None, excluded=None,
           failover=None, indexes=None, labels=None, groups=None,
-          event_handler=None):
+          event_handler=None, node_slice=False, lazy=False):
     """
     Helper function used to build an instantiated Lustre.FileSystem
     from installed shine configuration.
+
+    If `node_slice' is True, only the local node slice of the configuration
+    is loaded, when available. See instantiate_lustrefs() for `lazy'.
     """
     # Create file system configuration
-    fs_conf = Configuration.load_from_cache(fs_name)
+    fs_conf = Configuration.load_from_cache(fs_name, node_slice)
 
     fs = instantiate_lustrefs(fs_conf, target_types, nodes, excluded,
                               failover, indexes, labels, groups,
-                              event_handler)
+                              event_handler, lazy)
 
     return fs_conf, fs
 
@@ -28,19 +28,18 @@ An action must inherits from one of the base Action class.
 import os
 import time
 import re
+from collections import deque
 from string import Template
 
 from ClusterShell.Event import EventHandler
 from ClusterShell.Task import task_self
 
 from Shine.Configuration.Globals import Globals
+from Shine.Lustre.ProcSnapshot import proc_snapshot
+from Shine.Lustre.Disk import flush_mountdata_cache
 
 from Shine.Lustre import ComponentError
-
-# XXX: This is not really good to import stuff from CLI in Actions. This part
-# of Display should be generalized in some kind of Utility module and imported
-# in Display and Action.
-from Shine.CLI.Display import map_field
+from Shine.Lustre.Fields import map_field
 
 # Action possible states
 ACT_WAITING = 0
@@ -100,6 +99,74 @@ class Action(EventHandler):
         """Compute the action whole duration."""
         self.duration = time.time() - self.start
 
+class ActionEngine(object):
+    """
+    Run a graph of CommonAction.
+
+    Each action counts its dependencies which are not yet finished. When an
+    action ends, the counters of the actions following it are decremented
+    and the ones reaching zero are queued. Actions are launched from this
+    ready queue, each one only once, without any recursion in the graph.
+    """
+
+    def __init__(self):
+        self._ready = deque()
+        self._draining = False
+
+    def request(self, action):
+        """Ask `action' to be run, after all its dependencies."""
+        stack = [action]
+        while stack:
+            action = stack.pop()
+            if action.status() != ACT_WAITING or action._requested:
+                continue
+            action._requested = True
+            stack.extend(dep for dep in action.deps
+                         if dep.status() == ACT_WAITING)
+            self._queue_if_ready(action)
+        self._drain()
+
+    def done(self, action):
+        """`action' reached a final state, release the actions after it."""
+        for follower in action.followers:
+            follower._dep_done(action)
+            # A finished action also launches the ones depending on it.
+            if not follower._requested:
+                self.request(follower)
+            else:
+                self._queue_if_ready(follower)
+        self._drain()
+
+    def _queue_if_ready(self, action):
+        """Queue `action' if it is waiting for nothing else."""
+        if action._requested and not action._queued and \
+           action._pending == 0 and action.status() == ACT_WAITING:
+            action._queued = True
+            self._ready.append(action)
+
+    def _drain(self):
+        """Launch ready actions, unless this is already being done."""
+        if self._draining:
+            return
+        self._draining = True
+        try:
+            while self._ready:
+                action = self._ready.popleft()
+                action._queued = False
+                if action.status() != ACT_WAITING:
+                    continue
+                if action._dep_failed:
+                    action.set_status(ACT_ERROR)
+                else:
+                    action.set_status(ACT_RUNNING)
+                    action._launch()
+        finally:
+            self._draining = False
+
+# Engine running all actions of this process.
+_ENGINE = ActionEngine()
+
+
 class CommonAction(Action):
     """
     Abstract class representing an Action with graph dependency features.
@@ -114,14 +181,33 @@ class CommonAction(Action):
         self.followers = set()
         self._status = ACT_WAITING
 
+        # Graph engine states, see ActionEngine.
+        self._requested = False
+        self._queued = False
+        self._pending = 0
+        self._dep_failed = False
+
     def depends_on(self, other):
         """
         Add a dependency on `other'.
 
         This action should not be launched before `other' is run with success.
         """
+        if other in self.deps:
+            return
         self.deps.add(other)
         other.followers.add(self)
+        if other.status() == ACT_ERROR:
+            self._dep_failed = True
+        elif other.status() != ACT_OK:
+            self._pending += 1
+
+    def _dep_done(self, other):
+        """Dependency `other' reached a final state."""
+        if other in self.deps:
+            self._pending -= 1
+            if other.status() == ACT_ERROR:
+                self._dep_failed = True
 
     def status(self):
         """Return current action status."""
@@ -133,11 +219,11 @@ class CommonAction(Action):
 
         If this is a final state, try to launch actions depending on it.
         """
+        was_final = self._status in (ACT_OK, ACT_ERROR)
         self._status = status
         # If it is a final states, propagate in the graph
-        if self._status in (ACT_OK, ACT_ERROR):
-            for action in self.followers:
-                action.launch()
+        if self._status in (ACT_OK, ACT_ERROR) and not was_final:
+            _ENGINE.done(self)
 
     def _launch(self):
         """
@@ -147,49 +233,13 @@ class CommonAction(Action):
         """
         raise NotImplemented()
 
-    def _graph_ok(self, actions):
+    def launch(self):
         """
-        Return True if dependencies in action list are OK.
+        Run the action, after its dependencies which are launched if needed.
 
-        Return False if
-         - the group is not in WAITING state.
-         - one of them is waiting and launch it
-         - one of them is still running
-         - one of them is in error. This group is set in ERROR too.
+        If one of them is in error, this action is set in error too.
         """
-
-        # If I'm no more waiting, no need to be launched twice
-        if self.status() != ACT_WAITING:
-            return False
-
-        # If some deps are not yet run, launch them!
-        waiting = [dep for dep in actions if dep.status() == ACT_WAITING]
-        if waiting:
-            for dep in waiting:
-                dep.launch()
-            return False
-
-        # If all my deps are not in final state, wait
-        running = [dep for dep in actions if dep.status() == ACT_RUNNING]
-        if running:
-            return False
-
-        # If some deps are in error, I'm too
-        error = [dep for dep in actions if dep.status() == ACT_ERROR]
-        if error:
-            self.set_status(ACT_ERROR)
-            return False
-
-        return True
-
-    def launch(self):
-        """Check dependencies and run the action."""
-
-        if not self._graph_ok(self.deps):
-            return
-
-        self.set_status(ACT_RUNNING)
-        self._launch()
+        _ENGINE.request(self)
 
     def ev_close(self, worker):
         """
@@ -214,11 +264,18 @@ class ActionGroup(CommonAction):
     """
     Group several CommonAction to create a common entity which could be used
     inside a graph of CommonAction or ActionGroup.
+
+    Members are launched once group dependencies are OK. The group is OK when
+    all of them are.
     """
 
     def __init__(self, task=task_self()):
         CommonAction.__init__(self, task)
-        self._members = set()
+        self._members = []
+        self._member_set = set()
+        self._started = False
+        self._members_pending = 0
+        self._member_failed = False
 
     def __len__(self):
         """Number or group members."""
@@ -230,21 +287,94 @@ class ActionGroup(CommonAction):
 
     def add(self, action):
         """Add an action to this group."""
-        self._members.add(action)
+        if action in self._member_set:
+            return
+        self._members.append(action)
+        self._member_set.add(action)
         # Add a half-dependency
         action.followers.add(self)
+        if action.status() == ACT_ERROR:
+            self._member_failed = True
+        elif action.status() != ACT_OK:
+            self._members_pending += 1
+
+    def _dep_done(self, other):
+        """A dependency or a member reached a final state."""
+        if other in self._member_set:
+            self._members_pending -= 1
+            if other.status() == ACT_ERROR:
+                self._member_failed = True
+            self._check_members()
+        else:
+            CommonAction._dep_done(self, other)
 
-    def launch(self):
-        """Check dependencies and run the action."""
+    def _check_members(self):
+        """Set group final status if all members are done."""
+        if self._started and self._members_pending == 0:
+            if self._member_failed:
+                self.set_status(ACT_ERROR)
+            else:
+                self.set_status(ACT_OK)
 
-        if not self._graph_ok(self.deps):
-            return
+    def _launch(self):
+        """Launch all members."""
+        self._started = True
+        for action in self._members:
+            _ENGINE.request(action)
+        self._check_members()
 
-        if not self._graph_ok(self._members):
-            return
 
-        # So, all members are OK
-        self.set_status(ACT_OK)
+class MountdataProbes(EventHandler):
+    """
+    Run mountdata probe commands (see Component.mountdata_command()) inside
+    a task, with a bounded number of them running concurrently.
+
+    When a probe ends, its FSAction is notified through mountdata_done().
+    Mountdata read by all probes are written in the mountdata cache once
+    the last one ends. The scheduler is then dropped, get() creates a new
+    one for the next probes.
+    """
+
+    # Maximum number of probes running at the same time
+    MAX_RUNNING = 8
+
+    # One scheduler per task, while it has probes to run
+    _schedulers = {}
+
+    def __init__(self, task):
+        EventHandler.__init__(self)
+        self.task = task
+        self._queue = []
+        self._running = {}
+
+    @classmethod
+    def get(cls, task):
+        """Return the probe scheduler of `task'."""
+        if task not in cls._schedulers:
+            cls._schedulers[task] = cls(task)
+        return cls._schedulers[task]
+
+    def schedule(self, action, command):
+        """Queue `command' probing mountdata for FSAction `action'."""
+        self._queue.append((action, command))
+        self._run_next()
+
+    def _run_next(self):
+        """Start queued probes while there is room for them."""
+        while self._queue and len(self._running) < self.MAX_RUNNING:
+            action, command = self._queue.pop(0)
+            worker = self.task.shell(command, handler=self, stderr=True)
+            self._running[worker] = action
+
+    def ev_close(self, worker):
+        """Notify the probing action and start the next probe."""
+        action = self._running.pop(worker)
+        self._run_next()
+        action.mountdata_done(worker.read() or "", worker.retcode())
+        if not self._running:
+            flush_mountdata_cache()
+            if self._schedulers.get(self.task) is self:
+                del self._schedulers[self.task]
 
 
 class FSAction(CommonAction):
@@ -274,6 +404,8 @@ class FSAction(CommonAction):
             self.check_mountdata = (kwargs['mountdata'] == 'always')
         else:
             self.check_mountdata = self.__class__.CHECK_MOUNTDATA
+        # 'always' also ignores cached mountdata.
+        self.refresh_mountdata = (kwargs.get('mountdata') == 'always')
 
     def _addopts_substitute(self, addopts):
         """Substitute placeholders in `addopts' based on self.comp data."""
@@ -347,25 +479,52 @@ class FSAction(CommonAction):
         """
         self.comp.action_start(self.NAME)
         try:
-            self.comp.full_check(mountdata=self.check_mountdata)
+            # Mountdata are read asynchronously, see mountdata_done().
+            self.comp.full_check(mountdata=False)
+
+            command = None
+            if self.check_mountdata:
+                cache = not self.refresh_mountdata
+                command = self.comp.mountdata_command(cache=cache)
 
-            result = self._already_done()
-            if not result:
-                self._shell()
+            if command:
+                MountdataProbes.get(self.task).schedule(self, command)
             else:
-                self.set_status(ACT_OK)
-                self.comp.action_done(self.NAME, result)
+                self._run()
 
         except ComponentError, error:
             self.set_status(ACT_ERROR)
             self.comp.action_failed(self.NAME, Result(str(error)))
 
+    def mountdata_done(self, output, retcode):
+        """
+        Analyze the mountdata probe result and go on with the action.
+        """
+        try:
+            self.comp.check_mountdata_output(output, retcode)
+            self._run()
+
+        except ComponentError, error:
+            self.set_status(ACT_ERROR)
+            self.comp.action_failed(self.NAME, Result(str(error)))
+
+    def _run(self):
+        """Run the action command, if its work is not already done."""
+        result = self._already_done()
+        if not result:
+            self._shell()
+        else:
+            self.set_status(ACT_OK)
+            self.comp.action_done(self.NAME, result)
+
     def ev_close(self, worker):
         """
         Check process termination status and generate appropriate events.
         """
         Action.ev_close(self, worker)
 
+        # The command could have changed what is seen in /proc
+        proc_snapshot().invalidate()
         self.comp.lustre_check()
 
         # Action timed out
@@ -80,6 +80,11 @@ class CommonFormat(FSAction):
 
         return None
 
+    def ev_close(self, worker):
+        """Forget cached mountdata, this command modifies them."""
+        self.comp.invalidate_mountdata()
+        FSAction.ev_close(self, worker)
+
     def _prepare_cmd(self):
 
         command = []
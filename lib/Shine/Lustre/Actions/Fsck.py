@@ -27,6 +27,7 @@ import logging
 
 from Shine.Lustre.Actions.Action import Action, FSAction, Result, ErrorResult, \
                                         ACT_OK, ACT_ERROR
+from Shine.Lustre.ProcSnapshot import proc_snapshot
 
 
 class FsckProgress(Result):
@@ -127,6 +128,7 @@ class Fsck(FSAction):
         # We want to skip FSAction.ev_close(), just call the upper layer.
         Action.ev_close(self, worker)
 
+        proc_snapshot().invalidate()
         self.comp.lustre_check()
 
         # fsck returns 0=NOERROR, 1=OK_BUT_CORRECTION, 2=OK_BUT_REBOOT.
@@ -20,11 +20,88 @@
 
 import os.path
 
+try:
+    from hashlib import md5
+except ImportError:
+    # Python 2.4
+    from md5 import new as md5
+
+from ClusterShell.Event import EventHandler
+from ClusterShell.NodeSet import NodeSet
+
 from Shine.Lustre.Actions.Action import Action
 
+
+def file_digest(filename):
+    """
+    Return the hexadecimal MD5 digest of `filename' content, or None if the
+    file cannot be read.
+
+    Used to check that a file installed on remote nodes is up to date.
+    """
+    digest = md5()
+    try:
+        fobj = open(filename, 'rb')
+        try:
+            data = fobj.read(65536)
+            while data:
+                digest.update(data)
+                data = fobj.read(65536)
+        finally:
+            fobj.close()
+    except (IOError, OSError):
+        return None
+    return digest.hexdigest()
+
+
+class _DigestQuery(EventHandler):
+    """
+    Read the digest of `path' on `nodes' with one command, and call
+    `action'._copy() with the nodes where it differs from the local one.
+
+    `expected' returns the digest the file should have on a node.
+
+    Nodes where the command failed (ie: ssh error or timeout) are neither
+    copied nor skipped: a copy would fail the same way. Their error is
+    still reported by the task.
+    """
+
+    def __init__(self, action, path, nodes, expected):
+        EventHandler.__init__(self)
+        self._action = action
+        self._nodes = nodes
+        self._expected = expected
+        self._digests = {}
+        self.command = "md5sum '%s' 2>/dev/null || :" % path
+
+    def ev_read(self, worker):
+        self._digests[worker.current_node] = worker.current_msg.split(' ')[0]
+
+    def ev_close(self, worker):
+        failed = NodeSet.fromlist(worker.iter_keys_timeout())
+        for retcode, nodes in worker.iter_retcodes():
+            # The remote command itself never fails
+            if retcode != 0:
+                failed.update(NodeSet.fromlist(nodes))
+
+        outdated = NodeSet()
+        skipped = NodeSet()
+        for node in self._nodes:
+            if node in failed:
+                continue
+            expected = self._expected(node)
+            if expected is not None and self._digests.get(node) == expected:
+                skipped.add(node)
+            else:
+                outdated.add(node)
+        self._action._copy(outdated, skipped)
+
+
 class Install(Action):
     """
     Action class: install file configuration requirements on remote nodes.
+
+    The file is only copied to nodes where its content differs.
     """
 
     def __init__(self, nodes, fs, config_file):
@@ -32,19 +109,95 @@ class Install(Action):
         self.nodes = nodes
         self.fs = fs
         self.config_file = config_file
+        # Nodes where the file is copied and where it was up to date
+        self.copied = NodeSet()
+        self.skipped = NodeSet()
 
     def launch(self):
         """
         Copy local configuration file to remote nodes.
+
+        Remote file digests are read first, with one command for all nodes.
         """
-        self.task.copy(self.config_file, self.config_file,
-                nodes=self.nodes, handler=self)
+        digest = file_digest(self.config_file)
+        if digest is None:
+            self._copy(self.nodes, NodeSet())
+            return
+        query = _DigestQuery(self, self.config_file, self.nodes,
+                             lambda node: digest)
+        self.task.shell(query.command, nodes=self.nodes, handler=query)
+
+    def _copy(self, nodes, skipped):
+        """Copy the file to `nodes', `skipped' ones are up to date."""
+        self.copied = nodes
+        self.skipped = skipped
+        if len(nodes) > 0:
+            self.task.copy(self.config_file, self.config_file,
+                           nodes=nodes, handler=self)
+        else:
+            name = os.path.basename(self.config_file)
+            print "Configuration file `%s' is up to date on %d server(s)" % \
+                                                        (name, len(skipped))
 
     def ev_start(self, worker):
         Action.ev_start(self, worker)
         name = os.path.basename(self.config_file)
-        if len(self.nodes) > 8:
-            print "Updating configuration file `%s' on %d server(s)" % \
-                                                        (name, len(self.nodes))
+        nodes = self.copied
+        if len(nodes) > 8:
+            msg = "Updating configuration file `%s' on %d server(s)" % \
+                                                        (name, len(nodes))
         else:
-            print "Updating configuration file `%s' on %s" % (name, self.nodes)
+            msg = "Updating configuration file `%s' on %s" % (name, nodes)
+        if len(self.skipped) > 0:
+            msg += " (%d up to date)" % len(self.skipped)
+        print msg
+
+
+class InstallSlices(Action):
+    """
+    Action class: install a different configuration file on each remote
+    node, like node slices of a filesystem configuration.
+
+    Each file is only copied if it differs from the one of its node. The
+    ones already up to date are touched, so they are not older than the
+    full configuration file installed before them (see
+    Configuration.load_from_fsname()).
+    """
+
+    def __init__(self, nodes, fs, slices, config_file):
+        Action.__init__(self)
+        self.nodes = nodes
+        self.fs = fs
+        self.slices = slices
+        self.config_file = config_file
+        # Nodes where the file was already up to date
+        self.skipped = NodeSet()
+
+    def launch(self):
+        """
+        Copy the local file of each node, in `slices', to `config_file' on
+        this node.
+
+        Remote file digests are read first, with one command for all nodes.
+        """
+        digests = {}
+        for node in self.nodes:
+            digests[node] = file_digest(self.slices[node])
+        query = _DigestQuery(self, self.config_file, self.nodes, digests.get)
+        self.task.shell(query.command, nodes=self.nodes, handler=query)
+
+    def _copy(self, nodes, skipped):
+        """Copy their file to `nodes', `skipped' ones are up to date."""
+        self.skipped = skipped
+        name = os.path.basename(self.config_file)
+        msg = "Updating configuration file `%s' on %d server(s)" % \
+                                                        (name, len(nodes))
+        if len(skipped) > 0:
+            msg += " (%d up to date)" % len(skipped)
+        print msg
+        for node in nodes:
+            self.task.copy(self.slices[node], self.config_file, nodes=node,
+                           handler=self)
+        if len(skipped) > 0:
+            self.task.shell("touch -c '%s'" % self.config_file, nodes=skipped,
+                            handler=self)
@@ -24,6 +24,7 @@ Action classes for Lustre module managements.
 
 from Shine.Lustre import ServerError
 from Shine.Lustre.Actions.Action import CommonAction, ACT_OK, ACT_ERROR
+from Shine.Lustre.ProcSnapshot import proc_snapshot
 
 class ServerAction(CommonAction):
     """
@@ -72,6 +73,8 @@ class ServerAction(CommonAction):
         """
         CommonAction.ev_close(self, worker)
 
+        # Module list has changed
+        proc_snapshot().invalidate()
         self.server.lustre_check()
 
         # Action timed out
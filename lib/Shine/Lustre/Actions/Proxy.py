@@ -20,11 +20,14 @@
 
 import os
 import sys
+import copy
 import binascii, pickle
 
 from ClusterShell.MsgTree import MsgTree
 from ClusterShell.NodeSet import NodeSet
 
+from Shine.Agent import SHINE_AGENT_ENV
+from Shine.Configuration.Globals import Globals
 from Shine.Lustre.Component import INPROGRESS, RUNTIME_ERROR
 from Shine.Lustre.Actions.Action import Action, CommonAction, ACT_OK, ACT_ERROR
 
@@ -35,7 +38,30 @@ from Shine.Lustre.Actions.Action import ErrorResult
 # SHINE PROXY PROTOCOL
 #
 SHINE_MSG_MAGIC = "SHINE:"
-SHINE_MSG_VERSION = 3
+SHINE_MSG_VERSION = 4
+
+# Environment variable used to announce the highest protocol version
+# supported by the caller. Remote shine commands default to version 3.
+SHINE_MSG_ENV = "SHINE_MSG_VERSION"
+
+# Environment variable set by callers which want only one state summary,
+# sent when the remote command ends, instead of a stream of events.
+# Summaries use protocol version 5 and are not sent to older callers.
+SHINE_MSG_SUMMARY_ENV = "SHINE_MSG_SUMMARY"
+SHINE_MSG_SUMMARY_VERSION = 5
+
+# Environment variable set by callers of remote 'start' commands, which
+# should also apply the node tuning once their targets are started. Its value
+# is the digest of the caller tuning file, see Start command. Remote nodes
+# report tuning with TUNING_EVENT events, older versions ignore it.
+# Remote 'tune --check' commands also report the tuning values which differ
+# with 'check' TUNING_EVENT events.
+SHINE_START_TUNE_ENV = "SHINE_START_TUNE"
+TUNING_EVENT = "tuning"
+
+# Environment variable set by callers of remote 'tune' commands which should
+# also set persistent tunings, see Tune action.
+SHINE_TUNE_PERSISTENT_ENV = "SHINE_TUNE_PERSISTENT"
 
 class ProxyActionUnpackError(Exception):
     """An error occured while trying to unpack a shine event message."""
@@ -44,16 +70,74 @@ class ProxyActionUnpickleError(Exception):
     """An error occured while trying to unpickle a shine event message."""
 
 def shine_msg_pack(**kwargs):
-    """Shine event serialization method."""
+    """Shine event serialization method (version 3)."""
     # To be more evolutive, Shine message contains only a dict.
-    return "%s%d:%s" % (SHINE_MSG_MAGIC, SHINE_MSG_VERSION,
+    return "%s%d:%s" % (SHINE_MSG_MAGIC, 3,
                         binascii.b2a_base64(pickle.dumps(kwargs, -1)))
 
+def shine_msg_record(schema, compname, action, status, summary=False,
+                     **kwargs):
+    """
+    Convert an event into a compact record, for shine_msg_pack_v4().
+
+    Components are not pickled, only their identifier, their filesystem
+    name and the fields listed by their UPDATE_FIELDS are kept. The field
+    names of each component type are added to `schema', which is sent once
+    per message.
+
+    If `summary' is set, the record is for shine_msg_pack_summary():
+    components are identified by their local_id() and result durations are
+    dropped, so alike nodes send the same records.
+    """
+    comp = kwargs.pop('comp', None)
+    if summary and kwargs.get('result') is not None:
+        kwargs['result'] = copy.copy(kwargs['result'])
+        kwargs['result'].duration = None
+    if comp is None:
+        return (compname, action, status, None, kwargs)
+
+    if summary:
+        getid = lambda comp: comp.local_id()
+    else:
+        getid = lambda comp: comp.uniqueid()
+
+    # Several filesystems could have components with the same identifier
+    # (ie: MGS), see FileSystemGroup.
+    fields = schema.setdefault(comp.TYPE, comp.UPDATE_FIELDS + ('fs_name',))
+    # Journals are identified by their target.
+    target = getattr(comp, 'target', None)
+    ident = (comp.TYPE, getid(comp),
+             target is not None and getid(target) or None,
+             tuple([getattr(comp, name, None) for name in fields]))
+    return (compname, action, status, ident, kwargs)
+
+def shine_msg_pack_v4(schema, records):
+    """
+    Shine event serialization method (version 4).
+
+    Serialize several records, built by shine_msg_record(), in one message.
+    """
+    data = pickle.dumps((schema, records), 2)
+    return "%s%d:%s" % (SHINE_MSG_MAGIC, 4, binascii.b2a_base64(data))
+
+def shine_msg_pack_summary(schema, records):
+    """
+    Shine summary serialization method (version 5).
+
+    Like shine_msg_pack_v4(), but records are built with `summary' set and
+    identify components relatively to the sending node. The caller should
+    apply them to each sending node components, see FSProxyAction.
+    """
+    data = pickle.dumps((schema, records), 2)
+    return "%s%d:%s" % (SHINE_MSG_MAGIC, SHINE_MSG_SUMMARY_VERSION,
+                        binascii.b2a_base64(data))
+
 def shine_msg_unpack(msg):
     """
     Parse a raw string from a remote shine command.
 
-    Return a dict containing the information put by shine_msg_pack().
+    Return a list of dict containing the information put by
+    shine_msg_pack(), shine_msg_pack_v4() or shine_msg_pack_summary().
     """
     # check for any shine msg
     if not msg.startswith(SHINE_MSG_MAGIC):
@@ -66,24 +150,47 @@ def shine_msg_unpack(msg):
     except Exception, exp:
         raise ProxyActionUnpackError("Malformed Shine message: %s" % exp)
 
-    if version == SHINE_MSG_VERSION:
+    if version in (3, 4, SHINE_MSG_SUMMARY_VERSION):
         try:
             # unpack and unpickle object
-            return pickle.loads(binascii.a2b_base64(data))
+            data = pickle.loads(binascii.a2b_base64(data))
         except Exception, exp:
             msg = "Cannot unpickle message (check Shine and ClusterShell " \
                   "versions): %s" % exp
             raise ProxyActionUnpickleError(msg)
+        if version == 3:
+            return [data]
+        try:
+            return shine_msg_unpack_v4(data)
+        except Exception, exp:
+            raise ProxyActionUnpackError("Malformed Shine message: %s" % exp)
 
     elif version == 2:
         try:
-            return shine_msg_unpack_v2(data)
+            return [shine_msg_unpack_v2(data)]
         except Exception, exp:
             raise ProxyActionUnpackError("Unknown error: %s" % exp)
 
     else:
         raise ProxyActionUnpackError("Shine message version mismatch")
 
+def shine_msg_unpack_v4(data):
+    """Rebuild the event list of an unpickled version 4 message."""
+    schema, records = data
+    events = []
+    for compname, action, status, ident, extra in records:
+        event = extra
+        event.update(compname=compname, action=action, status=status)
+        if ident is not None:
+            comptype, uid, target_uid, values = ident
+            comp = DistantComponent(comptype, uid,
+                                    dict(zip(schema[comptype], values)))
+            if target_uid is not None:
+                comp.target = DistantComponent(None, target_uid, {})
+            event['comp'] = comp
+        events.append(event)
+    return events
+
 def shine_msg_unpack_v2(msg):
     """
     Compatibility function to unpack old-style v2 messages.
@@ -110,6 +217,24 @@ def shine_msg_unpack_v2(msg):
     return data
 
 
+class DistantComponent(object):
+    """
+    Component fields received from a remote shine command, using protocol
+    version 4.
+
+    It provides what FileSystem.distant_event() and Component.update() need
+    from a distant component instance.
+    """
+
+    def __init__(self, comptype, uid, fields):
+        self.TYPE = comptype
+        self._uid = uid
+        self.__dict__.update(fields)
+
+    def uniqueid(self):
+        return self._uid
+
+
 class FSProxyAction(CommonAction):
     """
     Generic file system command proxy action class.
@@ -117,8 +242,11 @@ class FSProxyAction(CommonAction):
 
     NAME = 'proxy'
 
+    _SUMMARY_PREFIX = "%s%d:" % (SHINE_MSG_MAGIC, SHINE_MSG_SUMMARY_VERSION)
+
     def __init__(self, fs, action, nodes, debug, comps=None, addopts=None,
-                 failover=None, mountdata=None):
+                 failover=None, mountdata=None, summary=False, tuning=None,
+                 check=False, persistent=False):
 
         CommonAction.__init__(self)
 
@@ -134,6 +262,23 @@ class FSProxyAction(CommonAction):
         self.failover = failover
         self.mountdata = mountdata
 
+        # If set, ask remote nodes for a state summary. Identical summaries
+        # are gathered and applied once all nodes have answered.
+        self.summary = summary
+        self._summaries = MsgTree()
+
+        # If set, ask remote 'start' to also apply tuning, see
+        # SHINE_START_TUNE_ENV.
+        self.tuning = tuning
+
+        # If set, remote 'tune' only reports tuning values which differ, with
+        # TUNING_EVENT events.
+        self.check = check
+
+        # If set, remote 'tune' also sets persistent tunings, see
+        # SHINE_TUNE_PERSISTENT_ENV.
+        self.persistent = persistent
+
         self._outputs = MsgTree()
         self._errpickle = MsgTree()
         self._silentnodes = NodeSet() # Error nodes without output
@@ -166,12 +311,29 @@ class FSProxyAction(CommonAction):
         if self.mountdata is not None and self.mountdata != 'auto':
             command.append('--mountdata=%s' % self.mountdata)
 
+        if self.check:
+            command.append('--check')
+
         return command
 
     def _launch(self):
         """Launch FS proxy command."""
         command = self._prepare_cmd()
 
+        # Ask for the compact protocol. Older versions will ignore it.
+        command.insert(0, "%s=%d" % (SHINE_MSG_ENV, SHINE_MSG_VERSION))
+        if self.summary:
+            command.insert(0, "%s=1" % SHINE_MSG_SUMMARY_ENV)
+        if self.tuning is not None:
+            command.insert(0, "%s=%s" % (SHINE_START_TUNE_ENV, self.tuning))
+        if self.persistent:
+            command.insert(0, "%s=1" % SHINE_TUNE_PERSISTENT_ENV)
+
+        # Relay to the shine agent on remote nodes, if there is one.
+        agent_socket = Globals().get_agent_socket()
+        if agent_socket:
+            command.insert(0, "%s=%s" % (SHINE_AGENT_ENV, agent_socket))
+
         # Schedule cluster command.
         self.task.shell(' '.join(command), nodes=self.nodes, handler=self)
 
@@ -192,26 +354,95 @@ class FSProxyAction(CommonAction):
     def ev_read(self, worker):
         node = worker.current_node
         buf = worker.current_msg
+
+        # Summaries are only unpacked once per distinct message, at the end.
+        if self.summary and buf.startswith(self._SUMMARY_PREFIX):
+            self._summaries.add(node, buf)
+            return
+
         try:
-            data = shine_msg_unpack(buf)
-            compname = data.pop('compname')
-            action = data.pop('action')
-            status = data.pop('status')
-            self.fs.distant_event(compname, action, status, node=node, **data)
+            events = shine_msg_unpack(buf)
         except ProxyActionUnpickleError, exp:
             # Maintain a standalone list of unpickling errors.
             # Node could have unpickling error but still exit with 0
             msg = str(exp)
             if msg not in self._errpickle.get(node, ""):
                 self._errpickle.add(node, msg)
-        except AttributeError, exp:
-            msg = "Cannot read message (check Shine and ClusterShell " \
-                  "version): %s" % str(exp)
-            if msg not in self._errpickle.get(node, ""):
-                self._errpickle.add(node, msg)
+            return
         except ProxyActionUnpackError:
             # Store output that is not a shine message
             self._outputs.add(node, buf)
+            return
+
+        # A message could contain several events (protocol v4)
+        for data in events:
+            try:
+                compname = data.pop('compname')
+                action = data.pop('action')
+                status = data.pop('status')
+                self.fs.distant_event(compname, action, status, node=node,
+                                      **data)
+            except AttributeError, exp:
+                msg = "Cannot read message (check Shine and ClusterShell " \
+                      "version): %s" % str(exp)
+                if msg not in self._errpickle.get(node, ""):
+                    self._errpickle.add(node, msg)
+
+    def _apply_summaries(self):
+        """
+        Update components from the gathered summaries and raise their events.
+
+        Each distinct summary is unpacked once. Its events update the
+        matching components of the nodes which sent it, and are raised only
+        once, for all these nodes. A component, like ClientGroup, could
+        stand for several of these nodes.
+        """
+        index = {}
+        for comp in self._comps or ():
+            index.setdefault(comp.local_id(), []).append(comp)
+
+        for buf, nodes in self._summaries.walk():
+            nodes = NodeSet.fromlist(nodes)
+            events = []
+            try:
+                for line in str(buf).splitlines():
+                    events += shine_msg_unpack(line)
+            except (ProxyActionUnpackError, ProxyActionUnpickleError), exp:
+                for node in nodes:
+                    self._errpickle.add(node, str(exp))
+                continue
+
+            for data in events:
+                compname = data.pop('compname')
+                action = data.pop('action')
+                status = data.pop('status')
+                distant = data.pop('comp', None)
+                if distant is None:
+                    self.fs.distant_event(compname, action, status,
+                                          node=nodes, **data)
+                    continue
+
+                # Journals are identified by their target.
+                target = getattr(distant, 'target', None)
+                uid = (target or distant).uniqueid()
+                updated = NodeSet()
+                comp = None
+                for other in index.get(uid, ()):
+                    common = nodes.intersection(other.server.hostname)
+                    if len(common) == 0:
+                        continue
+                    if target is not None:
+                        other = other.journal
+                    other.update_nodes(common, distant)
+                    updated.update(common)
+                    comp = comp or other
+
+                if len(updated) < len(nodes):
+                    print >> sys.stderr, "ERROR: Component update failed " \
+                                         "(%s on %s)" % (uid, nodes - updated)
+                if comp is not None:
+                    self.fs._invoke(compname, action, status, node=updated,
+                                    comp=comp, **data)
 
     def ev_hup(self, worker):
         """Keep a list of node, without output, with a return code != 0"""
@@ -225,6 +456,9 @@ class FSProxyAction(CommonAction):
         """End of proxy command."""
         Action.ev_close(self, worker)
 
+        if self.summary:
+            self._apply_summaries()
+
         # Before all, we must check if shine command ran without bugs, node
         # crash, etc...
         # So we need to verify all node retcodes and change the component state
@@ -243,8 +477,7 @@ class FSProxyAction(CommonAction):
                 # XXX: This should be changed using a real event for proxy.
                 comp._del_action('proxy')
 
-                if comp.state is None:
-                    comp.state = RUNTIME_ERROR
+                comp.mark_unknown(RUNTIME_ERROR)
 
                 # At this step, there should be no more INPROGRESS component.
                 # If yes, this is a bug, change state to RUNTIME_ERROR.
@@ -252,7 +485,7 @@ class FSProxyAction(CommonAction):
                 # list.
                 # Starting with v1.3, there is no more code setting INPROGRESS.
                 # This is for compatibility with older clients.
-                elif comp.state == INPROGRESS:
+                if comp.state == INPROGRESS:
                     actions = ""
                     if len(comp._list_action()):
                         actions = "actions: " + ", ".join(comp._list_action())
@@ -128,6 +128,11 @@ class StartTarget(FSAction):
 
         return command
 
+    def ev_close(self, worker):
+        """Forget cached mountdata, mount updates target flags."""
+        self.comp.invalidate_mountdata()
+        FSAction.ev_close(self, worker)
+
     def needed_modules(self):
         if Globals().lustre_version_is_smaller('2.4') or \
            not Globals().lustre_version_is_smaller('2.5'):
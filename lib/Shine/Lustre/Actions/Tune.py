@@ -23,7 +23,12 @@ Classes used the apply tuning on local node, either from tuning.conf or
 dynamically created.
 """
 
-from Shine.Lustre.Actions.Action import CommonAction, ActionGroup
+from Shine.Configuration.Globals import Globals
+
+from Shine.Lustre.ProcSnapshot import proc_snapshot
+
+from Shine.Lustre.Actions.Action import CommonAction, ActionGroup, \
+                                      ErrorResult, ACT_OK, ACT_ERROR
 
 _SRVTYPE_MAP = {
         'mgt': 'mgs',
@@ -33,17 +38,133 @@ _SRVTYPE_MAP = {
         'router': 'router'
     }
 
+# Reported for tuning files whose value needs a shell to be interpreted, in
+# check mode. They could not be compared.
+UNCHECKED_MARK = ": not checked, shell value "
+
+def _read_value(path):
+    """Return the current content of tuning file `path', or None."""
+    try:
+        fobj = open(path)
+        try:
+            return fobj.read()
+        finally:
+            fobj.close()
+    except IOError:
+        return None
+
+
 class _TuningAction(CommonAction):
-    """Action handling the command to modify only 1 tuning."""
+    """
+    Action applying one tuning parameter to all its files.
+
+    Files are read first and only the ones with a different value are
+    written, by shine itself, without any command. Only values which need a
+    shell to be interpreted are still written by commands, all in one
+    shell, and they are not checked.
+
+    If `fs' is set, nothing is written: the files with a different value
+    are reported to it, see FileSystem.tuning_drift_event(). Files with a
+    shell value are reported as not checked, see UNCHECKED_MARK.
+    """
 
     NAME = "tuning"
 
-    def __init__(self, command):
+    def __init__(self, param, fsname, fs=None):
         CommonAction.__init__(self)
-        self._command = command
+        self._param = param
+        self._fsname = fsname
+        self._fs = fs
+        self.result = None
 
     def _launch(self):
-        self.task.shell(self._command, handler=self)
+        value = self._param.file_value()
+        paths = self._param.build_tuning_paths(self._fsname, proc_snapshot())
+
+        errors = []
+        drift = []
+        if value is None:
+            if paths and self._fs is None:
+                cmds = self._param.build_tuning_command(self._fsname,
+                                                        proc_snapshot())
+                command = "rc=0; %s || rc=1; exit $rc" % \
+                          " || rc=1; ".join(cmds)
+                self.task.shell(command, handler=self)
+                return
+            drift = ["%s%s%s" % (path, UNCHECKED_MARK, self._param.value)
+                     for path in paths]
+            paths = []
+
+        for path in paths:
+            current = _read_value(path)
+            if current is not None and current.strip() == value.strip():
+                continue
+            if self._fs is not None:
+                if current is None:
+                    current = "unreadable"
+                drift.append("%s: %s (expected %s)" %
+                             (path, current.strip() or '""', value.strip()))
+                continue
+            try:
+                fobj = open(path, 'w')
+                try:
+                    fobj.write(value)
+                finally:
+                    fobj.close()
+            except IOError, error:
+                errors.append("%s: %s" % (path, error.strerror))
+
+        if drift:
+            self._fs.tuning_drift_event('\n'.join(drift))
+
+        if errors:
+            self.result = ErrorResult("Tuning %s failed: %s" %
+                                      (self._param, ', '.join(errors)))
+            self.set_status(ACT_ERROR)
+        else:
+            self.set_status(ACT_OK)
+
+
+def _shell_quote(arg):
+    """Quote `arg' for a shell command line."""
+    return "'%s'" % arg.replace("'", "'\\''")
+
+
+class _PersistentTuning(CommonAction):
+    """
+    Action applying persistent tuning parameters, for all nodes, with
+    'lctl set_param -P'. It should be run on the MGS.
+
+    Each 'set_param -P' call adds a record to the MGS configuration log, so
+    a parameter is only set if one of its current values differs, or if it
+    has none on the MGS node.
+    """
+
+    NAME = "persistent tuning"
+
+    def __init__(self, params, fsname):
+        CommonAction.__init__(self)
+        self._params = params
+        self._fsname = fsname
+
+    def _launch(self):
+        cmds = []
+        for param in self._params:
+            value = str(param.value)
+            if len(value) > 1 and value[0] == value[-1] == '"':
+                value = value[1:-1]
+            name = param.lctl_name(self._fsname)
+            cmds.append('cur=$(lctl get_param -n %s 2>/dev/null); '
+                        'if [ -z "$cur" ] || echo "$cur" | grep -qvxF -- %s; '
+                        'then lctl set_param -P %s || rc=1; fi' %
+                        (_shell_quote(name), _shell_quote(value),
+                         _shell_quote("%s=%s" % (name, value))))
+
+        command = "rc=0; %s; exit $rc" % "; ".join(cmds)
+        path = Globals().get('command_path')
+        if path:
+            command = "export PATH=%s:${PATH}; %s" % (path, command)
+        self.task.shell(command, handler=self)
 
 
 class Tune(ActionGroup):
@@ -51,37 +172,75 @@ class Tune(ActionGroup):
 
     NAME = "tune"
 
-    def __init__(self, srv, tuning_conf, comps, fsname):
+    def __init__(self, srv, tuning_conf, comps, fsname, check=False,
+                 persistent=False):
         ActionGroup.__init__(self)
         self._server = srv
         self._comps = comps
         self._conf = tuning_conf
         self._fsname = fsname
+        self._check = check
+        self._persistent = persistent
         self._init = False
 
     def _add_actions(self):
         """
-        Create all individual tunings Action.
+        Create one tuning Action for each parameter.
 
         To be run before this fake group action is really launched.
         """
-        srvtypes = set([_SRVTYPE_MAP.get(comp.TYPE) for comp in self._comps])
-        srvname = str(self._server.hostname)
-
-        tunings = self._conf.get_params_for_name(srvname, srvtypes)
-        for tuning in tunings:
-            cmds = tuning.build_tuning_command(self._fsname)
-            for command in cmds:
-                self.add(_TuningAction(command))
+        # In check mode, report differences to the components filesystem.
+        fs = None
+        if self._check:
+            fs = iter(self._comps).next().fs
+
+        # Tuning paths are expanded with fresh directory listings, each
+        # directory being listed once for all parameters.
+        proc_snapshot().invalidate()
+
+        for tuning in self._node_params(self._server, self._conf,
+                                        self._comps):
+            self.add(_TuningAction(tuning, self._fsname, fs))
+
+        # Persistent tunings are set on the MGS, only if asked. They could
+        # not be checked.
+        if self._persistent and not self._check:
+            persistent = self._mgs_params(self._conf, self._comps)
+            if persistent:
+                self.add(_PersistentTuning(persistent, self._fsname))
 
         # Actions has been added, no need to create them again.
         self._init = True
 
-    def launch(self):
-        # First time launch is called, we need to create all the sub actions.
-        # As the graph is calling launch a couple of times, we need to do this
-        # only once.
+    @classmethod
+    def _node_params(cls, srv, tuning_conf, comps):
+        """Return the tuning parameters of `srv', running `comps'."""
+        srvtypes = set([_SRVTYPE_MAP.get(comp.TYPE) for comp in comps])
+        return tuning_conf.get_params_for_name(str(srv.hostname), srvtypes)
+
+    @classmethod
+    def _mgs_params(cls, tuning_conf, comps):
+        """
+        Return the persistent tuning parameters, if `comps' contains the
+        MGT, or an empty list.
+        """
+        for comp in comps:
+            if comp.TYPE == 'mgt':
+                return tuning_conf.get_persistent_params()
+        return []
+
+    @classmethod
+    def is_needed(cls, srv, tuning_conf, comps, persistent=False):
+        """
+        Tell if there is some tuning to apply on `srv', running `comps',
+        including persistent tunings if `persistent' is set.
+        """
+        return bool(cls._node_params(srv, tuning_conf, comps) or
+                    (persistent and cls._mgs_params(tuning_conf, comps)))
+
+    def _launch(self):
+        # Sub actions are created when the group is really launched, once
+        # its dependencies are done.
         if not self._init:
             self._add_actions()
-        # Then call the real launch().
-        ActionGroup.launch(self)
+        ActionGroup._launch(self)
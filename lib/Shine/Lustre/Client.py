@@ -22,8 +22,8 @@
 Classes for Shine framework to manage Lustre clients.
 """
 
-from glob import glob
 import os 
+import copy
 
 from Shine.Lustre.Component import Component, ComponentError, \
                                    MOUNTED, OFFLINE, CLIENT_ERROR, RUNTIME_ERROR
@@ -31,7 +31,11 @@ from Shine.Lustre.Component import Component, ComponentError, \
 from Shine.Lustre.Actions.StartClient import StartClient
 from Shine.Lustre.Actions.StopClient import StopClient
 
+from ClusterShell.NodeSet import NodeSet
+
+from Shine.Lustre.Server import Server
 from Shine.Lustre.Target import MDT, OST
+from Shine.Lustre.ProcSnapshot import proc_snapshot
 
 
 class Client(Component):
@@ -61,6 +65,10 @@ class Client(Component):
         RUNTIME_ERROR: "CHECK FAILURE" 
     }
 
+    UPDATE_FIELDS = Component.UPDATE_FIELDS + \
+                    ('mount_path', 'mount_options', 'mtpt', 'proc_states')
+
+    AGGREGATED = True
 
     def __init__(self, fs, server, mount_path, mount_options=None,
                  enabled=True):
@@ -88,11 +96,19 @@ class Client(Component):
         """
         return "%s-%s" % (Component.uniqueid(self), self.mount_path)
 
+    def local_id(self):
+        """Return the client label and mount path."""
+        return "%s-%s" % (self.label, self.mount_path)
+
     def update(self, other):
         """
         Update my serializable fields from other/distant object.
         """
         Component.update(self, other)
+        self._update_mount(other)
+
+    def _update_mount(self, other):
+        """Update mount fields from other/distant object."""
         self.mount_path = other.mount_path
 
         # Compat v0.910: Following values depend on Shine remote version
@@ -107,8 +123,11 @@ class Client(Component):
 
         self.state = None   # Undefined
 
-        proc_lov_match = glob("/proc/fs/lustre/lov/%s-clilov-*" %
-                              self.fs.fs_name)
+        proc = proc_snapshot()
+
+        prefix = "%s-clilov-" % self.fs.fs_name
+        proc_lov_match = [name for name in proc.obd_names('lov')
+                          if name.startswith(prefix)]
 
         if not proc_lov_match:
             self.state = OFFLINE
@@ -117,32 +136,28 @@ class Client(Component):
         #
         # There is at least one clilov declared. Check for coherence.
         #
-        loaded = os.path.isdir(proc_lov_match[0])
+        loaded = os.path.isdir(proc.path('fs', 'lustre', 'lov',
+                                         proc_lov_match[0]))
 
         # check for presence in /proc/mounts
-        f_proc_mounts = open("/proc/mounts", 'r')
-        try:
-            curr_lnetdev = None
-            for line in f_proc_mounts:
-                if line.find(" %s lustre " % self.mount_path) > 0:
-                    lnetdev, mntp = line.split(' ', 2)[0:2]
-                    if loaded:
-                        curr_lnetdev = lnetdev
-                        self.state = MOUNTED
-                        self.mtpt = mntp
-                    else:
-                        self.state = CLIENT_ERROR
-                        if lnetdev != curr_lnetdev:
-                            raise ComponentError(self, "conflicting mounts "
-                                                "detected for %s and %s on %s" %
-                                                 (lnetdev, curr_lnetdev,
-                                                  self.mount_path))
-                        else:
-                            raise ComponentError(self, "multiple mounts "
-                                                 "detected for %s (%s)" %
-                                                 (lnetdev, self.mount_path))
-        finally:
-            f_proc_mounts.close()
+        curr_lnetdev = None
+        for lnetdev, mntp, dummy in proc.mounts_by_path(self.mount_path,
+                                                        "lustre"):
+            if loaded:
+                curr_lnetdev = lnetdev
+                self.state = MOUNTED
+                self.mtpt = mntp
+            else:
+                self.state = CLIENT_ERROR
+                if lnetdev != curr_lnetdev:
+                    raise ComponentError(self, "conflicting mounts "
+                                        "detected for %s and %s on %s" %
+                                         (lnetdev, curr_lnetdev,
+                                          self.mount_path))
+                else:
+                    raise ComponentError(self, "multiple mounts "
+                                         "detected for %s (%s)" %
+                                         (lnetdev, self.mount_path))
 
         if loaded and self.state != MOUNTED:
             # up but not mounted = incoherent state
@@ -158,22 +173,40 @@ class Client(Component):
     def _lustre_check_proc_state(self):
         """Check current target status in /proc/fs/lustre/*/*/state"""
 
+        proc = proc_snapshot()
+        prefix = "%s-" % self.fs.fs_name
+
         self.proc_states = {}
-        for entry in glob("/proc/fs/lustre/??c/%s-*/state" % self.fs.fs_name):
+        for obdtype in proc.obd_types():
+            # Like osc, mdc, mgc, ...
+            if len(obdtype) != 3 or not obdtype.endswith('c'):
+                continue
+            for name in proc.obd_names(obdtype):
+                if name.startswith(prefix):
+                    self._read_proc_state(proc.path('fs', 'lustre', obdtype,
+                                                    name, 'state'))
+
+        if 'EVICTED' in self.proc_states:
+            self.state = CLIENT_ERROR
+            raise ComponentError(self, 'client connection error (%d evictions)'
+                                       %  self.proc_states['EVICTED'])
+
+    def _read_proc_state(self, entry):
+        """Count the current state read in `entry' file, if it exists."""
+        try:
             f_state = open(entry, 'r')
+        except IOError:
+            return
+        try:
             for line in f_state:
                 if line.startswith('current_state:'):
                     state_name = line.split(None, 1)[1].strip()
                     self.proc_states.setdefault(state_name, 0)
                     self.proc_states[state_name] += 1
                     break
+        finally:
             f_state.close()
 
-        if 'EVICTED' in self.proc_states:
-            self.state = CLIENT_ERROR
-            raise ComponentError(self, 'client connection error (%d evictions)'
-                                       %  self.proc_states['EVICTED'])
-
     def text_status(self):
         """
         Return a human text form for the client state, displaying the various
@@ -202,3 +235,117 @@ class Client(Component):
     def umount(self, **kwargs):
         """Umount a Lustre client."""
         return StopClient(self, **kwargs)
+
+
+class ClientGroup(Client):
+    """
+    Lustre client mounts of a set of nodes, sharing the same mount path and
+    options.
+
+    There is only one instance for all these nodes. They are kept in one
+    NodeSet, used as server hostname, and nodes with the same status are
+    gathered in one NodeSet per status. Some nodes could be moved in their
+    own group if they need to be handled apart, see carve().
+    """
+
+    def __init__(self, fs, nodes, mount_path, mount_options=None,
+                 enabled=True):
+        self._statuses = {}
+        Client.__init__(self, fs, Server(NodeSet(nodes), []), mount_path,
+                        mount_options, enabled)
+        # Computed once, as the group nodes could change.
+        self._uid = "%s-%s-%s" % (self.label, self.server.hostname,
+                                  mount_path)
+
+    def uniqueid(self):
+        """Return a unique string representing this group."""
+        return self._uid
+
+    def _get_state(self):
+        """Return the state of all nodes or, if they differ, the worst one."""
+        return max([state for state, dummy in self._statuses] or [None])
+
+    def _set_state(self, state):
+        """Set `state' on all the group nodes."""
+        self._statuses = {}
+        self._set_status(self.server.hostname, state)
+
+    state = property(_get_state, _set_state)
+
+    def _set_status(self, nodes, state):
+        """Move `nodes' to `state', with the current connection states."""
+        nodes = NodeSet(nodes)
+        for status, others in self._statuses.items():
+            others.difference_update(nodes)
+            if len(others) == 0:
+                del self._statuses[status]
+        proc_states = tuple(sorted(getattr(self, 'proc_states', {}).items()))
+        self._statuses.setdefault((state, proc_states), NodeSet()).update(nodes)
+
+    def update_nodes(self, nodes, other):
+        """Update the state of `nodes' from other/distant object."""
+        self._update_mount(other)
+        self._set_status(nodes, other.state)
+
+    def mark_unknown(self, state):
+        """Set `state' on nodes with no known state and return them."""
+        nodes = NodeSet()
+        for status in self._statuses.keys():
+            if status[0] is None:
+                nodes.update(self._statuses[status])
+        if len(nodes) > 0:
+            self._set_status(nodes, state)
+        return nodes
+
+    def instances(self):
+        """Return the number of nodes in this group."""
+        return len(self.server.hostname)
+
+    def nodes(self, state):
+        """Return the nodes in `state'."""
+        nodes = NodeSet()
+        for status, others in self._statuses.iteritems():
+            if status[0] == state:
+                nodes.update(others)
+        return nodes
+
+    def by_state(self):
+        """
+        Return this group if all its nodes have the same status, or one
+        read-only view per status otherwise.
+        """
+        if len(self._statuses) <= 1:
+            return [self]
+        views = []
+        for (state, proc_states), nodes in self._statuses.iteritems():
+            view = copy.copy(self)
+            view.server = Server(NodeSet(nodes), [])
+            view._statuses = {(state, proc_states): NodeSet(nodes)}
+            view.proc_states = dict(proc_states)
+            view._uid = "%s-%s-%s" % (self.label, nodes, self.mount_path)
+            views.append(view)
+        return views
+
+    def carve(self, nodes):
+        """
+        Move `nodes' from this group to a new one, added to the filesystem,
+        and return it.
+        """
+        nodes = NodeSet(nodes).intersection(self.server.hostname)
+        if len(nodes) == 0:
+            raise KeyError("%s not in %s" % (nodes, self.uniqueid()))
+        other = self.fs.new_client_group(nodes, self.mount_path,
+                                         self.mount_options,
+                                         self.action_enabled)
+        other.mtpt = self.mtpt
+        other.proc_states = dict(self.proc_states)
+        other._statuses = {}
+        for status, others in self._statuses.items():
+            common = others.intersection(nodes)
+            if len(common) > 0:
+                other._statuses[status] = common
+                others.difference_update(common)
+                if len(others) == 0:
+                    del self._statuses[status]
+        self.server.hostname.difference_update(nodes)
+        return other
@@ -18,7 +18,7 @@
 # Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
 #
 
-from itertools import ifilter, groupby
+from itertools import groupby
 from operator import attrgetter
 
 from ClusterShell.NodeSet import NodeSet
@@ -58,6 +58,15 @@ class Component(object):
     # Text mapping for each possible states
     STATE_TEXT_MAP = {}
 
+    # Fields read by update() on a distant instance. Only these fields are
+    # sent by remote shine commands using the compact proxy protocol.
+    UPDATE_FIELDS = ('state',)
+
+    # Components which are numerous and alike on all their servers, like
+    # clients. Remote commands could send a summary of their states instead
+    # of a stream of events. See FSProxyAction.
+    AGGREGATED = False
+
     def __init__(self, fs, server, enabled = True, mode = 'managed'):
 
         # File system
@@ -78,6 +87,16 @@ class Component(object):
         # Component behaviour change depending on its mode.
         self._mode = mode
 
+    @property
+    def fs_name(self):
+        """
+        Return the name of the component filesystem. It is also known by
+        instances received from a remote shine command, which have no fs.
+        """
+        if self.fs is not None:
+            return self.fs.fs_name
+        return self.__dict__.get('_fs_name')
+
     @property
     def label(self):
         """
@@ -97,6 +116,13 @@ class Component(object):
         """Return a unique string representing this component."""
         return "%s-%s" % (self.label, ','.join(self.server.nids))
 
+    def local_id(self):
+        """
+        Return a string identifying this component among the components of
+        its server. Unlike uniqueid(), it is the same on all servers.
+        """
+        return self.label
+
     def longtext(self):
         """
         Return a string describing this component, for output purposes.
@@ -109,9 +135,38 @@ class Component(object):
         """
         self.state = other.state
 
+    def update_nodes(self, nodes, other):
+        """
+        Update the fields of this component on `nodes' from other/distant
+        object. This is update() for components on a single node.
+        """
+        self.update(other)
+
+    def instances(self):
+        """Return the number of component instances this object stands for."""
+        return 1
+
+    def by_state(self):
+        """
+        Return a list of components, each one having a single state, which
+        together stand for this component.
+        """
+        return [self]
+
+    def mark_unknown(self, state):
+        """
+        Set `state' where this component state is unknown. Return the nodes
+        where it was unknown.
+        """
+        if self.state is None:
+            self.state = state
+            return NodeSet(self.server.hostname)
+        return NodeSet()
+
     def __getstate__(self):
         odict = self.__dict__.copy()
         del odict['fs']
+        odict['_fs_name'] = self.fs_name
         return odict
 
     def __setstate__(self, state):
@@ -161,6 +216,23 @@ class Component(object):
         """
         self.lustre_check()
 
+    def mountdata_command(self, cache=True):
+        """
+        Return the command line reading component mountdata, or None if the
+        component has none or, if `cache' is set, they were found in cache.
+        See check_mountdata_output().
+        """
+        return None
+
+    def check_mountdata_output(self, output, retcode):
+        """
+        Analyze the output of the command returned by mountdata_command().
+
+        This is full_check(mountdata=True) part which could be run
+        asynchronously.
+        """
+        pass
+
     #
     # Inprogress action methods
     #
@@ -240,12 +312,57 @@ class Component(object):
 class ComponentGroup(object):
     """
     Gather and efficiently manipulate list of Components.
+
+    Components are indexed by TYPE, by index, when they have one, and by
+    server, so filtering on them does not scan the whole group. Filtering
+    methods return lazy views, see ComponentView.
     """
 
     def __init__(self, iterable=None):
         self._elems = {}
+        self._types = {}
+        self._indexes = {}
+        self._servers = {}
         if iterable:
-            self._elems = dict([(comp.uniqueid(), comp) for comp in iterable])
+            for comp in iterable:
+                self._insert(comp.uniqueid(), comp)
+
+    @classmethod
+    def _from_items(cls, items):
+        """Build a group from (uniqueid, component) tuples."""
+        grp = ComponentGroup()
+        for uid, comp in items:
+            grp._insert(uid, comp)
+        return grp
+
+    def _insert(self, uid, comp):
+        """Add `comp' with `uid' identifier, and index it."""
+        self._elems[uid] = comp
+        self._types.setdefault(comp.TYPE, {})[uid] = comp
+        index = getattr(comp, 'index', None)
+        if index is not None:
+            self._indexes.setdefault(index, {})[uid] = comp
+        self._servers.setdefault(comp.server, {})[uid] = comp
+
+    def _discard(self, uid):
+        """Remove component with `uid' identifier, and its index entries."""
+        comp = self._elems.pop(uid)
+        index = getattr(comp, 'index', None)
+        # The component could have changed its server since it was indexed.
+        server = comp.server
+        if uid not in self._servers.get(server, {}):
+            for server, comps in self._servers.iteritems():
+                if uid in comps:
+                    break
+        for table, value in ((self._types, comp.TYPE),
+                             (self._indexes, index),
+                             (self._servers, server)):
+            entries = table.get(value)
+            if entries is not None:
+                entries.pop(uid, None)
+                if not entries:
+                    del table[value]
+        return comp
 
     def __len__(self):
         return len(self._elems)
@@ -269,10 +386,27 @@ class ComponentGroup(object):
         Raises a KeyError if a component
         with the same uniqueid() is already added.
         """
-        if component in self:
-            raise KeyError("A component with id %s already exists." %
-                           component.uniqueid())
-        self._elems[component.uniqueid()] = component
+        uid = component.uniqueid()
+        if uid in self._elems:
+            raise KeyError("A component with id %s already exists." % uid)
+        self._insert(uid, component)
+
+    def remove(self, component):
+        """
+        Remove a component from the group.
+
+        Raises a KeyError if it is not in the group.
+        """
+        self._discard(component.uniqueid())
+
+    def reindex(self, component):
+        """
+        Update the group indexes after `component' has changed its server,
+        like when a target moves to a failover server.
+        """
+        uid = component.uniqueid()
+        self._discard(uid)
+        self._insert(uid, component)
  
     def update(self, iterable):
         """
@@ -305,6 +439,10 @@ class ComponentGroup(object):
         """Return a NodeSet containing all component servers."""
         return NodeSet.fromlist((comp.server.hostname for comp in self))
 
+    def instances(self):
+        """Return the number of component instances in this group."""
+        return sum([comp.instances() for comp in self])
+
     def allservers(self):
         """Return a NodeSet containing all component servers and fail
         servers."""
@@ -317,24 +455,63 @@ class ComponentGroup(object):
     # Filtering methods
     #
 
-    def filter(self, supports=None, key=None):
+    def _select(self, types=None, indexes=None, servers=None):
+        """
+        Return an iterator over (uniqueid, component) tuples, only for
+        components with a TYPE in `types', an index in `indexes' and a
+        server in `servers', if set. This only uses the indexes.
+        """
+        selections = []
+        for wanted, index in ((types, self._types),
+                              (indexes, self._indexes)):
+            if wanted is not None:
+                selection = {}
+                for value in wanted:
+                    selection.update(index.get(value, {}))
+                selections.append(selection)
+        if servers is not None:
+            # There are far less servers than components.
+            selection = {}
+            for server, comps in self._servers.iteritems():
+                if server.hostname in servers:
+                    selection.update(comps)
+            selections.append(selection)
+
+        if not selections:
+            return self._elems.iteritems()
+        selections.sort(key=len)
+        first, others = selections[0], selections[1:]
+        return ((uid, comp) for uid, comp in first.iteritems()
+                if not [other for other in others if uid not in other])
+
+    def _view(self, types, indexes, servers, keys):
+        """Return a view of the components matching all criteria."""
+        return ComponentView(self, types, indexes, servers, keys)
+
+    def filter(self, supports=None, key=None, types=None, indexes=None,
+               servers=None):
         """
         Returns a new ComponentGroup instance containing only the component
         that matches the filtering rules.
 
         Your own filtering rule could be defined using the key argument.
+        `types' and `indexes' use the group indexes. `servers' keeps
+        components whose server is in this NodeSet.
 
         Example: Return only the OST from the group
-        >>> group.filter(key=lambda t: t.TYPE == OST.TYPE)
-        """
-        if supports and not key:
-            filter_key = lambda x: x.capable(supports)
-        elif supports and key:
-            filter_key = lambda x: key(x) and x.capable(supports)
-        else:
-            filter_key = key
+        >>> group.filter(types=[OST.TYPE])
 
-        return ComponentGroup(ifilter(filter_key, iter(self)))
+        Example: Return the enabled OSTs of some servers
+        >>> group.enabled().filter(types=['ost'], servers=NodeSet('oss[1-4]'))
+        """
+        keys = []
+        if key:
+            keys.append(key)
+        if supports:
+            keys.append(lambda comp: comp.capable(supports))
+        if servers is not None:
+            servers = NodeSet(servers)
+        return self._view(types, indexes, servers, keys)
 
     def enabled(self):
         """Uses filter() to return only the enabled components."""
@@ -346,6 +523,17 @@ class ComponentGroup(object):
         key = lambda comp: not comp.is_external() and comp.action_enabled
         return self.filter(supports, key=key)
 
+    def unfold(self):
+        """
+        Return a new ComponentGroup where each component has a single state.
+        Components standing for several nodes, like ClientGroup, are replaced
+        by one view per state.
+        """
+        grp = ComponentGroup()
+        for comp in self:
+            grp.update(comp.by_state())
+        return grp
+
     #
     # Grouping methods
     #
@@ -367,15 +555,170 @@ class ComponentGroup(object):
         """
         assert (not (attr and key)), "Unsupported: attr and supports"
 
-        if key is None and attr is not None:
-            key = attrgetter(attr)
-
-        # Sort the components using the key, and then group results 
-        # using the same key.
-        sortlist = sorted(iter(self), key=key, reverse=reverse)
-        grouped = groupby(sortlist, key)
-        return ((grpkey, ComponentGroup(comps)) for grpkey, comps in grouped)
+        if attr in ('TYPE', 'server'):
+            if attr == 'TYPE':
+                index = self._types
+            else:
+                index = self._servers
+            groups = dict((value, comps.items())
+                          for value, comps in index.iteritems())
+        else:
+            if key is None and attr is not None:
+                key = attrgetter(attr)
+            groups = {}
+            try:
+                for uid, comp in self._elems.iteritems():
+                    groups.setdefault(key(comp), []).append((uid, comp))
+            except TypeError:
+                # Unhashable keys: sort the components using the key, and
+                # then group results using the same key.
+                sortlist = sorted(iter(self), key=key, reverse=reverse)
+                grouped = groupby(sortlist, key)
+                return ((grpkey, ComponentGroup(comps))
+                        for grpkey, comps in grouped)
+
+        return ((grpkey, self._from_items(groups[grpkey]))
+                for grpkey in sorted(groups, reverse=reverse))
 
     def groupbyserver(self):
         """Uses groupby() to group component per server."""
         return self.groupby(attr='server')
+
+
+class LazyComponentGroup(ComponentGroup):
+    """
+    ComponentGroup where disabled components could be deferred.
+
+    A deferred component is only created when something needs the whole
+    group. Looking up its uniqueid only creates this one, and enabled() and
+    managed() never need it.
+    """
+
+    def __init__(self, iterable=None):
+        self._built = ComponentGroup(iterable)
+        self._deferred = {}
+
+    def defer(self, uid, factory, *args):
+        """
+        Register a disabled component, with `uid' as uniqueid, which is
+        created by calling `factory(*args)'. The factory should add it
+        to this group.
+        """
+        if uid in self._deferred or uid in self._built._elems:
+            raise KeyError("A component with id %s already exists." % uid)
+        self._deferred[uid] = (factory, args)
+
+    def _create(self, uid):
+        """Create the deferred component `uid'."""
+        factory, args = self._deferred.pop(uid)
+        factory(*args)
+
+    def _get_group(self):
+        """Create all deferred components, if not already done."""
+        while self._deferred:
+            self._create(iter(self._deferred).next())
+        return self._built
+
+    # The group attributes are those of all the components.
+    _elems = property(lambda self: self._get_group()._elems)
+    _types = property(lambda self: self._get_group()._types)
+    _indexes = property(lambda self: self._get_group()._indexes)
+    _servers = property(lambda self: self._get_group()._servers)
+
+    def _insert(self, uid, comp):
+        self._built._insert(uid, comp)
+
+    def _discard(self, uid):
+        if uid in self._deferred:
+            del self._deferred[uid]
+        else:
+            return self._built._discard(uid)
+
+    def __contains__(self, comp):
+        uid = comp.uniqueid()
+        return uid in self._deferred or uid in self._built._elems
+
+    def __getitem__(self, key):
+        if key in self._deferred:
+            self._create(key)
+        return self._built[key]
+
+    def add(self, component):
+        """See ComponentGroup.add(), deferred components are not created."""
+        uid = component.uniqueid()
+        if uid in self._deferred or uid in self._built._elems:
+            raise KeyError("A component with id %s already exists." % uid)
+        self._built._insert(uid, component)
+
+    def enabled(self):
+        """Deferred components are disabled, see ComponentGroup.enabled()."""
+        return self._built.enabled()
+
+    def managed(self, supports=None):
+        """Deferred components are disabled, see ComponentGroup.managed()."""
+        return self._built.managed(supports)
+
+
+class ComponentView(ComponentGroup):
+    """
+    Lazy ComponentGroup, result of a filter on another group.
+
+    Matching components are looked for, in the parent group indexes, only
+    when the view is first used. Filtering a view which was not used yet
+    adds criteria to it, so the parent group is scanned only once.
+    """
+
+    def __init__(self, parent, types, indexes, servers, keys):
+        self._parent = parent
+        self._types_wanted = types
+        self._indexes_wanted = indexes
+        self._servers_wanted = servers
+        self._keys = keys
+        self._group = None
+
+    def _get_group(self):
+        """Look for the matching components, if not already done."""
+        if self._group is None:
+            keys = self._keys
+            items = self._parent._select(self._types_wanted,
+                                         self._indexes_wanted,
+                                         self._servers_wanted)
+            self._group = self._from_items(
+                    (uid, comp) for uid, comp in items
+                    if not [key for key in keys if not key(comp)])
+            self._parent = None
+        return self._group
+
+    # The group attributes are those of the matching components.
+    _elems = property(lambda self: self._get_group()._elems)
+    _types = property(lambda self: self._get_group()._types)
+    _indexes = property(lambda self: self._get_group()._indexes)
+    _servers = property(lambda self: self._get_group()._servers)
+
+    def _view(self, types, indexes, servers, keys):
+        """Add criteria to this view, if it is not used yet."""
+        if self._group is not None:
+            return ComponentGroup._view(self, types, indexes, servers, keys)
+
+        def merge(mine, other):
+            if mine is None:
+                return other
+            elif other is None:
+                return mine
+            return [value for value in mine if value in other]
+
+        def servers_merge(mine, other):
+            if mine is None:
+                return other
+            elif other is None:
+                return mine
+            return mine.intersection(other)
+
+        return ComponentView(self._parent,
+                             merge(self._types_wanted, types),
+                             merge(self._indexes_wanted, indexes),
+                             servers_merge(self._servers_wanted, servers),
+                             self._keys + keys)
+
+    def _insert(self, uid, comp):
+        self._get_group()._insert(uid, comp)
@@ -26,9 +26,12 @@ Lustre Disk abstraction module.
 import copy
 import os
 import stat
+import time
+import marshal
 import subprocess
 
 from Shine.Configuration.Globals import Globals
+from Shine.Lustre.ProcSnapshot import proc_snapshot
 
 ### From lustre/include/lustre_disk.h:
 
@@ -51,12 +54,148 @@ class DiskDeviceError(Exception):
         self._disk = disk
 
 
+class MountdataCache(object):
+    """
+    Persistent cache of 'tunefs.lustre' outputs.
+
+    Entries are stored in a file of status_dir, keyed on device identity,
+    and expire after mountdata_cache_ttl seconds. This file only contains
+    built-in objects, read with marshal, and anything unexpected in it is
+    ignored.
+
+    New and removed entries are kept in memory and written all at once by
+    flush().
+    """
+
+    FILENAME = 'mountdata'
+
+    def __init__(self):
+        # In-memory copy of the cache file and its modification time
+        self._entries = {}
+        self._mtime = None
+        # Entries not written yet, see flush()
+        self._pending = {}
+        self._removed = set()
+
+    def path(self):
+        """Cache file path."""
+        return os.path.join(Globals().get_status_dir(), self.FILENAME)
+
+    def enabled(self):
+        """Is the cache usable?"""
+        return int(Globals().get_mountdata_cache_ttl()) > 0
+
+    def _load(self):
+        """Re-read the cache file if it was modified."""
+        try:
+            mtime = os.stat(self.path()).st_mtime
+        except OSError:
+            self._entries = {}
+            self._mtime = None
+            return self._entries
+
+        if mtime != self._mtime:
+            try:
+                fcache = open(self.path(), 'rb')
+                try:
+                    data = marshal.load(fcache)
+                finally:
+                    fcache.close()
+            except (IOError, OSError, EOFError, ValueError, TypeError):
+                data = None
+            self._entries = {}
+            if isinstance(data, dict):
+                for key, entry in data.iteritems():
+                    if isinstance(entry, tuple) and len(entry) == 2 and \
+                       isinstance(entry[0], (int, long, float)) and \
+                       isinstance(entry[1], str):
+                        self._entries[key] = entry
+            self._mtime = mtime
+        return self._entries
+
+    def _save(self, entries):
+        """Atomically replace the cache file with `entries'."""
+        dirname = os.path.dirname(self.path())
+        tmpname = "%s.%d" % (self.path(), os.getpid())
+        try:
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            fcache = open(tmpname, 'wb')
+            try:
+                marshal.dump(entries, fcache)
+            finally:
+                fcache.close()
+            os.rename(tmpname, self.path())
+        except (IOError, OSError, ValueError):
+            # A cache is not worth failing for.
+            try:
+                os.unlink(tmpname)
+            except OSError:
+                pass
+        self._mtime = None
+
+    def lookup(self, key):
+        """Return cached output for device `key', or None."""
+        if key is None or not self.enabled() or key in self._removed:
+            return None
+        entry = self._pending.get(key) or self._load().get(key)
+        if entry is None:
+            return None
+        stamp, output = entry
+        ttl = int(Globals().get_mountdata_cache_ttl())
+        if not 0 <= time.time() - stamp < ttl:
+            return None
+        return output
+
+    def store(self, key, output):
+        """Cache `output' for device `key', until flush() is called."""
+        if key is None or not self.enabled():
+            return
+        self._removed.discard(key)
+        self._pending[key] = (time.time(), str(output))
+
+    def flush(self):
+        """Write the entries stored or removed since the last call, if any."""
+        if not self._pending and not self._removed:
+            return
+        now = time.time()
+        ttl = int(Globals().get_mountdata_cache_ttl())
+        loaded = self._load()
+        entries = dict((ekey, entry) for ekey, entry in loaded.iteritems()
+                       if 0 <= now - entry[0] < ttl and
+                          ekey not in self._removed)
+        entries.update(self._pending)
+        changed = self._pending or len(entries) != len(loaded)
+        self._pending = {}
+        self._removed = set()
+        if changed:
+            self._save(entries)
+
+    def remove(self, key):
+        """Drop cached output for device `key', when flush() is called."""
+        if key is None:
+            return
+        self._pending.pop(key, None)
+        self._removed.add(key)
+
+
+# Cache shared by all disks of this process.
+_MOUNTDATA_CACHE = MountdataCache()
+
+def flush_mountdata_cache():
+    """Write mountdata read by all disks since the last call."""
+    _MOUNTDATA_CACHE.flush()
+
+
 class Disk:
     """
     Represents a low-level Lustre Disk as defined in lustre/include/
     lustre_disk.h. Base class for Lustre Target (see Target.py).
     """
 
+    # Fields read by update(), see Component.UPDATE_FIELDS.
+    UPDATE_FIELDS = ('dev_isblk', 'dev_size', 'ldd_svname', '_ldd_flags')
+
     def __init__(self, dev):
         self.dev = dev
 
@@ -92,16 +231,10 @@ class Disk:
             # block device
             self.dev_isblk = True
             # get dev size
-            partitions = open("/proc/partitions", 'r')
-            try:
-                dev = os.path.basename(os.path.realpath(self.dev))
-                for line in partitions:
-                    d_info = line.rstrip('\n').split(' ')
-                    if len(d_info) > 1 and d_info[-1] == dev:
-                        self.dev_size = int(d_info[-2]) * 1024
-                        break
-            finally:
-                partitions.close()
+            dev = os.path.basename(os.path.realpath(self.dev))
+            size = proc_snapshot().partition_size(dev)
+            if size is not None:
+                self.dev_size = size
 
         elif stat.S_ISREG(mode):
             # regular file
@@ -111,20 +244,75 @@ class Disk:
             # unsupported
             raise DiskDeviceError(self, "unsupported device type")
 
-    def _mountdata_check(self, label_check=None):
-        """Read device flags using 'tunefs.lustre'"""
-
+    def _mountdata_cmd(self):
+        """Return the 'tunefs.lustre' command line reading device flags."""
         cmd = "tunefs.lustre --noformat %s" % self.dev
         path = Globals().get('command_path')
         if path:
             cmd = "export PATH=%s:${PATH}; %s" % (path, cmd)
+        return cmd
 
-        process = subprocess.Popen([cmd], stdout=subprocess.PIPE,
+    def _mountdata_key(self):
+        """
+        Return the device identity used as mountdata cache key, or None if
+        the device could not be found.
+        """
+        try:
+            realpath = os.path.realpath(self.dev)
+            info = os.stat(realpath)
+        except OSError:
+            return None
+        size = info.st_size
+        if stat.S_ISBLK(info.st_mode):
+            size = proc_snapshot().partition_size(os.path.basename(realpath))
+        # For image files, mtime changes each time the device is written.
+        return (realpath, info.st_rdev, size, info.st_mtime)
+
+    def _mountdata_cached(self, label_check=None):
+        """
+        Read device flags from the mountdata cache, if they are there.
+
+        Return False if the cache has no valid entry for this device.
+        """
+        output = _MOUNTDATA_CACHE.lookup(self._mountdata_key())
+        if output is None:
+            return False
+        self._mountdata_parse(output, 0, label_check)
+        return True
+
+    def _mountdata_read(self, output, retcode, label_check=None):
+        """Analyze 'tunefs.lustre' output and cache it if it is valid."""
+        if retcode == 0:
+            _MOUNTDATA_CACHE.store(self._mountdata_key(), output)
+        self._mountdata_parse(output, retcode, label_check)
+
+    def invalidate_mountdata(self):
+        """Drop device flags cached for this device."""
+        _MOUNTDATA_CACHE.remove(self._mountdata_key())
+
+    def _mountdata_check(self, label_check=None, cache=False):
+        """
+        Read device flags using 'tunefs.lustre', or from the mountdata cache
+        if `cache' is set.
+        """
+        if cache and self._mountdata_cached(label_check):
+            return
+
+        process = subprocess.Popen([self._mountdata_cmd()],
+                                   stdout=subprocess.PIPE,
                                    stderr=subprocess.PIPE, shell=True)
         output = process.communicate()[0]
-        if process.returncode > 0:
+        self._mountdata_read(output, process.returncode, label_check)
+        flush_mountdata_cache()
+
+    def _mountdata_parse(self, output, retcode, label_check=None):
+        """
+        Analyze 'tunefs.lustre' output, as run by _mountdata_cmd(), and
+        check the device label is `label_check', if set.
+        """
+        if retcode > 0:
             raise DiskDeviceError(self, "Failed to run 'tunefs.lustre' to " +
-                                  "read flags (rc=%d)" % process.returncode)
+                                  "read flags (rc=%d)" % retcode)
 
         for line in output.splitlines():
             line = line.strip()
@@ -0,0 +1,113 @@
+# Fields.py -- Component fields shared by display and actions.
+# Copyright (C) 2012-2014 CEA
+#
+# This file is part of shine
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+
+"""
+Named fields of Lustre components.
+
+Fields are used by text display (-O option) and by action option
+substitution (%label, %device, ...). They do not depend on any CLI code, so
+actions could use them without loading the display modules.
+"""
+
+from operator import attrgetter
+
+class DisplayError(Exception):
+    """An error prevent display to be done correctly."""
+
+(KILO, MEGA, GIGA, TERA) = (1024.0, 1024.0 ** 2, 1024.0 ** 3, 1024.0 ** 4)
+
+def _human_unit(value):
+    """
+    Format numerical ``value'' to display it using human readable unit like
+    (KB, MB, GB, ...).
+    """
+    if value >= TERA:
+        fmt = "%.1fTB" % (value / TERA)
+    elif value >= GIGA:
+        fmt = "%.1fGB" % (value / GIGA)
+    elif value >= MEGA:
+        fmt = "%.1fMB" % (value / MEGA)
+    elif value >= KILO:
+        fmt = "%.1fKB" % (value / KILO)
+    else:
+        fmt = "%d" % value
+    return fmt
+
+
+COMP_FIELDS = {
+
+        'fsname':  { 'supports': 'fs', 'getter': lambda comp: comp.fs.fs_name },
+        'label':   { 'supports': 'label', 'getter': attrgetter('label') },
+        'node':    { 'supports': 'server',
+                     'getter': lambda comp: str(comp.server.hostname) },
+        'servers': { 'supports': 'allservers',
+                     'getter': lambda comp: str(comp.allservers().nodeset()) },
+        'status':  { 'supports': 'text_status',
+                     'getter': lambda comp: comp.text_status() },
+        'statusonly': { 'supports': 'text_status',
+                     'getter': lambda comp: comp.text_statusonly() },
+        'type':    { 'supports': 'TYPE',
+                     'getter': lambda comp: comp.TYPE.upper()[0:3] },
+
+        # Target specific fields
+        'device':  { 'supports': 'dev', 'getter': attrgetter('dev') },
+        'flags':   { 'supports': 'flags',
+                     'getter': lambda tgt: ' '.join(tgt.flags()) },
+        'hanodes': { 'supports': 'failservers',
+                     'getter': lambda tgt: str(tgt.failservers.nodeset()) },
+        'index':   { 'supports': 'index',
+                     'getter': lambda tgt: str(tgt.index) },
+        'jdev':    { 'supports': 'journal',
+                     'getter': lambda tgt: tgt.journal and tgt.journal.dev },
+        'jsize':   { 'supports': 'journal',
+                     'getter': lambda tgt: tgt.journal and \
+                                           _human_unit(tgt.journal.dev_size) },
+        'network': { 'supports': 'network', 'getter': attrgetter('network') },
+        'size':    { 'supports': 'dev_size',
+                     'getter': lambda tgt: _human_unit(tgt.dev_size) },
+        'tag':     { 'supports': 'tag', 'getter': attrgetter('tag') },
+        'target':  { 'supports': 'get_id', 'getter': lambda tgt: tgt.get_id() },
+
+        # Client specific fields
+        'mntpath': { 'supports': 'mount_path',
+                     'getter': attrgetter('mount_path') },
+        'mntopts': { 'supports': 'mount_options',
+                     'getter': attrgetter('mount_options') },
+
+    }
+
+def map_field(comp, field, dash=True):
+    """
+    Map a field name to a component value, based on rules from COMP_FIELD.
+
+    Mapping, for a known but unsupported field for `comp', depends on `dash' value.
+    If dash is true, '-' is returned, otherwise an empty string is returned.
+
+    Raise DisplayError if field does not exist in COMP_FIELD.
+    """
+    if field not in COMP_FIELDS:
+        raise DisplayError("bad field name '%%%s'" % field)
+
+    if comp.capable(COMP_FIELDS[field]['supports']):
+        return COMP_FIELDS[field]['getter'](comp)
+    elif dash:
+        return '-'
+    else:
+        return ''
@@ -26,6 +26,7 @@ Represents a Lustre FS.
 
 import os
 import sys
+import copy
 import socket
 import logging
 import logging.handlers
@@ -35,14 +36,18 @@ from ClusterShell.NodeSet import NodeSet
 from ClusterShell.Task import task_self
 
 from Shine.Configuration.Globals import Globals
+from Shine.Configuration.Compiled import CompiledFile
+from Shine.Configuration.FileSystem import FileSystem as ConfigFileSystem
 
-from Shine.Lustre.Actions.Action import ActionGroup, ACT_ERROR
-from Shine.Lustre.Actions.Proxy import FSProxyAction
-from Shine.Lustre.Actions.Install import Install
+from Shine.Lustre.Actions.Action import ActionGroup, Result, ACT_ERROR
+from Shine.Lustre.Actions.Proxy import FSProxyAction, TUNING_EVENT
+from Shine.Lustre.Actions.Install import Install, InstallSlices
+from Shine.Lustre.Actions.Tune import Tune
 
-from Shine.Lustre.Component import ComponentGroup
+from Shine.Lustre.Component import ComponentGroup, LazyComponentGroup
+from Shine.Lustre.Disk import flush_mountdata_cache
 from Shine.Lustre.Server import Server
-from Shine.Lustre.Client import Client
+from Shine.Lustre.Client import Client, ClientGroup
 from Shine.Lustre.Router import Router
 from Shine.Lustre.Target import MGT, MDT, OST, Journal
 # FileSystem class needs to re-export all Target status, they are used in
@@ -91,13 +96,39 @@ class FileSystem:
     The Lustre FileSystem abstract class.
     """
 
+    # Component types started before each component type. MGT does not
+    # need anything, targets register to it through routers, MDT connects
+    # to OSTs. They are stopped in reverse order.
+    START_DEPS = {
+        Router.TYPE: (),
+        MGT.TYPE: (),
+        OST.TYPE: (Router.TYPE, MGT.TYPE),
+        MDT.TYPE: (Router.TYPE, MGT.TYPE, OST.TYPE),
+    }
+
+    # When MDT has first_time or writeconf flag, it should be started before
+    # OSTs.
+    FIRST_START_DEPS = {
+        Router.TYPE: (),
+        MGT.TYPE: (),
+        MDT.TYPE: (Router.TYPE, MGT.TYPE),
+        OST.TYPE: (Router.TYPE, MGT.TYPE, MDT.TYPE),
+    }
+
     def __init__(self, fs_name, event_handler=None):
         self.fs_name = fs_name
         self.event_handler = event_handler
         self.proxy_errors = MsgTree()
+        # Nodes tuned by remote start commands, by status, see start().
+        self.remote_tuning = {}
+        # Tuning values which differ from the expected ones, see tune().
+        self.tuning_drift = MsgTree()
 
         # All FS components (MGT, MDT, OST, Clients, ...)
-        self.components = ComponentGroup()
+        self.components = LazyComponentGroup()
+
+        # Client groups, also in components, to find distant clients
+        self._client_groups = []
 
         # file system MGT
         self.mgt = None
@@ -159,10 +190,23 @@ class FileSystem:
         # When localy called, add the current node
         node = Server.hostname_short()
 
+        if compname == TUNING_EVENT and action == 'check' and \
+           'comp' not in params:
+            self._add_tuning_drift(node, params.get('result'))
+
         self._invoke(compname, action, status, node=node, **params)
 
     def distant_event(self, compname, action, status, node, **params):
-        
+
+        # Tuning applied by a remote start, see start(), or checked by a
+        # remote tune, see tune().
+        if compname == TUNING_EVENT and 'comp' not in params:
+            if action == 'check':
+                self._add_tuning_drift(node, params.get('result'))
+            else:
+                self.remote_tuning.setdefault(status, NodeSet()).update(node)
+            return
+
         # Update the local component instance with the provided instance
         # if one is available in params.
         if 'comp' in params:
@@ -176,10 +220,14 @@ class FileSystem:
                     target = self.components[comp.target.uniqueid()]
                     target.journal.update(comp)
                     other = target.journal
-                else:
+                elif comp in self.components or comp.TYPE != Client.TYPE:
                     other = self.components[comp.uniqueid()]
                     # update target from remote one
                     other.update(comp)
+                else:
+                    # Distant clients are part of a local group.
+                    other = self.client_group(node, comp.mount_path)
+                    other.update_nodes(node, comp)
 
                 # substitute target parameter by local one
                 params['comp'] = other
@@ -189,6 +237,20 @@ class FileSystem:
 
         self._invoke(compname, action, status, node=node, **params)
 
+    def tuning_drift_event(self, message):
+        """
+        Report the local tuning values which differ, described by `message',
+        found by a tune() check.
+        """
+        self.local_event(TUNING_EVENT, 'check', 'drift',
+                         result=Result(message))
+
+    def _add_tuning_drift(self, nodes, result):
+        """Store the tuning values which differ on `nodes', for tune()."""
+        for node in NodeSet(nodes):
+            for line in str(result).splitlines():
+                self.tuning_drift.add(node, line)
+
     def _handle_shine_proxy_error(self, nodes, message):
         """
         Store error messages, for later processing.
@@ -237,6 +299,27 @@ class FileSystem:
         self._attach_component(client)
         return client
 
+    def new_client_group(self, nodes, mount_path, mount_options=None,
+                         enabled=True):
+        """
+        Create a new attached group of clients, one per node of `nodes'.
+        """
+        group = ClientGroup(self, nodes, mount_path, mount_options, enabled)
+        self._attach_component(group)
+        self._client_groups.append(group)
+        return group
+
+    def client_group(self, node, mount_path):
+        """
+        Return the client group of `node' for `mount_path'.
+
+        Raise a KeyError if there is none.
+        """
+        for group in self._client_groups:
+            if group.mount_path == mount_path and node in group.server.hostname:
+                return group
+        raise KeyError("%s on %s" % (mount_path, node))
+
     def new_router(self, server, enabled=True):
         """
         Create a new attached router.
@@ -257,15 +340,78 @@ class FileSystem:
 
         failover = kwargs.get('failover')
         mountdata = kwargs.get('mountdata')
+        summary = kwargs.get('summary', False)
+        tuning = kwargs.get('tuning')
+        check = kwargs.get('check', False)
+        persistent = kwargs.get('persistent', False)
         return FSProxyAction(self, action, servers, self.debug, comps, addopts,
-                             failover, mountdata)
+                             failover, mountdata, summary, tuning, check,
+                             persistent)
+
+    def _proxy_fs(self, comps):
+        """
+        Return the filesystem whose name is given to the remote commands
+        run for `comps'.
+        """
+        return self
+
+    def _distant_actions(self, action, distant, **kwargs):
+        """
+        Create the proxy actions for `distant', a list of (server, comps)
+        tuples. All these servers run the same command line, unless their
+        components are from different filesystems (see FileSystemGroup).
+
+        Servers only running aggregated components, like clients, are asked
+        for a state summary in a separate proxy action, if there are at least
+        `summary_threshold' of them.
+
+        A proxy action ends with its slowest server. Actions depending on it
+        wait for all its servers, even the ones they do not need. This only
+        matters for servers shared by several filesystems: their command
+        also waits for what the other filesystems need (see _prepare()).
+        """
+        # Components of several filesystems could be on the same servers.
+        byhost = {}
+        for srv, srvcomps in distant:
+            byhost.setdefault(str(srv.hostname), (srv, []))[1].append(srvcomps)
+
+        groups = {}
+        proxyfs = {}
+        for srv, srvgroups in byhost.values():
+            srvcomps = _merge_groups(srvgroups)
+            summary = not [comp for comp in srvcomps if not comp.AGGREGATED]
+            fs = self._proxy_fs(srvcomps)
+            proxyfs[fs.fs_name] = fs
+            comps, servers = groups.setdefault((fs.fs_name, summary),
+                                               ([], NodeSet()))
+            comps.append(srvcomps)
+            servers.update(srv.hostname)
+
+        threshold = Globals().get_summary_threshold()
+        for fs_name, summary in groups.keys():
+            if summary and \
+               (not threshold or len(groups[(fs_name, True)][1]) < threshold):
+                comps, servers = groups.pop((fs_name, True))
+                other = groups.setdefault((fs_name, False), ([], NodeSet()))
+                other[0].extend(comps)
+                other[1].update(servers)
+
+        actions = []
+        for (fs_name, summary), (comps, servers) in sorted(groups.items()):
+            comps = _merge_groups(comps)
+            actions.append(proxyfs[fs_name]._proxy_action(action, servers,
+                                                          comps,
+                                                          summary=summary,
+                                                          **kwargs))
+        return actions
 
     def _run_actions(self):
         """
         Start actions run-loop.
 
         It clears all previous proxy errors and starts task run-loop. This
-        launches all FSProxyAction prepared before by example.
+        launches all FSProxyAction prepared before by example. Mountdata
+        cache changes made by the actions are written once it is done.
         """
         self.proxy_errors = MsgTree()
         # XXX: Warning, also update _distant_action_by_server()
@@ -273,6 +419,7 @@ class FileSystem:
         task_self().set_info('connect_timeout', 
                              Globals().get_ssh_connect_timeout())
         task_self().resume()
+        flush_mountdata_cache()
 
     def _check_errors(self, expected_states, components=None, actions=None):
         """
@@ -296,10 +443,10 @@ class FileSystem:
             # This should never happen but it is convenient for debugging if
             # there is some uncatched bug somewhere.
             # (ie: cannot unpickle due to ClusterShell version mismatch)
-            if comp.state is None:
-                msg = "WARNING: no state report from node %s" % comp.server
+            nodes = comp.mark_unknown(RUNTIME_ERROR)
+            if len(nodes) > 0:
+                msg = "WARNING: no state report from node %s" % nodes
                 print >> sys.stderr, msg
-                comp.state = RUNTIME_ERROR
 
             if comp.state not in expected_states:
                 result = max(result, comp.state)
@@ -354,7 +501,19 @@ class FileSystem:
 
         self._distant_action_by_server(Install, servers,
                                        config_file=fs_config_file)
-        
+
+    def install_slices(self, slices, fs_config_file):
+        """
+        Install a different file, as `fs_config_file', on each server.
+
+        `slices' maps each server name to the local file to copy there. The
+        local server is skipped.
+        """
+        self._distant_action_by_server(InstallSlices,
+                                       NodeSet.fromlist(slices.keys()),
+                                       slices=slices,
+                                       config_file=fs_config_file)
+
     def remove(self, servers=None):
         """
         Remove FS config files.
@@ -375,6 +534,12 @@ class FileSystem:
                                    "%s.xmf" % self.fs_name)
             if os.path.exists(fs_file):
                 result = os.remove(fs_file)
+            CompiledFile(fs_file).remove()
+            # and its node slice
+            slice_file = ConfigFileSystem._slice_path(self.fs_name)
+            if os.path.exists(slice_file):
+                os.remove(slice_file)
+            CompiledFile(slice_file).remove()
 
         if len(distant_servers) > 0:
             # Perform the remove operations on all targets for these nodes.
@@ -388,65 +553,121 @@ class FileSystem:
         
         return result
 
-    def _prepare(self, action, comps=None, groupby=None, reverse=False,
+    def _prepare(self, action, comps=None, deps=None, reverse=False,
                  need_unload=False, **kwargs):
         """
-        Instanciate all actions for the component list and but them in a graph
+        Instanciate all actions for the component list and put them in a graph
         of ActionGroup().
 
-        Action could be local or proxy actions.
-        Components list is filtered, based on action name.
+        Action could be local or proxy actions. There is one local group per
+        component type and proxy command lines for the distant servers of
+        each type (see _distant_actions()). Remote shine commands only handle
+        their local components, so they can all run the same command.
+
+        If set, `deps' maps each component type to the component types which
+        should be processed before it (or after it, if `reverse' is set).
+        Other types are processed without any ordering. A component only
+        waits for the actions running these types for its own filesystem, or
+        for all filesystems if it has none of them (ie: external MGT).
+        Distant servers are in the same proxy command only if they wait for
+        the same actions.
         """
 
         graph = ActionGroup()
-        subparts = []
-
-        first_comps = None
-        last_comps = None
+        localgrps = []
         localsrv = None
         modules = set()
 
-        if groupby:
-            iterable = comps.groupby(attr=groupby, reverse=reverse)
+        if deps is None:
+            key = lambda comp: None
         else:
-            iterable = [(None, comps)]
-
-        # Iterate over targets, grouping them by start order and server.
-        for _order, comps in iterable:
-
-            subparts.append(ActionGroup())
-            graph.add(subparts[-1])
-            compgrp = ActionGroup()
-            proxygrp = ActionGroup()
-
-            for srv, comps in comps.groupbyserver():
+            key = lambda comp: comp.TYPE
+
+        # Component types each type waits for.
+        waits = {}
+        for comptype, deptypes in (deps or {}).items():
+            for deptype in deptypes:
+                if reverse:
+                    waits.setdefault(deptype, set()).add(comptype)
+                else:
+                    waits.setdefault(comptype, set()).add(deptype)
+
+        # Types are prepared after the ones they wait for.
+        bytype = dict(comps.groupby(key=key))
+        order = []
+        todo = sorted(bytype)
+        while todo:
+            ready = [comptype for comptype in todo
+                     if not [dep for dep in waits.get(comptype, ())
+                             if dep in todo]]
+            assert ready, "Cyclic dependencies: %s" % todo
+            order += ready
+            todo = [comptype for comptype in todo if comptype not in ready]
+
+        # Actions running each type, by filesystem and for all of them.
+        fsacts = {}
+        typeacts = {}
+
+        def needed(comptype, srvcomps):
+            """Return the actions `srvcomps' should wait for."""
+            acts = set()
+            for fs_name in set([comp.fs_name for comp in srvcomps]):
+                for deptype in waits.get(comptype, ()):
+                    acts.update(fsacts.get((deptype, fs_name),
+                                           typeacts.get(deptype, ())))
+            return acts
+
+        def register(acts, srvcomps):
+            """Record that `acts' run `srvcomps'."""
+            for comp in srvcomps:
+                fskey = (comp.TYPE, comp.fs_name)
+                fsacts.setdefault(fskey, set()).update(acts)
+                typeacts.setdefault(comp.TYPE, set()).update(acts)
+
+        # Iterate over components, grouping them by type and server.
+        for comptype in order:
+
+            typegrp = ActionGroup()
+            graph.add(typegrp)
+
+            # Distant servers by the actions they wait for
+            distant = {}
+            signatures = []
+            for srv, srvcomps in bytype[comptype].groupbyserver():
+                depacts = needed(comptype, srvcomps)
                 if srv.is_local():
                     localsrv = srv
-                    for comp in comps:
+                    compgrp = ActionGroup()
+                    for comp in srvcomps:
                         compgrp.add(getattr(comp, action)(**kwargs))
+                    for act in depacts:
+                        compgrp.depends_on(act)
+                    typegrp.add(compgrp)
+                    localgrps.append(compgrp)
+                    register([compgrp], srvcomps)
+
+                    # Build module loading list, if needed
+                    for comp_action in compgrp:
+                        modules.update(comp_action.needed_modules())
                 else:
-                    act = self._proxy_action(action, srv.hostname,
-                                             comps, **kwargs)
-                    proxygrp.add(act)
-
-            if len(compgrp) > 0:
-                subparts[-1].add(compgrp)
-                # Keep track of first comp group
-                if first_comps is None:
-                    first_comps = compgrp
-                # Keep track of last comp group
-                last_comps = compgrp
-
-                # Build module loading list, if needed
-                for comp_action in compgrp:
-                    modules.update(comp_action.needed_modules())
-
-            if len(proxygrp) > 0:
-                subparts[-1].add(proxygrp)
-
+                    signature = frozenset(depacts)
+                    if signature not in distant:
+                        signatures.append(signature)
+                    distant.setdefault(signature, []).append((srv, srvcomps))
+
+            for signature in signatures:
+                acts = list(self._distant_actions(action, distant[signature],
+                                                  **kwargs))
+                for act in acts:
+                    for dep in signature:
+                        act.depends_on(dep)
+                    typegrp.add(act)
+                for srv, srvcomps in distant[signature]:
+                    register([act for act in acts
+                              if srv.hostname in act.nodes], srvcomps)
 
         # Add module loading, if needed.
-        if first_comps is not None:
+        if modules:
             modgrp = ActionGroup()
             for module in modules:
                 modgrp.add(localsrv.load_modules(modname=module))
@@ -456,16 +677,14 @@ class FileSystem:
             for act1, act2 in zip(modlist, modlist[1:]):
                 act2.depends_on(act1)
 
-            if len(modgrp) > 0:
-                first_comps.depends_on(modgrp)
-
-        # Add module unloading to last component group, if needed.
-        if need_unload and last_comps is not None:
-            localsrv.unload_modules().depends_on(last_comps)
+            for compgrp in localgrps:
+                compgrp.depends_on(modgrp)
 
-        # Join the different part together
-        for sub1, sub2 in zip(subparts, subparts[1::]):
-            sub2.depends_on(sub1)
+        # Add module unloading after all local components, if needed.
+        if need_unload and localgrps:
+            unload = localsrv.unload_modules()
+            for compgrp in localgrps:
+                unload.depends_on(compgrp)
 
         return graph
 
@@ -512,21 +731,33 @@ class FileSystem:
         # Here we check MOUNTED but in fact, any status is OK.
         return self._check_errors([MOUNTED], comps)
 
-    def start(self, comps=None, **kwargs):
-        """Start Lustre file system servers."""
-        comps = (comps or self.components).managed(supports='start')
+    def start(self, comps=None, tuning=None, **kwargs):
+        """
+        Start Lustre file system servers.
 
-        # What starting order to use?
-        key = lambda t: t.TYPE == MDT.TYPE
-        for target in comps.filter(key=key):
+        If `tuning' is set, remote servers also apply their tuning once their
+        targets are started, if `tuning' is the digest of their tuning file.
+        Servers which did it are listed in `remote_tuning', by tuning status
+        ('done' or 'failed'). Other servers should be tuned with tune().
+        """
+        comps = (comps or self.components).managed(supports='start')
+        self.remote_tuning = {}
+        if tuning is not None:
+            kwargs['tuning'] = tuning
+
+        # What starting order to use? It only matters if there are OSTs.
+        deps = self.START_DEPS
+        mdts = comps.filter(types=[MDT.TYPE])
+        if len(comps.filter(types=[OST.TYPE])) == 0:
+            mdts = ()
+        for target in mdts:
             # Found enabled MDT: perform writeconf check.
             self.status(comps=ComponentGroup([target]))
             if target.has_first_time_flag() or target.has_writeconf_flag():
                 # first_time or writeconf flag found, start MDT before OSTs
-                MDT.START_ORDER, OST.START_ORDER = \
-                                               OST.START_ORDER, MDT.START_ORDER
+                deps = self.FIRST_START_DEPS
 
-        actions = self._prepare('start', comps, groupby='START_ORDER', **kwargs)
+        actions = self._prepare('start', comps, deps=deps, **kwargs)
         actions.launch()
         self._run_actions()
 
@@ -535,7 +766,7 @@ class FileSystem:
     def stop(self, comps=None, **kwargs):
         """Stop file system."""
         comps = (comps or self.components).managed(supports='stop')
-        actions = self._prepare('stop', comps, groupby='START_ORDER',
+        actions = self._prepare('stop', comps, deps=self.START_DEPS,
                                 reverse=True, need_unload=True, **kwargs)
         actions.launch()
         self._run_actions()
@@ -573,17 +804,40 @@ class FileSystem:
         # XXX: Is that ok, to check MOUNTED here?
         return self._check_errors([MOUNTED], comps, actions)
 
-    def tune(self, tuning_model, comps=None, **kwargs):
-        """Tune server."""
+    def tune(self, tuning_model, comps=None, check=False, persistent=False,
+             **kwargs):
+        """
+        Tune server.
+
+        Only the tuning values which differ are written. If `check' is set,
+        nothing is written and the values which differ are listed by node in
+        `tuning_drift'.
+
+        Servers without any tuning to apply are skipped. Persistent tunings
+        are only set if `persistent' is set, by the MGS server.
+        """
         comps = (comps or self.components).managed()
+        self.tuning_drift = MsgTree()
+        if check:
+            kwargs['check'] = check
+        if persistent:
+            kwargs['persistent'] = persistent
 
         actions = ActionGroup()
+        distant = []
         for server, srvcomps in comps.groupbyserver():
-            if server.is_local():
-                actions.add(server.tune(tuning_model, srvcomps, self.fs_name))
+            if not Tune.is_needed(server, tuning_model, srvcomps,
+                                  persistent):
+                continue
+            elif server.is_local():
+                actions.add(server.tune(tuning_model, srvcomps, self.fs_name,
+                                        check=check, persistent=persistent))
             else:
-                actions.add(self._proxy_action('tune', server.hostname,
-                                               srvcomps, **kwargs))
+                distant.append((server, srvcomps))
+
+        # One command for all distant servers, each one tunes itself.
+        for act in self._distant_actions('tune', distant, **kwargs):
+            actions.add(act)
 
         # Run local actions and FSProxyAction
         actions.launch()
@@ -591,3 +845,149 @@ class FileSystem:
 
         # Check actions status and return MOUNTED if no error
         return self._check_errors([MOUNTED], None, actions)
+
+
+def _merge_groups(groups):
+    """
+    Return one ComponentGroup with the components of all `groups'.
+
+    Components could be from several filesystems and have the same
+    uniqueid (ie: all MGT are 'MGS'), so they are identified by their
+    filesystem name and their uniqueid.
+    """
+    items = []
+    for grp in groups:
+        for comp in grp:
+            items.append(((comp.fs.fs_name, comp.uniqueid()), comp))
+    return ComponentGroup._from_items(items)
+
+
+class FileSystemGroup(FileSystem):
+    """
+    Several filesystems, whose actions are run in one task run loop.
+
+    Actions of all filesystems are prepared in one graph. Servers of several
+    of these filesystems run one remote command for all of them (ie: -f
+    fs1,fs2). Events are forwarded to the filesystem of their component.
+
+    Action methods take a dict of components for each filesystem and return
+    a dict of states for each filesystem.
+    """
+
+    def __init__(self, filesystems):
+        self.filesystems = list(filesystems)
+        self.fs_name = ','.join([fs.fs_name for fs in self.filesystems])
+        self.event_handler = None
+        self.proxy_errors = MsgTree()
+        self.remote_tuning = {}
+        self.tuning_drift = MsgTree()
+        self.debug = bool([fs for fs in self.filesystems if fs.debug])
+        self._byname = dict((fs.fs_name, fs) for fs in self.filesystems)
+        # Filesystem subgroups, by name, see _proxy_fs()
+        self._groups = {}
+
+    def _invoke(self, compname, action, status, **kwargs):
+        comp = kwargs.get('comp')
+        if comp is None:
+            for fs in self.filesystems:
+                fs._invoke(compname, action, status, **kwargs)
+        else:
+            comp.fs._invoke(compname, action, status, **kwargs)
+
+    def distant_event(self, compname, action, status, node, **params):
+        comp = params.get('comp')
+        if comp is None:
+            for fs in self.filesystems:
+                fs.distant_event(compname, action, status, node, **params)
+            return
+
+        fs_name = getattr(comp, 'fs_name', None)
+        filesystems = [fs for fs in self.filesystems
+                       if fs.fs_name == fs_name or
+                          (fs_name is None and self._knows(fs, comp, node))]
+        if not filesystems:
+            print >> sys.stderr, "ERROR: Component update failed (%s)" % \
+                                 comp.uniqueid()
+        for fs in filesystems:
+            fs.distant_event(compname, action, status, node,
+                             **dict(params, comp=copy.copy(comp)))
+
+    @classmethod
+    def _knows(cls, fs, comp, node):
+        """
+        Tell if distant component `comp', sent by an older remote command,
+        without its filesystem name, could be one of `fs' components.
+        """
+        comp = copy.copy(comp)
+        comp.fs = fs
+        try:
+            if comp.TYPE == Journal.TYPE:
+                comp.target = copy.copy(comp.target)
+                comp.target.fs = fs
+                return comp.target in fs.components
+            elif comp.TYPE == Client.TYPE and comp not in fs.components:
+                fs.client_group(node, comp.mount_path)
+                return True
+            return comp in fs.components
+        except (KeyError, AttributeError):
+            return False
+
+    def _handle_shine_proxy_error(self, nodes, message):
+        for fs in self.filesystems:
+            fs._handle_shine_proxy_error(nodes, message)
+
+    def _proxy_fs(self, comps):
+        """
+        Return the filesystem, or the group of filesystems, of `comps'.
+        """
+        names = set([comp.fs.fs_name for comp in comps])
+        if len(names) == 1:
+            return comps.__iter__().next().fs
+        key = ','.join(sorted(names))
+        if key not in self._groups:
+            self._groups[key] = FileSystemGroup([fs for fs in self.filesystems
+                                                 if fs.fs_name in names])
+        return self._groups[key]
+
+    def _run_actions(self):
+        for fs in self.filesystems:
+            fs.proxy_errors = MsgTree()
+        FileSystem._run_actions(self)
+
+    def _run_all(self, action, comps, expected_states, **kwargs):
+        """
+        Run `action' on components `comps' of all filesystems, and return
+        their state, see FileSystem._check_errors().
+        """
+        actions = self._prepare(action, _merge_groups(comps.values()),
+                                **kwargs)
+        actions.launch()
+        self._run_actions()
+
+        results = {}
+        for fs, fscomps in comps.items():
+            results[fs] = fs._check_errors(expected_states, fscomps)
+        return results
+
+    def _managed(self, comps, supports):
+        """Filter `comps' like FileSystem action methods do."""
+        managed = {}
+        for fs, fscomps in comps.items():
+            managed[fs] = (fscomps or fs.components).managed(supports=supports)
+        return managed
+
+    def status(self, comps, **kwargs):
+        """Get status of all filesystems."""
+        return self._run_all('status', self._managed(comps, 'status'),
+                             [MOUNTED], **kwargs)
+
+    def stop(self, comps, **kwargs):
+        """Stop all filesystems."""
+        return self._run_all('stop', self._managed(comps, 'stop'), [OFFLINE],
+                             deps=self.START_DEPS, reverse=True,
+                             need_unload=True, **kwargs)
+
+    def umount(self, comps, **kwargs):
+        """Unmount clients of all filesystems."""
+        return self._run_all('umount', self._managed(comps, 'umount'),
+                             [OFFLINE], need_unload=True, **kwargs)
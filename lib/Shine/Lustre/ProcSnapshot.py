@@ -0,0 +1,245 @@
+# ProcSnapshot.py -- Cached view of Lustre related /proc files
+# Copyright (C) 2013 CEA
+#
+# This file is part of shine
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+
+"""
+Cached view of the /proc files read by component checks.
+
+lustre_check() methods of all components on a node read the same files
+(mount table, Lustre obd tree, modules, ...). ProcSnapshot reads each of
+them only once and indexes them, until it is invalidated. Actions which
+change the node state (mount, umount, modprobe, ...) should invalidate it
+when they end.
+
+It also caches directory listings, so path patterns, like the ones of
+tuning parameters, are expanded without listing the same /proc directories
+again and again.
+"""
+
+import os
+import re
+import fnmatch
+
+_MAGIC_RE = re.compile('[*?[]')
+
+
+class ProcSnapshot(object):
+    """
+    Lazily loaded and indexed copy of /proc files used by lustre_check().
+
+    Each part is read on first use and kept until invalidate() is called.
+    """
+
+    def __init__(self, root='/proc'):
+        self.root = root
+        self._mounts = None
+        self._obds = None
+        self._obd_index = None
+        self._modules = None
+        self._partitions = None
+        self._dirs = {}
+
+    def invalidate(self):
+        """Forget everything read so far."""
+        self._mounts = None
+        self._obds = None
+        self._obd_index = None
+        self._modules = None
+        self._partitions = None
+        self._dirs = {}
+
+    def path(self, *names):
+        """Return a path below the snapshot root."""
+        return os.path.join(self.root, *names)
+
+    #
+    # Directory listings
+    #
+
+    def _listdir(self, path):
+        """Return the entry names of directory `path', or None."""
+        if path not in self._dirs:
+            try:
+                self._dirs[path] = os.listdir(path)
+            except OSError:
+                self._dirs[path] = None
+        return self._dirs[path]
+
+    def listdir(self, path):
+        """
+        Return the entry names of directory `path', like os.listdir(), or
+        an empty list if it could not be listed.
+        """
+        return self._listdir(path) or []
+
+    def glob(self, pattern):
+        """
+        Return the existing paths matching `pattern', like glob.glob() but
+        using the cached directory listings.
+        """
+        if pattern.startswith('/'):
+            paths = ['/']
+        else:
+            paths = ['']
+        for part in pattern.split('/'):
+            if not part:
+                continue
+            matched = []
+            for path in paths:
+                if part in ('.', '..'):
+                    names = [part]
+                elif _MAGIC_RE.search(part):
+                    names = self.listdir(path or os.curdir)
+                    # Like glob, hidden entries should be explicitly asked
+                    if part[0] != '.':
+                        names = [name for name in names if name[0] != '.']
+                    names = fnmatch.filter(names, part)
+                elif part in self.listdir(path or os.curdir):
+                    names = [part]
+                else:
+                    names = []
+                for name in names:
+                    matched.append(os.path.join(path, name))
+            paths = matched
+        return paths
+
+    #
+    # Mount table
+    #
+
+    def _load_mounts(self):
+        """Read and index the mount table, by device and mount point."""
+        bydev = {}
+        bypath = {}
+        fmounts = open(self.path('mounts'))
+        try:
+            for line in fmounts:
+                dev, mntpt, fstype = line.split(' ', 3)[0:3]
+                entry = (dev, mntpt, fstype)
+                bydev.setdefault(dev, []).append(entry)
+                bypath.setdefault(mntpt, []).append(entry)
+        finally:
+            fmounts.close()
+        self._mounts = (bydev, bypath)
+
+    def mounts_by_dev(self, dev, fstype=None):
+        """
+        Return the list of (device, mount point, fs type) mounted from `dev',
+        in mount table order, optionally only for the specified fs type.
+        """
+        if self._mounts is None:
+            self._load_mounts()
+        return [entry for entry in self._mounts[0].get(dev, [])
+                if fstype is None or entry[2] == fstype]
+
+    def mounts_by_path(self, mntpt, fstype=None):
+        """Same as mounts_by_dev() but for a mount point."""
+        if self._mounts is None:
+            self._load_mounts()
+        return [entry for entry in self._mounts[1].get(mntpt, [])
+                if fstype is None or entry[2] == fstype]
+
+    #
+    # Lustre obd tree
+    #
+
+    def _load_obds(self):
+        """List obd devices of each type in /proc/fs/lustre."""
+        self._obds = {}
+        topdir = self.path('fs', 'lustre')
+        for obdtype in self.listdir(topdir):
+            names = self._listdir(os.path.join(topdir, obdtype))
+            # Skip what is not a directory
+            if names is not None:
+                self._obds[obdtype] = names
+
+    def obd_names(self, obdtype):
+        """Return the entry names for obd type `obdtype' (ie: 'lov')."""
+        if self._obds is None:
+            self._load_obds()
+        return self._obds.get(obdtype, [])
+
+    def obd_types(self):
+        """Return the obd type list."""
+        if self._obds is None:
+            self._load_obds()
+        return self._obds.keys()
+
+    def obd_files(self, name, filename):
+        """
+        Return existing paths /proc/fs/lustre/*/<name>/<filename>, like
+        glob() would do.
+        """
+        if self._obd_index is None:
+            index = {}
+            for obdtype in self.obd_types():
+                for obdname in self._obds[obdtype]:
+                    index.setdefault(obdname, []).append(obdtype)
+            self._obd_index = index
+
+        paths = []
+        for obdtype in self._obd_index.get(name, []):
+            obddir = self.path('fs', 'lustre', obdtype, name)
+            if filename in self.listdir(obddir):
+                paths.append(os.path.join(obddir, filename))
+        return paths
+
+    #
+    # Kernel modules and partitions
+    #
+
+    def modules(self):
+        """Return a dict of loaded modules and their use count."""
+        if self._modules is None:
+            modules = {}
+            fmodules = open(self.path('modules'))
+            try:
+                for line in fmodules:
+                    modname, _, count, _ = line.split(' ', 3)
+                    modules[modname] = int(count)
+            finally:
+                fmodules.close()
+            self._modules = modules
+        return self._modules
+
+    def partition_size(self, devname):
+        """
+        Return the size in bytes of partition `devname' (ie: 'sda1') or None
+        if it is unknown.
+        """
+        if self._partitions is None:
+            partitions = {}
+            fparts = open(self.path('partitions'))
+            try:
+                for line in fparts:
+                    d_info = line.split()
+                    if len(d_info) == 4 and d_info[2].isdigit():
+                        partitions[d_info[3]] = int(d_info[2]) * 1024
+            finally:
+                fparts.close()
+            self._partitions = partitions
+        return self._partitions.get(devname)
+
+
+# Snapshot shared by all component checks of this process.
+_SNAPSHOT = ProcSnapshot()
+
+def proc_snapshot():
+    """Return the /proc snapshot shared by all component checks."""
+    return _SNAPSHOT
@@ -39,6 +39,8 @@ class Router(Component):
     DISPLAY_ORDER = 1
     START_ORDER = 1
 
+    AGGREGATED = True
+
     #
     # Text form for different router states. 
     #
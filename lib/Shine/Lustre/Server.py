@@ -29,6 +29,7 @@ from ClusterShell.Task import NodeSet
 from Shine.Lustre import ServerError
 from Shine.Lustre.Actions.Modules import LoadModules, UnloadModules
 from Shine.Lustre.Actions.Tune import Tune
+from Shine.Lustre.ProcSnapshot import proc_snapshot
 
 class ServerGroup(object):
     """
@@ -74,17 +75,51 @@ class Server(object):
     Represents a node in the cluster, by its hostname and NIDs.
 
     Currently, it is link to no specific filesystem nor components.
+
+    The hostname is a plain string. A NodeSet is only kept if one is given,
+    for servers standing for several nodes (see ClientGroup).
+    Use Server.get() to share one instance per node.
     """
 
+    __slots__ = ('hostname', 'nids', 'modules')
+
     _CACHE_HOSTNAME_SHORT = None
     _CACHE_HOSTNAME_LONG = None
 
+    # Interned instances and NID lists, see get().
+    _INSTANCES = {}
+    _NIDS = {}
+
     def __init__(self, hostname, nids):
         assert type(nids) is list
         self.nids = nids
-        self.hostname = NodeSet(hostname)
+        if isinstance(hostname, NodeSet):
+            self.hostname = NodeSet(hostname)
+        else:
+            self.hostname = str(hostname)
         self.modules = dict()
 
+    @classmethod
+    def get(cls, hostname, nids):
+        """
+        Return the Server instance for `hostname' and `nids', shared by all
+        the filesystems. It is created if needed.
+        """
+        key = (hostname, tuple(nids))
+        try:
+            return cls._INSTANCES[key]
+        except KeyError:
+            nids = cls._NIDS.setdefault(key[1], list(nids))
+            server = cls._INSTANCES[key] = cls(intern(hostname), nids)
+            return server
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in state.iteritems():
+            setattr(self, name, value)
+
     def __str__(self):
         return "%s (%s)" % (self.hostname, ','.join(self.nids))
 
@@ -142,14 +177,9 @@ class Server(object):
         It analyzes which Lustre module is loaded and keeps it in self.modules
         """
         self.modules.clear()
-        try:
-            modlist = open('/proc/modules')
-            for line in modlist:
-                modname, _, count, _ = line.split(' ', 3)
-                if modname in ('libcfs', 'lustre', 'ldiskfs', 'fsfilt_ldiskfs'):
-                    self.modules[modname] = int(count)
-        finally:
-            modlist.close()
+        for modname, count in proc_snapshot().modules().iteritems():
+            if modname in ('libcfs', 'lustre', 'ldiskfs', 'fsfilt_ldiskfs'):
+                self.modules[modname] = count
 
     #
     # Actions
@@ -20,7 +20,6 @@
 
 import os
 import stat
-from glob import glob
 
 from Shine.Lustre.Actions.Format import Format, Tunefs, JournalFormat
 from Shine.Lustre.Actions.StartTarget import StartTarget
@@ -32,6 +31,7 @@ from Shine.Lustre.Component import Component, ComponentError, \
                                    MOUNTED, EXTERNAL, RECOVERING, OFFLINE, \
                                    TARGET_ERROR, RUNTIME_ERROR
 from Shine.Lustre.Server import Server, ServerGroup
+from Shine.Lustre.ProcSnapshot import proc_snapshot
 
 
 class Target(Component, Disk):
@@ -51,6 +51,9 @@ class Target(Component, Disk):
         RUNTIME_ERROR: "CHECK FAILURE" 
     }
 
+    UPDATE_FIELDS = Component.UPDATE_FIELDS + Disk.UPDATE_FIELDS + \
+                    ('index', 'recov_info')
+
     def __init__(self, fs, server, index, dev, jdev=None, group=None,
             tag=None, enabled=True, mode='managed', network=None):
         """
@@ -79,10 +82,15 @@ class Target(Component, Disk):
         if self.is_external():
             self.state = EXTERNAL
 
+    @classmethod
+    def build_label(cls, fs_name, index):
+        """Return the label of the target of this type, with `index'."""
+        return "%s-%s%04x" % (fs_name, cls.TYPE.upper(), index)
+
     @property
     def label(self):
         """Return the target label which match the Lustre target name."""
-        return "%s-%s%04x" % (self.fs.fs_name, self.TYPE.upper(), self.index)
+        return self.build_label(self.fs.fs_name, self.index)
 
     def __lt__(self, other):
         return self.START_ORDER < other.START_ORDER
@@ -143,6 +151,8 @@ class Target(Component, Disk):
 
         if len(intersec) == 1:
             self.server = intersec[0]
+            if self.fs is not None and self in self.fs.components:
+                self.fs.components.reindex(self)
             return True
 
         return False
@@ -193,7 +203,7 @@ class Target(Component, Disk):
         try:
             self._device_check()
             if mountdata:
-                self._mountdata_check(self.label)
+                self._mountdata_check(self.label, cache=True)
 
             if self.journal:
                 self.journal.full_check()
@@ -205,6 +215,27 @@ class Target(Component, Disk):
         # check for Lustre level status
         self.lustre_check()
 
+    def mountdata_command(self, cache=True):
+        """
+        Return the command line reading target mountdata, or None if they
+        were read from the mountdata cache.
+        """
+        try:
+            if cache and self._mountdata_cached(self.label):
+                return None
+        except DiskDeviceError, error:
+            self.state = TARGET_ERROR
+            raise ComponentError(self, str(error))
+        return self._mountdata_cmd()
+
+    def check_mountdata_output(self, output, retcode):
+        """Analyze target mountdata, read by mountdata_command()."""
+        try:
+            self._mountdata_read(output, retcode, self.label)
+        except DiskDeviceError, error:
+            self.state = TARGET_ERROR
+            raise ComponentError(self, str(error))
+
     def lustre_check(self):
         """
         Check target health at Lustre level.
@@ -212,12 +243,14 @@ class Target(Component, Disk):
 
         self.state = None   # Unknown
 
+        proc = proc_snapshot()
+
         # find pathnames matching wanted lustre procfs
         # (Since Lustre 2.4. More than one path could be returned.
         #  The first one is fine.)
-        mntdev_path = glob('/proc/fs/lustre/*/%s/mntdev' % self.label)
+        mntdev_path = proc.obd_files(self.label, 'mntdev')
 
-        recov_path = glob('/proc/fs/lustre/*/%s/recovery_status' % self.label)
+        recov_path = proc.obd_files(self.label, 'recovery_status')
         assert len(recov_path) <= 1
 
         # check for label presence in /proc : is this lustre target started?
@@ -238,19 +271,13 @@ class Target(Component, Disk):
             loaded = True
 
             # check for presence in /proc/mounts
-            f_proc_mounts = open("/proc/mounts", 'r')
-            try:
-                for line in f_proc_mounts:
-                    if line.find("%s " % self.mntdev) == 0:
-                        if line.split(' ', 3)[2] == "lustre":
-                            if loaded:
-                                self.state = MOUNTED
-                            else:
-                                self.state = TARGET_ERROR
-                                raise ComponentError(self, "multiple " \
-                                        " mounts detected for %s" % self.label)
-            finally:
-                f_proc_mounts.close()
+            for dummy in proc.mounts_by_dev(self.mntdev, "lustre"):
+                if loaded:
+                    self.state = MOUNTED
+                else:
+                    self.state = TARGET_ERROR
+                    raise ComponentError(self, "multiple " \
+                            " mounts detected for %s" % self.label)
 
             if self.state != MOUNTED and loaded:
                 self.state = TARGET_ERROR
@@ -377,8 +404,8 @@ class MGT(Target):
     START_ORDER = 2
     DISPLAY_ORDER = 2
 
-    @property
-    def label(self):
+    @classmethod
+    def build_label(cls, fs_name, index):
         """Always returns the MGS label which is 'MGS'."""
         return 'MGS'
 
@@ -0,0 +1,75 @@
+# SshPool.py -- Reuse ssh connections between remote command waves
+# Copyright (C) 2014 CEA
+#
+# This file is part of shine
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+
+"""
+Pool of ssh master connections.
+
+A shine command could run several waves of remote commands on the same
+servers (install, start, tune, ...). Each of them opens new ssh connections.
+When the pool is enabled, the first connection to a node becomes a master
+connection (see ControlMaster in ssh_config(5)), kept in background, and the
+following ones are multiplexed on it, without a new ssh handshake.
+"""
+
+import os
+import shutil
+import tempfile
+
+
+class SshPool(object):
+    """
+    ssh master connections of one shine command, for the ssh workers of
+    `task'.
+
+    Master connections are created by ssh, on first use, with a control
+    socket per node in a private directory. close() stops them all.
+    """
+
+    def __init__(self, task):
+        self.task = task
+        self.path = None
+        self._ssh_options = None
+
+    def enable(self):
+        """Make the ssh workers of the task use master connections."""
+        if self.path is not None:
+            return
+        self.path = tempfile.mkdtemp(prefix='shine-ssh-')
+        self._ssh_options = self.task.info('ssh_options')
+        options = ['-oControlMaster=auto',
+                   '-oControlPath=%s' % os.path.join(self.path, '%h'),
+                   '-oControlPersist=yes']
+        if self._ssh_options:
+            options.insert(0, self._ssh_options)
+        self.task.set_info('ssh_options', ' '.join(options))
+
+    def close(self):
+        """Stop all master connections and restore task ssh options."""
+        if self.path is None:
+            return
+        ssh = self.task.info('ssh_path') or 'ssh'
+        for node in os.listdir(self.path):
+            socket = os.path.join(self.path, node)
+            self.task.shell("%s -S '%s' -O exit '%s' >/dev/null 2>&1" %
+                            (ssh, socket, node))
+        self.task.resume()
+        shutil.rmtree(self.path, True)
+        self.path = None
+        self.task.set_info('ssh_options', self._ssh_options)
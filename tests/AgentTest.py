@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# Shine.Agent test suite
+# Copyright (C) 2013 CEA
+
+"""Unit test for Agent"""
+
+import os
+import sys
+import unittest
+from StringIO import StringIO
+
+from Utils import makeTempFilename
+
+from Shine.Agent import AgentServer, AgentError, agent_relay
+from Shine.Lustre.ProcSnapshot import proc_snapshot
+
+
+class EchoServer(AgentServer):
+    """Agent which prints its command line instead of running it."""
+
+    def handle(self, argv):
+        print ' '.join(argv[1:])
+        print os.environ.get('SHINE_TEST_VAR')
+        print >> sys.stderr, "to stderr"
+        return int(argv[-1])
+
+
+class SnapshotServer(AgentServer):
+    """Agent which prints the mount table it has in its /proc snapshot."""
+
+    def handle(self, argv):
+        print proc_snapshot()._mounts
+        return 0
+
+
+class AgentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sockpath = makeTempFilename()
+        os.unlink(self.sockpath)
+
+    def tearDown(self):
+        if os.path.exists(self.sockpath):
+            os.unlink(self.sockpath)
+
+    def _serve(self, count=1, cls=EchoServer):
+        """Fork an agent handling `count' connections."""
+        server = cls(self.sockpath)
+        server.bind()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                for dummy in range(count):
+                    server.serve_one()
+            finally:
+                os._exit(0)
+        server._sock.close()
+        return pid
+
+    def test_relay_no_agent(self):
+        """relay without agent returns None"""
+        self.assertEqual(agent_relay(self.sockpath, ['shine', 'status']), None)
+
+    def test_relay(self):
+        """relay output, environment and return code"""
+        pid = self._serve(2)
+        os.environ['SHINE_TEST_VAR'] = 'foo'
+        try:
+            output = StringIO()
+            rc = agent_relay(self.sockpath, ['shine', 'status', '-R', '0'],
+                             output)
+            self.assertEqual(rc, 0)
+            self.assertEqual(output.getvalue(),
+                             "status -R 0\nfoo\nto stderr\n")
+
+            output = StringIO()
+            rc = agent_relay(self.sockpath, ['shine', 'stop', '-R', '2'],
+                             output)
+            self.assertEqual(rc, 2)
+            self.assertEqual(output.getvalue(),
+                             "stop -R 2\nfoo\nto stderr\n")
+        finally:
+            del os.environ['SHINE_TEST_VAR']
+            os.waitpid(pid, 0)
+
+    def test_fresh_snapshot(self):
+        """requests do not use the /proc snapshot of the agent"""
+        proc_snapshot()._mounts = ['stale']
+        try:
+            pid = self._serve(1, SnapshotServer)
+        finally:
+            proc_snapshot().invalidate()
+        try:
+            output = StringIO()
+            agent_relay(self.sockpath, ['shine', 'status'], output)
+            self.assertEqual(output.getvalue(), "None\n")
+        finally:
+            os.waitpid(pid, 0)
+
+    def test_socket_in_use(self):
+        """an agent does not steal the socket of a running one"""
+        # The probe of the 2nd agent is also seen as a connection.
+        pid = self._serve(2)
+        try:
+            self.assertRaises(AgentError, EchoServer(self.sockpath).bind)
+            self.assertEqual(agent_relay(self.sockpath, ['shine', '0'],
+                                         StringIO()), 0)
+        finally:
+            os.waitpid(pid, 0)
+
+    def test_stale_socket(self):
+        """an agent replaces a stale socket"""
+        server = EchoServer(self.sockpath)
+        server.bind()
+        server._sock.close()
+        server = EchoServer(self.sockpath)
+        server.bind()
+        self.assertEqual(os.stat(self.sockpath).st_mode & 0777, 0600)
+        server.close()
+        self.assertFalse(os.path.exists(self.sockpath))
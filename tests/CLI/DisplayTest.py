@@ -251,6 +251,19 @@ class ComplexFillTests(unittest.TestCase):
         self.assertEqual(str(tbl), 'MGT foo1 1\nMDT foo2 1\nOST foo3 2')
 
 
+    def test_client_group(self):
+        """fill with client groups split by state"""
+        grp = self._fs.new_client_group('foo[4-9]', '/foo')
+        grp.state = MOUNTED
+        grp.carve('foo9').state = None
+        tbl = TextTable(fmt="%3type %count %status %nodes")
+        tbl.show_header = False
+        table_fill(tbl, self._fs, lambda t: (t.DISPLAY_ORDER, t.text_status()),
+                   viewsupports='mount_path')
+        self.assertEqual(str(tbl), 'CLI 5     mounted foo[4-8]\n'
+                                   'CLI 1     unknown foo9')
+
+
 class DisplayTest(unittest.TestCase):
 
     def setUp(self):
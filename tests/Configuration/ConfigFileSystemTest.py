@@ -5,6 +5,7 @@
 
 """Unit test for Shine.Configuration.FileSystem"""
 
+import os
 import unittest
 
 from Utils import makeTempFile, setup_tempdirs, clean_tempdirs
@@ -12,6 +13,7 @@ from Shine.Configuration.FileSystem import FileSystem, ModelFileIOError, ConfigD
 from Shine.Configuration.Exceptions import ConfigException, ConfigInvalidFileSystem
 from Shine.Configuration.TargetDevice import TargetDevice
 from Shine.Configuration.Backend.Backend import Backend
+from Shine.Configuration.Compiled import CompiledFile
 
 class FileSystemTest(unittest.TestCase):
 
@@ -72,6 +74,46 @@ client: node=foo[2-3]
 """)
         self.assertEqual(len(self._fs.model), 4)
 
+    def test_compiled_cache(self):
+        """installed configuration is loaded from its compiled cache"""
+        self._fs = self.makeConfFileSystem("""
+fs_name: compiled
+nid_map: nodes=foo[1-3] nids=foo[1-3]@tcp
+mgt: node=foo1 dev=/dev/dummy
+client: node=foo[2-3]
+""")
+        compiled = CompiledFile(self._fs.xmf_path)
+        self.assertTrue(os.path.exists(compiled.path))
+        self.assertEqual(compiled.load(), self._fs.model.dump())
+
+        # Cache is used, even if it is not what the xmf says
+        data = compiled.load()
+        data['fs_name'] = 'cached'
+        compiled.save(data)
+        fsconf = FileSystem.load_from_fsname('compiled')
+        self.assertEqual(fsconf.fs_name, 'cached')
+
+        # Modified xmf is parsed again
+        fobj = open(self._fs.xmf_path, 'a')
+        fobj.write("description: modified\n")
+        fobj.close()
+        fsconf = FileSystem.load_from_fsname('compiled')
+        self.assertEqual(fsconf.fs_name, 'compiled')
+        self.assertEqual(fsconf.get('description'), 'modified')
+        self.assertEqual(len(fsconf.get('client')), 2)
+        self.assertEqual(compiled.load(), fsconf.model.dump())
+
+        # Unreadable cache is ignored
+        fobj = open(compiled.path, 'w')
+        fobj.write("garbage")
+        fobj.close()
+        fsconf = FileSystem.load_from_fsname('compiled')
+        self.assertEqual(fsconf.fs_name, 'compiled')
+
+        self._fs.unregister()
+        self.assertFalse(os.path.exists(compiled.path))
+        self._fs = None
+
     def testMDTnoMGT(self):
         """filesystem with a MDT and no MGT"""
         self.assertRaises(ConfigInvalidFileSystem, self.makeConfFileSystem, """
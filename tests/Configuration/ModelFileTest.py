@@ -411,6 +411,33 @@ class ModelFileTest(unittest.TestCase):
         self.assertEqual(str(model), "ost:index=4 dev=/dev/sdb\n"
                 "ost:index=5 dev=/dev/sdd")
 
+    def test_dump_restore(self):
+        """dump a ModelFile content and restore it in an empty copy"""
+        class MyCompound(ModelFile):
+            def __init__(self, sep='=', linesep=' '):
+                ModelFile.__init__(self, sep, linesep)
+                self.add_element('dev', check='path')
+                self.add_element('index', check='digit')
+                self.add_element('mode', check='enum', default='managed',
+                                 values=['managed', 'external'])
+
+        model = ModelFile()
+        model.add_element('fsname', check='string')
+        model.add_element('quota', check='boolean')
+        model.add_custom('ost', MyCompound(), multiple=True)
+        model.parse("fsname: foo\nquota: yes\nost: dev=/dev/sdb index=4\n"
+                    "ost: dev=/dev/sdc index=5")
+
+        data = model.dump()
+        self.assertEqual(data, {'fsname': 'foo', 'quota': True,
+                                'ost': [{'dev': '/dev/sdb', 'index': 4},
+                                        {'dev': '/dev/sdc', 'index': 5}]})
+        model2 = model.emptycopy()
+        model2.restore(data)
+        self.assertEqual(model2, model)
+        self.assertEqual(model2.get('ost')[1].get('mode'), 'managed')
+        self.assertEqual(str(model2), str(model))
+
     def testDiffSimpleElement(self):
         """diff between 2 modelfiles with a SimpleElement"""
         model = ModelFile()
@@ -5,11 +5,13 @@
 
 """Unit test for Model"""
 
+import os
 import unittest
 
 from Utils import makeTempFile
 from ClusterShell.NodeSet import NodeSet
 from Shine.Configuration.TuningModel import TuningModel, TuningParameter, TuningError
+from Shine.Configuration.Compiled import CompiledFile
 
 class TuningModelTest(unittest.TestCase):
 
@@ -147,3 +149,88 @@ alias panic_on_lbug=/proc/sys/lnet/panic_on_lbug
 0 panic_on_lbug ROUTER""")
         self.assertRaises(TuningError, model.parse)
 
+
+    def test_node_index(self):
+        """test tuning lookup by node name"""
+        model = self.makeTempTuningModel("""
+alias foo=/proc/foo
+alias bar=/proc/bar
+alias baz=/proc/baz
+1 foo foo[1-5];MDS
+2 bar foo[4-8]
+3 baz OSS""")
+        model.parse()
+        names = lambda params: sorted(param.name for param in params)
+        self.assertEqual(names(model.get_params_for_name('foo2', [])),
+                         ['/proc/foo'])
+        self.assertEqual(names(model.get_params_for_name('foo4', ['oss'])),
+                         ['/proc/bar', '/proc/baz', '/proc/foo'])
+        self.assertEqual(names(model.get_params_for_name('foo9', ['mds'])),
+                         ['/proc/foo'])
+        # Node name parameters should apply to all nodes of a node set
+        self.assertEqual(names(model.get_params_for_name('foo[4-6]', [])),
+                         ['/proc/bar'])
+        self.assertEqual(model.get_params_for_name('foo[1-9]', []), [])
+
+    def test_compiled_cache(self):
+        """test tuning compiled cache"""
+        model = self.makeTempTuningModel("""
+alias foo=/proc/foo
+alias bar=/proc/bar
+alias dirty=/proc/fs/lustre/osc/*/max_dirty_mb
+1 foo foo[1-5];CLT
+"2 3" bar RTR
+persistent 4 dirty CLT""")
+        compiled = CompiledFile(self.f.name)
+        try:
+            model.parse(compiled=True)
+            self.assertTrue(os.path.exists(compiled.path))
+
+            # Mark the cache content, to check it is used
+            data = compiled.load()
+            data['aliases']['cached'] = '/proc/cached'
+            compiled.save(data)
+
+            cached = TuningModel(filename=self.f.name)
+            cached.parse(compiled=True)
+            self.assertEqual(cached.aliases.pop('cached'), '/proc/cached')
+            self.assertEqual(cached.aliases, model.aliases)
+            for node, types in (('foo1', []), (None, ['client']),
+                                (None, ['router']), ('foo[2-3]', ['oss'])):
+                self.assertEqual(cached.get_params_for_name(node, types),
+                                 model.get_params_for_name(node, types))
+            self.assertEqual(cached.get_persistent_params(),
+                             model.get_persistent_params())
+        finally:
+            compiled.remove()
+
+    def test_persistent(self):
+        """test persistent tuning"""
+        model = self.makeTempTuningModel("""
+alias max_dirty=/proc/fs/lustre/osc/${ost}*/max_dirty_mb
+alias checksums=osc.*.checksums
+persistent 64 max_dirty CLT
+persistent "0" checksums CLT;OSS
+1 checksums MDS""")
+        model.parse()
+        self.assertEqual(len(model.get_params_for_name(None, ['client'])), 0)
+        self.assertEqual(len(model.get_params_for_name(None, ['mds'])), 1)
+        params = model.get_persistent_params()
+        self.assertEqual([str(param) for param in params],
+                         ['/proc/fs/lustre/osc/${ost}*/max_dirty_mb=64 '
+                          'types=client persistent',
+                          'osc.*.checksums="0" types=oss,client persistent'])
+        self.assertEqual(params[0].lctl_name('foo'),
+                         'osc.foo-OST*.max_dirty_mb')
+        self.assertEqual(params[1].lctl_name('foo'), 'osc.*.checksums')
+
+    def test_persistent_errors(self):
+        """test bad persistent tunings"""
+        model = self.makeTempTuningModel("""
+alias debug=/proc/sys/lnet/debug
+persistent 0 debug CLT""")
+        self.assertRaises(TuningError, model.parse)
+        model = self.makeTempTuningModel("""
+alias checksums=osc.*.checksums
+persistent 0 checksums foo[1-2]""")
+        self.assertRaises(TuningError, model.parse)
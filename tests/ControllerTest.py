@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# Shine.Controller test suite
+# Copyright (C) 2014 CEA
+
+"""Unit test for Controller startup"""
+
+import os
+import sys
+import unittest
+import subprocess
+
+from Shine.Commands import COMMAND_LIST
+
+# Run a shine command line in a fresh interpreter and report, like
+# `python -X importtime', the time spent importing each module.
+IMPORT_REPORT = """
+import sys
+import time
+import __builtin__
+
+_import = __builtin__.__import__
+_times = []
+_depth = [0]
+
+def _timed_import(name, *args):
+    known = set(sys.modules)
+    _depth[0] += 1
+    start = time.time()
+    try:
+        return _import(name, *args)
+    finally:
+        _depth[0] -= 1
+        # Relative imports are only known by their last name part.
+        for modname in sorted(set(sys.modules) - known, key=len):
+            if sys.modules[modname] is not None and \
+               (modname == name or modname.endswith('.' + name)):
+                _times.append((time.time() - start, _depth[0], modname))
+                break
+
+__builtin__.__import__ = _timed_import
+
+sys.argv = ['shine'] + sys.argv[1:]
+from Shine.Controller import Controller
+try:
+    Controller().run_command()
+except SystemExit:
+    pass
+
+__builtin__.__import__ = _import
+sys.stdout = sys.__stdout__
+for duration, depth, modname in _times:
+    print "import time: %8d | %s%s" % (duration * 1e6, '  ' * depth, modname)
+for modname in sorted(sys.modules):
+    if sys.modules[modname] is not None:
+        print "imported: %s" % modname
+"""
+
+
+class ImportTest(unittest.TestCase):
+
+    def _imported(self, *args):
+        """Return the Shine modules imported by shine command `args'."""
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.pathsep.join(sys.path)
+        proc = subprocess.Popen([sys.executable, '-c', IMPORT_REPORT] +
+                                list(args), stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, env=env)
+        output = proc.communicate()[0]
+        self.report = output
+        modules = set()
+        for line in output.splitlines():
+            if line.startswith('imported: Shine'):
+                modules.add(line.split()[1])
+        return modules
+
+    def test_status_remote(self):
+        """shine status -R only imports what it uses"""
+        modules = self._imported('status', '-R', '-f', 'shine_import_test')
+        self.assertTrue('Shine.Commands.Status' in modules, self.report)
+        unused = [modname for modname in modules
+                  if modname.startswith('Shine.CLI') or
+                     (modname.startswith('Shine.Commands.') and
+                      not modname.startswith('Shine.Commands.Base') and
+                      modname != 'Shine.Commands.Status')]
+        self.assertEqual(unused, [], self.report)
+
+
+class RegistryTest(unittest.TestCase):
+
+    def test_names(self):
+        """command names match their class NAME"""
+        for name in COMMAND_LIST:
+            self.assertEqual(COMMAND_LIST[name].NAME, name)
+        self.assertEqual(len(COMMAND_LIST), 17)
+        self.assertFalse('foo' in COMMAND_LIST)
+        self.assertRaises(KeyError, COMMAND_LIST.__getitem__, 'foo')
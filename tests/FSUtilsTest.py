@@ -6,6 +6,7 @@
 
 """Unit test for FSUtils"""
 
+import os
 import unittest
 
 from Utils import setup_tempdirs, clean_tempdirs, makeTempFile
@@ -144,6 +145,27 @@ mount_path: /param
         self.assertEqual(len(comps), 1)
         self.assert_comp(comps[0], MDT.TYPE, 0)
 
+    def test_label_lazy(self):
+        # shine start -f param -l param-OST0002
+        fsconf, fs = open_lustrefs(self.fsconf.get_fs_name(),
+                                   labels=NodeSet("param-OST0002"),
+                                   lazy=True)
+        self.assertEqual(sorted(fs.components._deferred),
+                         ['param-MDT0000', 'param-OST0000', 'param-OST0001',
+                          'param-OST0003'])
+        self.assertEqual(str(fs.components.managed().labels()),
+                         'param-OST0002')
+        self.assertEqual(len(fs.components._deferred), 4)
+
+        # Same components as without lazy mode
+        comps = self.complist(fs)
+        self.assertEqual(len(comps), 1)
+        self.assert_comp(comps[0], OST.TYPE, 2)
+        self.assertEqual(len(fs.components), 9)
+        self.assertEqual(
+                str(fs.components['param-OST0003'].failservers.nodeset()),
+                'foo[2,4]')
+
     def test_nodes_target(self):
         # shine -f param -t ost -n foo2
         fsconf, fs = open_lustrefs(self.fsconf.get_fs_name(),
@@ -166,3 +188,42 @@ mount_path: /param
         self.assert_comp(comps[3], OST.TYPE, None, "/dev/sdc")
         self.assert_comp(comps[4], OST.TYPE, None, "/dev/sdd")
         self.assertEqual(comps[5].TYPE, Router.TYPE)
+
+    def test_client_groups(self):
+        # shine -f param -x foo[3,5,8-10]
+        fsconf, fs = open_lustrefs(self.fsconf.get_fs_name(),
+                                   excluded=NodeSet("foo[3,5,8-10]"))
+        clients = dict((str(comp.server.hostname), comp.action_enabled)
+                       for comp in fs.components.filter(supports='mount'))
+        self.assertEqual(clients, {'foo7': True, 'foo[8-10]': False})
+
+    def test_node_slice(self):
+        # shine status -f param -R, on foo3 and foo8
+        slices = dict(self.fsconf.iter_node_slices(NodeSet('foo[3,8]')))
+        lines = [line for line in slices['foo8'].splitlines()
+                 if line.split(':')[0] in ('client', 'mdt', 'ost', 'router',
+                                           'nid_map')]
+        self.assertEqual(sorted(lines), ['client:node=foo8',
+                                         'nid_map:nodes=foo1 nids=foo1@tcp',
+                                         'nid_map:nodes=foo8 nids=foo8@tcp'])
+        self.assertTrue('mount_path:/param' in slices['foo8'])
+        self.assertEqual(slices['foo8'].count('mgt:'), 1)
+
+        slice_file = self.fsconf.get_slice_filename()
+        fobj = open(slice_file, 'w')
+        fobj.write(slices['foo3'])
+        fobj.close()
+        fsconf, fs = open_lustrefs(self.fsconf.get_fs_name(),
+                                   nodes=NodeSet('foo3'), node_slice=True)
+        self.assertEqual(fsconf.get_cfg_filename(),
+                         self.fsconf.get_cfg_filename())
+        self.assertEqual(sorted(comp.label for comp in fs.components),
+                         ['MGS', 'param-OST0000', 'param-OST0001',
+                          'param-OST0002', 'param-OST0003'])
+        self.assertEqual([comp.index for comp in self.complist(fs)], [2, 3])
+
+        # Full configuration is used if slice is older
+        xmfstat = os.stat(self.fsconf.get_cfg_filename())
+        os.utime(slice_file, (xmfstat.st_atime, xmfstat.st_mtime - 10))
+        fsconf, fs = open_lustrefs(self.fsconf.get_fs_name(), node_slice=True)
+        self.assertEqual(len(fs.components), 9)
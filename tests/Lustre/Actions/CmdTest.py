@@ -24,6 +24,8 @@ from Shine.Lustre.Actions.Fsck import Fsck
 from Shine.Lustre.Actions.Format import JournalFormat, Format, Tunefs
 from Shine.Lustre.Actions.Execute import Execute
 from Shine.Lustre.Actions.Proxy import FSProxyAction
+from Shine.Lustre.Actions.Install import Install, InstallSlices, \
+                                       file_digest
 
 class ActionsTest(unittest.TestCase):
 
@@ -773,3 +775,94 @@ class ActionsTest(unittest.TestCase):
         """test proxy with a component list and mountdata=auto"""
         action = self._create_proxy(debug=False, mountdata='auto')
         self.check_cmd(action, "nosetests dummy -f action -R")
+
+
+class FakeWorker(object):
+    """Provide what digest queries need from a worker."""
+
+    def __init__(self, node=None, msg=None, retcodes=(), timeouts=()):
+        self.current_node = node
+        self.current_msg = msg
+        self._retcodes = retcodes
+        self._timeouts = timeouts
+
+    def iter_retcodes(self):
+        return iter(self._retcodes)
+
+    def iter_keys_timeout(self):
+        return iter(self._timeouts)
+
+
+class InstallTest(unittest.TestCase):
+
+    def setUp(self):
+        self.commands = []
+        self.copies = []
+
+    def shell(self, command, nodes, handler):
+        """Replace the action task, to get the digest query."""
+        if not self.commands:
+            self.query = handler
+        self.commands.append((command, str(nodes)))
+
+    def copy(self, source, dest, nodes, handler):
+        """Replace the action task, to get the copies."""
+        self.copies.append((source, dest, str(nodes)))
+
+    def test_file_digest(self):
+        """file digest is the md5 of its content"""
+        tmp = Utils.makeTempFile("foo\n")
+        self.assertEqual(file_digest(tmp.name),
+                         'd3b07384d113edec49eaa6238ad5ff00')
+        self.assertEqual(file_digest('/nonexistent/file'), None)
+
+    def test_skip_up_to_date(self):
+        """install only copies to nodes with a different file"""
+        tmp = Utils.makeTempFile("foo\n")
+        action = Install(NodeSet('node[1-3]'), None, tmp.name)
+        copies = []
+        action._copy = lambda nodes, skipped: copies.append((str(nodes),
+                                                             str(skipped)))
+        action.task = self
+        action.launch()
+        self.assertTrue(self.query.command.startswith("md5sum '%s'" %
+                                                      tmp.name))
+
+        self.query.ev_read(FakeWorker('node1',
+                           'd3b07384d113edec49eaa6238ad5ff00  %s' % tmp.name))
+        self.query.ev_read(FakeWorker('node2',
+                           'c157a79031e1c40f85931829bc5fc552  %s' % tmp.name))
+        self.query.ev_close(FakeWorker())
+        self.assertEqual(copies, [('node[2-3]', 'node1')])
+
+    def test_query_failure(self):
+        """nodes which could not be queried are not copied"""
+        tmp = Utils.makeTempFile("foo\n")
+        action = Install(NodeSet('node[1-4]'), None, tmp.name)
+        copies = []
+        action._copy = lambda nodes, skipped: copies.append((str(nodes),
+                                                             str(skipped)))
+        action.task = self
+        action.launch()
+        self.query.ev_read(FakeWorker('node1',
+                           'd3b07384d113edec49eaa6238ad5ff00  %s' % tmp.name))
+        self.query.ev_close(FakeWorker(retcodes=[(0, ['node1', 'node2']),
+                                                 (255, ['node3'])],
+                                       timeouts=['node4']))
+        self.assertEqual(copies, [('node2', 'node1')])
+
+    def test_slices_touched(self):
+        """up to date slices are touched, to stay newer than the model"""
+        tmps = [Utils.makeTempFile("foo\n"), Utils.makeTempFile("bar\n")]
+        slices = {'node1': tmps[0].name, 'node2': tmps[1].name}
+        action = InstallSlices(NodeSet('node[1-2]'), None, slices,
+                               '/etc/foo.sxmf')
+        action.task = self
+        action.launch()
+        self.query.ev_read(FakeWorker('node1',
+                           'd3b07384d113edec49eaa6238ad5ff00  /etc/foo.sxmf'))
+        self.query.ev_close(FakeWorker())
+        self.assertEqual(self.copies,
+                         [(slices['node2'], '/etc/foo.sxmf', 'node2')])
+        self.assertEqual(self.commands[1:],
+                         [("touch -c '/etc/foo.sxmf'", 'node1')])
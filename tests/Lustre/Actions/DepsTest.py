@@ -503,3 +503,39 @@ class ActionGroupTests(unittest.TestCase):
         self.assertEqual(grp1.status(), ACT_ERROR)
         self.assertEqual(act2.status(), ACT_WAITING)
         self.assertEqual(grp2.status(), ACT_ERROR)
+
+
+class EngineTests(unittest.TestCase):
+
+    class CountAction(CommonAction):
+        """Action ending as soon as it is launched."""
+        def __init__(self):
+            CommonAction.__init__(self)
+            self.count = 0
+        def _launch(self):
+            self.count += 1
+            self.set_status(ACT_OK)
+
+    def test_long_chain(self):
+        """A long chain of actions does not recurse"""
+        chain = [self.CountAction() for dummy in range(5000)]
+        for act1, act2 in zip(chain, chain[1:]):
+            act2.depends_on(act1)
+        chain[-1].launch()
+        self.assertEqual([act.count for act in chain], [1] * len(chain))
+
+    def test_large_group(self):
+        """Each member of a big group sharing deps is launched once"""
+        dep1 = self.CountAction()
+        dep2 = self.CountAction()
+        grp = ActionGroup()
+        members = [self.CountAction() for dummy in range(2000)]
+        for act in members:
+            act.depends_on(dep1)
+            act.depends_on(dep2)
+            grp.add(act)
+        grp.launch()
+        self.assertEqual(grp.status(), ACT_OK)
+        self.assertEqual(list(grp), members)
+        self.assertEqual(sum(act.count for act in members), len(members))
+        self.assertEqual(dep1.count + dep2.count, 2)
@@ -18,17 +18,25 @@
 # Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
 #
 
+import os
+import shutil
 import types
 import unittest
 import Utils
 
-from Shine.Lustre.Actions.Action import ACT_OK, ACT_ERROR
+from ClusterShell.NodeSet import NodeSet
+from ClusterShell.Task import task_self
+
+from Shine.Configuration.Globals import Globals
+from Shine.Lustre.Actions.Action import ACT_OK, ACT_ERROR, MountdataProbes
 from Shine.Lustre.EventHandler import EventHandler
 from Shine.Lustre.Server import Server
 from Shine.Lustre.FileSystem import FileSystem
 from Shine.Lustre.Component import MOUNTED, OFFLINE, TARGET_ERROR, RUNTIME_ERROR
 
 from Shine.Lustre.Actions.Proxy import shine_msg_pack
+from Shine.Configuration.TuningModel import TuningModel
+from Shine.Lustre.Actions.Tune import Tune
 
 class CommonTestCase(unittest.TestCase):
 
@@ -602,15 +610,18 @@ class ServerActionTest(unittest.TestCase):
     @Utils.rootonly
     def test_module_load_already_done(self):
         """Load modules when already loaded is ok"""
-        def lustre_check(self):
-            self.modules = {'lustre': 0, 'libcfs': 1}
-        self.srv.lustre_check = types.MethodType(lustre_check, self.srv)
-        act = self.srv.load_modules()
+        # Server has __slots__, its methods are replaced by a subclass.
+        class LoadedServer(Server):
+            __slots__ = ()
+            def lustre_check(self):
+                self.modules = {'lustre': 0, 'libcfs': 1}
+        srv = LoadedServer('localhost', ['127.0.0.1@lo'])
+        act = srv.load_modules()
         act.launch()
         self.fs._run_actions()
 
         # Status check
-        self.assertEqual(sorted(self.srv.modules.keys()), ['libcfs', 'lustre'])
+        self.assertEqual(sorted(srv.modules.keys()), ['libcfs', 'lustre'])
         self.assertEqual(act.status(), ACT_OK)
 
     @Utils.rootonly
@@ -641,6 +652,144 @@ class ServerActionTest(unittest.TestCase):
         self.assertEqual(act.status(), ACT_OK)
 
 
+class TuneTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = Utils.make_tempdir()
+        for name in ('tune-OST0000', 'tune-OST0001', 'other-OST0000'):
+            os.mkdir(os.path.join(self.dir, name))
+            open(os.path.join(self.dir, name, 'param'), 'w').close()
+        self.srv = Server('localhost', ['127.0.0.1@lo'])
+        self.fs = FileSystem('tune')
+        self.fs.new_target(self.srv, 'ost', 0, '/dev/null')
+        self.model = TuningModel()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _read(self, name):
+        return open(os.path.join(self.dir, name, 'param')).read()
+
+    def _tune(self, check=False, persistent=False):
+        act = self.srv.tune(self.model, self.fs.components, 'tune',
+                            check=check, persistent=persistent)
+        act.launch()
+        self.fs._run_actions()
+        return act
+
+    def test_tune_in_process(self):
+        """tuning files are written without commands"""
+        self.model.create_parameter(self.dir + '/${ost}*/param', '"12"',
+                                    ['oss'])
+        self.model.create_parameter(self.dir + '/nothing/*', '1', ['oss'])
+        self.model.create_parameter(self.dir + '/other-*/param', '3', ['mds'])
+        act = self._tune()
+        self.assertEqual(act.status(), ACT_OK)
+        self.assertEqual(len(act), 2)
+        self.assertEqual(self._read('tune-OST0000'), '12\n')
+        self.assertEqual(self._read('tune-OST0001'), '12\n')
+        self.assertEqual(self._read('other-OST0000'), '')
+
+    def test_tune_unchanged(self):
+        """tuning files with the right value are not written"""
+        path = os.path.join(self.dir, 'tune-OST0000', 'param')
+        open(path, 'w').write('7\n')
+        os.utime(path, (0, 0))
+        self.model.create_parameter(self.dir + '/${ost}*/param', '7', ['oss'])
+        act = self._tune()
+        self.assertEqual(act.status(), ACT_OK)
+        self.assertEqual(os.stat(path).st_mtime, 0)
+        self.assertEqual(self._read('tune-OST0001'), '7\n')
+
+    def test_tune_check(self):
+        """tuning check reports differences and writes nothing"""
+        open(os.path.join(self.dir, 'tune-OST0000', 'param'), 'w').write('8')
+        self.model.create_parameter(self.dir + '/${ost}*/param', '8', ['oss'])
+        act = self._tune(check=True)
+        self.assertEqual(act.status(), ACT_OK)
+        self.assertEqual(self._read('tune-OST0001'), '')
+        drift = [(str(msg), keys) for msg, keys in self.fs.tuning_drift.walk()]
+        path = os.path.join(self.dir, 'tune-OST0001', 'param')
+        self.assertEqual(drift, [("%s: \"\" (expected 8)" % path,
+                                  [Server.hostname_short()])])
+
+    def test_tune_check_shell_value(self):
+        """tuning check reports shell values as not checked"""
+        self.model.create_parameter(self.dir + '/${ost}*/param', '$((1+1))',
+                                    ['oss'])
+        act = self._tune(check=True)
+        self.assertEqual(act.status(), ACT_OK)
+        self.assertEqual(self._read('tune-OST0000'), '')
+        drift = [(str(msg), keys) for msg, keys in self.fs.tuning_drift.walk()]
+        paths = [os.path.join(self.dir, name, 'param')
+                 for name in ('tune-OST0000', 'tune-OST0001')]
+        lines = sorted("%s: not checked, shell value $((1+1))" % path
+                       for path in paths)
+        self.assertEqual(drift, [('\n'.join(lines),
+                                  [Server.hostname_short()])])
+
+    def test_tune_persistent(self):
+        """persistent tunings are set with lctl on the MGS, if they differ"""
+        lctl = open(os.path.join(self.dir, 'lctl'), 'w')
+        lctl.write('#!/bin/sh\necho "$@" >> %s/lctl.log\n'
+                   '[ "$1" = get_param ] && echo 64 && echo 64\n'
+                   'exit 0\n' % self.dir)
+        lctl.close()
+        os.chmod(os.path.join(self.dir, 'lctl'), 0755)
+        path = Globals().get('command_path')
+        Globals().replace('command_path', self.dir)
+        try:
+            self.model.create_parameter('osc.${ost}*.max_dirty_mb', '64',
+                                        ['client'], persistent=True)
+            self.model.create_parameter('osc.*.checksums', '"0"',
+                                        ['client'], persistent=True)
+            # Only the MGS server sets them
+            self.assertFalse(Tune.is_needed(self.srv, self.model,
+                                            self.fs.components, True))
+            self.fs.new_target(self.srv, 'mgt', 0, '/dev/null')
+            self.assertFalse(Tune.is_needed(self.srv, self.model,
+                                            self.fs.components))
+            self.assertTrue(Tune.is_needed(self.srv, self.model,
+                                           self.fs.components, True))
+            # Not without persistent
+            act = self._tune()
+            self.assertFalse(os.path.exists(os.path.join(self.dir,
+                                                         'lctl.log')))
+            act = self._tune(persistent=True)
+        finally:
+            Globals().replace('command_path', path)
+        self.assertEqual(act.status(), ACT_OK)
+        self.assertEqual(open(os.path.join(self.dir, 'lctl.log')).read(),
+                         'get_param -n osc.tune-OST*.max_dirty_mb\n'
+                         'get_param -n osc.*.checksums\n'
+                         'set_param -P osc.*.checksums=0\n')
+
+    def test_tune_shell_value(self):
+        """values interpreted by a shell are written by a command"""
+        self.model.create_parameter(self.dir + '/${ost}*/param', '$((2*3))',
+                                    ['oss'])
+        act = self._tune()
+        self.assertEqual(act.status(), ACT_OK)
+        self.assertEqual(self._read('tune-OST0000'), '6\n')
+        self.assertEqual(self._read('tune-OST0001'), '6\n')
+
+    def test_tune_error(self):
+        """a failing tuning parameter is an error"""
+        # A directory could not be written
+        path = os.path.join(self.dir, 'tune-OST0001', 'param')
+        os.unlink(path)
+        os.mkdir(path)
+        self.model.create_parameter(self.dir + '/${ost}*/param', '5', ['oss'])
+        self.model.create_parameter(self.dir + '/tune-OST0000/*', '6',
+                                    ['oss'])
+        act = self._tune()
+        self.assertEqual(act.status(), ACT_ERROR)
+        statuses = sorted(tuning.status() for tuning in act)
+        self.assertEqual(statuses, [ACT_OK, ACT_ERROR])
+        failed = [tuning for tuning in act if tuning.status() == ACT_ERROR]
+        self.assertTrue('tune-OST0001/param' in str(failed[0].result))
+
+
 class ProxyTest(unittest.TestCase):
 
     def setUp(self):
@@ -649,7 +798,8 @@ class ProxyTest(unittest.TestCase):
         disk = Utils.makeTempFilename()
         self.tgt = self.fs.new_target(self.srv1, 'mgt', 0, disk)
 
-        self.act = self.fs._proxy_action('start', self.srv1.hostname,
+        self.act = self.fs._proxy_action('start',
+                                         NodeSet(self.srv1.hostname),
                                          self.fs.components)
         def fakeprepare(action):
             return [action.fakecmd]
@@ -742,3 +892,101 @@ class ProxyTest(unittest.TestCase):
                          "'wrong_property'")
         self.assertEqual(self.tgt.state, RUNTIME_ERROR)
         self.assertEqual(self.act.status(), ACT_OK)
+
+
+class MountdataProbeTest(CommonTestCase):
+
+    TUNEFS = """#!/bin/sh
+touch %(dir)s/running/$$
+ls %(dir)s/running | wc -l >> %(dir)s/count
+sleep 0.2
+echo "   Target:     $(cat $2)"
+echo "   Flags:      0x20"
+echo "Permanent disk data:"
+echo "   Target:     wrong-label"
+rm -f %(dir)s/running/$$
+"""
+
+    def setUp(self):
+        self.eh = self.ActionEH()
+        self.fs = FileSystem('probe', event_handler=self.eh)
+        self.srv = Server("localhost", ["localhost@tcp"])
+
+        # Fake tunefs.lustre which reads target label from the device
+        self.dir = Utils.make_tempdir()
+        os.mkdir(os.path.join(self.dir, 'running'))
+        tunefs = open(os.path.join(self.dir, 'tunefs.lustre'), 'w')
+        tunefs.write(self.TUNEFS % {'dir': self.dir})
+        tunefs.close()
+        os.chmod(os.path.join(self.dir, 'tunefs.lustre'), 0755)
+        self._path = Globals().get('command_path')
+        Globals().replace('command_path', self.dir)
+        self._status_dir = Globals().get('status_dir')
+        Globals().replace('status_dir', os.path.join(self.dir, 'status'))
+        self._max = MountdataProbes.MAX_RUNNING
+        MountdataProbes.MAX_RUNNING = 2
+        # Loopback targets could have limited it
+        self._fanout = task_self().info('fanout')
+        task_self().set_info('fanout', 64)
+
+    def tearDown(self):
+        task_self().set_info('fanout', self._fanout)
+        MountdataProbes.MAX_RUNNING = self._max
+        Globals().replace('command_path', self._path)
+        Globals().replace('status_dir', self._status_dir)
+        shutil.rmtree(self.dir)
+
+    def _new_ost(self, index, label=None):
+        dev = os.path.join(self.dir, 'ost%d' % index)
+        fdev = open(dev, 'w')
+        fdev.write("%s\n" % (label or 'probe-OST%04x' % index))
+        fdev.close()
+        return self.fs.new_target(self.srv, 'ost', index, dev)
+
+    def test_concurrent_probes(self):
+        """mountdata probes run concurrently, in bounded number"""
+        osts = [self._new_ost(idx) for idx in range(3)]
+        bad = self._new_ost(3, 'probe-OST0009')
+
+        actions = [comp.status(mountdata='always') for comp in osts + [bad]]
+        for action in actions:
+            action.launch()
+        self.fs._run_actions()
+
+        for ost, action in zip(osts, actions):
+            self.assertEqual(action.status(), ACT_OK)
+            self.assertEqual(ost.ldd_svname, ost.label)
+            self.assertEqual(ost.flags(), ['first_time'])
+        self.assertEqual(actions[-1].status(), ACT_ERROR)
+        self.assertEqual(bad.state, TARGET_ERROR)
+        self.assertEqual(str(self.eh.result('ost', 'status', 'failed')),
+                         "Found service probe-OST0009 != probe-OST0003 on %s"
+                         % bad.dev)
+
+        counts = [int(line) for line in open(os.path.join(self.dir, 'count'))]
+        self.assertEqual(len(counts), 4)
+        self.assertEqual(max(counts), 2)
+
+        # The scheduler is dropped once all probes are done
+        self.assertFalse(task_self() in MountdataProbes._schedulers)
+
+    def _probe_count(self):
+        return len(open(os.path.join(self.dir, 'count')).readlines())
+
+    def test_cached_probes(self):
+        """mountdata are read from cache unless 'always' is used"""
+        osts = [self._new_ost(idx) for idx in range(2)]
+        for mountdata in ('auto', 'auto', 'never', 'always'):
+            for ost in osts:
+                ost.ldd_svname = None
+                ost.status(mountdata=mountdata).launch()
+            self.fs._run_actions()
+        self.assertEqual(self._probe_count(), 4)
+        self.assertEqual(osts[0].ldd_svname, 'probe-OST0000')
+
+        # format and tunefs invalidate the cache
+        osts[0].invalidate_mountdata()
+        for ost in osts:
+            ost.status().launch()
+        self.fs._run_actions()
+        self.assertEqual(self._probe_count(), 5)
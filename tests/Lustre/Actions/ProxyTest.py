@@ -0,0 +1,315 @@
+# Shine.Lustre.Actions.Proxy test suite
+# Copyright (C) 2013 CEA
+#
+# This file is part of shine
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+
+"""Unit tests for the shine proxy protocol"""
+
+import sys
+import unittest
+from StringIO import StringIO
+
+from ClusterShell.NodeSet import NodeSet
+
+from Shine.Lustre.Actions.Action import Result, ErrorResult
+from Shine.Lustre.EventHandler import EventHandler
+from Shine.Lustre.Server import Server
+from Shine.Lustre.FileSystem import FileSystem
+from Shine.Lustre.Component import MOUNTED, OFFLINE
+
+from Shine.Lustre.Actions.Proxy import shine_msg_pack, shine_msg_unpack, \
+                                       shine_msg_record, shine_msg_pack_v4, \
+                                       ProxyActionUnpackError, FSProxyAction, \
+                                       TUNING_EVENT
+from Shine.Commands.Base.RemoteCallEventHandler import RemoteCallEventHandler
+
+
+class CountEH(EventHandler):
+    def __init__(self):
+        EventHandler.__init__(self)
+        self.events = []
+    def event_callback(self, compname, action, status, **kwargs):
+        self.events.append((compname, action, status, kwargs['comp']))
+
+
+class ProtocolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = FileSystem('proto')
+        self.srv = Server('foo1', ['foo1@tcp'])
+        self.tgt = self.fs.new_target(self.srv, 'ost', 3, '/dev/sdb',
+                                      '/dev/sdc')
+        self.client = self.fs.new_client(self.srv, '/foo')
+
+    def test_unpack_v3(self):
+        """unpack a version 3 message"""
+        msg = shine_msg_pack(compname='ost', action='start', status='start',
+                             comp=self.tgt)
+        events = shine_msg_unpack(msg)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['action'], 'start')
+        self.assertEqual(events[0]['comp'].index, self.tgt.index)
+
+    def test_unpack_bad(self):
+        """unpack a bad message"""
+        self.assertRaises(ProxyActionUnpackError, shine_msg_unpack, "BAD")
+        self.assertRaises(ProxyActionUnpackError, shine_msg_unpack,
+                          "SHINE:9:xxx")
+
+    def test_pack_v4(self):
+        """several events in one version 4 message"""
+        schema = {}
+        self.tgt.state = MOUNTED
+        self.tgt.recov_info = "0/2"
+        self.tgt._ldd_flags = 0x2
+        self.client.mtpt = '/foo'
+        records = [shine_msg_record(schema, 'ost', 'start', 'done',
+                                    comp=self.tgt),
+                   shine_msg_record(schema, 'client', 'mount', 'failed',
+                                    comp=self.client,
+                                    result=ErrorResult('oops', None, 1)),
+                   shine_msg_record(schema, 'journal', 'format', 'start',
+                                    comp=self.tgt.journal)]
+        msg = shine_msg_pack_v4(schema, records)
+        self.assertTrue(msg.startswith('SHINE:4:'))
+        self.assertEqual(msg.count('\n'), 1)
+
+        events = shine_msg_unpack(msg)
+        self.assertEqual(len(events), 3)
+        self.assertEqual([(ev['compname'], ev['action'], ev['status'])
+                          for ev in events],
+                         [('ost', 'start', 'done'),
+                          ('client', 'mount', 'failed'),
+                          ('journal', 'format', 'start')])
+
+        comp = events[0]['comp']
+        self.assertEqual(comp.uniqueid(), self.tgt.uniqueid())
+        self.assertEqual(comp.state, MOUNTED)
+        self.assertEqual(comp.recov_info, "0/2")
+        self.assertEqual(comp._ldd_flags, 0x2)
+        self.assertEqual(comp.index, 3)
+
+        self.assertEqual(events[1]['comp'].uniqueid(), self.client.uniqueid())
+        self.assertEqual(events[1]['comp'].mtpt, '/foo')
+        self.assertEqual(str(events[1]['result']), 'oops')
+
+        self.assertEqual(events[2]['comp'].uniqueid(),
+                         self.tgt.journal.uniqueid())
+        self.assertEqual(events[2]['comp'].target.uniqueid(),
+                         self.tgt.uniqueid())
+
+    def test_distant_event_v4(self):
+        """distant event updates components from a version 4 message"""
+        remote_fs = FileSystem('proto')
+        remote_tgt = remote_fs.new_target(self.srv, 'ost', 3, '/dev/sdb',
+                                          '/dev/sdc')
+        remote_tgt.state = OFFLINE
+        remote_tgt.ldd_svname = 'proto-OST0003'
+        remote_tgt.journal.state = OFFLINE
+        schema = {}
+        records = [shine_msg_record(schema, 'ost', 'status', 'done',
+                                    comp=remote_tgt),
+                   shine_msg_record(schema, 'journal', 'status', 'done',
+                                    comp=remote_tgt.journal)]
+
+        self.fs.event_handler = CountEH()
+        for event in shine_msg_unpack(shine_msg_pack_v4(schema, records)):
+            self.fs.distant_event(event.pop('compname'), event.pop('action'),
+                                  event.pop('status'), node='foo1', **event)
+
+        self.assertEqual(self.tgt.state, OFFLINE)
+        self.assertEqual(self.tgt.ldd_svname, 'proto-OST0003')
+        self.assertEqual(self.tgt.journal.state, OFFLINE)
+        self.assertEqual(self.fs.event_handler.events,
+                         [('ost', 'status', 'done', self.tgt),
+                          ('journal', 'status', 'done', self.tgt.journal)])
+
+
+class RemoteCallEventHandlerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = FileSystem('remote')
+        srv = Server('foo1', ['foo1@tcp'])
+        self.tgt = self.fs.new_target(srv, 'mgt', 0, '/dev/null')
+        self._stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def tearDown(self):
+        sys.stdout = self._stdout
+
+    def test_v3(self):
+        """events are sent one by one to older callers"""
+        eh = RemoteCallEventHandler(3)
+        eh.event_callback('mgt', 'start', 'start', node='foo1', comp=self.tgt)
+        eh.event_callback('mgt', 'start', 'done', node='foo1', comp=self.tgt)
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('SHINE:3:'))
+
+    def test_v4_batch(self):
+        """events are batched for callers supporting version 4"""
+        eh = RemoteCallEventHandler(4)
+        eh.event_callback('mgt', 'start', 'start', node='foo1', comp=self.tgt)
+        self.tgt.state = MOUNTED
+        eh.event_callback('mgt', 'start', 'done', node='foo1', comp=self.tgt)
+        self.assertEqual(sys.stdout.getvalue(), "")
+        eh.flush()
+
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        events = shine_msg_unpack(lines[0])
+        self.assertEqual(len(events), 2)
+        # Fields are those of the event time.
+        self.assertEqual(events[0]['comp'].state, None)
+        self.assertEqual(events[1]['comp'].state, MOUNTED)
+        self.assertFalse('node' in events[0])
+
+    def test_v4_max_batch(self):
+        """a message is sent when batch is full"""
+        eh = RemoteCallEventHandler(4)
+        for dummy in range(eh.BATCH_SIZE):
+            eh.event_callback('mgt', 'status', 'done', comp=self.tgt)
+        self.assertEqual(len(sys.stdout.getvalue().splitlines()), 1)
+        eh.flush()
+        self.assertEqual(len(sys.stdout.getvalue().splitlines()), 1)
+
+
+class FakeWorker(object):
+    """Provide what FSProxyAction.ev_read() needs from a worker."""
+
+    def __init__(self, node, msg):
+        self.current_node = node
+        self.current_msg = msg
+
+
+class SummaryTest(unittest.TestCase):
+
+    def setUp(self):
+        self._stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def tearDown(self):
+        sys.stdout = self._stdout
+
+    def _summary(self, hostname, state, duration):
+        """Return the summary sent by a remote client on `hostname'."""
+        fs = FileSystem('sum')
+        client = fs.new_client(Server(hostname, ['%s@tcp' % hostname]),
+                               '/sum')
+        sys.stdout = StringIO()
+        eh = RemoteCallEventHandler(4, summary=True)
+        eh.event_callback('client', 'mount', 'start', node=hostname,
+                          comp=client)
+        client.state = state
+        eh.event_callback('client', 'mount', 'done', node=hostname,
+                          comp=client, result=Result(duration=duration))
+        self.assertEqual(sys.stdout.getvalue(), "")
+        eh.flush()
+        return sys.stdout.getvalue()
+
+    def test_same_summary(self):
+        """alike nodes send the same summary"""
+        msg = self._summary('cli1', MOUNTED, 1.2)
+        self.assertTrue(msg.startswith('SHINE:5:'))
+        self.assertEqual(msg.count('\n'), 1)
+        self.assertEqual(msg, self._summary('cli2', MOUNTED, 3.4))
+        self.assertNotEqual(msg, self._summary('cli3', OFFLINE, 1.2))
+
+    def test_no_summary_v3(self):
+        """summaries are not sent to older callers"""
+        self.assertFalse(RemoteCallEventHandler(3, summary=True).summary)
+
+    def test_apply_summaries(self):
+        """identical summaries update all their nodes at once"""
+        class NodeEH(EventHandler):
+            def __init__(self):
+                EventHandler.__init__(self)
+                self.nodes = []
+            def event_callback(self, compname, action, status, **kwargs):
+                self.nodes.append((str(kwargs['node']), status))
+
+        fs = FileSystem('sum')
+        fs.event_handler = NodeEH()
+        clients = {}
+        for hostname in ('cli1', 'cli2', 'cli3', 'cli4'):
+            srv = Server(hostname, ['%s@tcp' % hostname])
+            clients[hostname] = fs.new_client(srv, '/sum')
+
+        proxy = FSProxyAction(fs, 'mount', NodeSet('cli[1-4]'), False,
+                              fs.components, summary=True)
+        for hostname in ('cli1', 'cli2'):
+            proxy.ev_read(FakeWorker(hostname,
+                          self._summary(hostname, MOUNTED, 1).strip()))
+        proxy.ev_read(FakeWorker('cli3',
+                      self._summary('cli3', OFFLINE, 1).strip()))
+        proxy._apply_summaries()
+
+        self.assertEqual(clients['cli1'].state, MOUNTED)
+        self.assertEqual(clients['cli2'].state, MOUNTED)
+        self.assertEqual(clients['cli3'].state, OFFLINE)
+        self.assertEqual(clients['cli4'].state, None)
+
+        # One event per distinct summary, for all its nodes
+        self.assertEqual(sorted(fs.event_handler.nodes),
+                         [('cli3', 'done'), ('cli3', 'start'),
+                          ('cli[1-2]', 'done'), ('cli[1-2]', 'start')])
+
+    def test_start_tuning(self):
+        """tuning reports of remote start commands are recorded"""
+        fs = FileSystem('sum')
+        fs.event_handler = CountEH()
+        srv = Server('oss1', ['oss1@tcp'])
+        fs.new_target(srv, 'ost', 0, '/dev/sda')
+        proxy = FSProxyAction(fs, 'start', NodeSet('oss[1-2]'), False,
+                              fs.components, tuning='abc')
+        self.assertEqual(proxy.tuning, 'abc')
+
+        for hostname, status in (('oss1', 'done'), ('oss2', 'failed')):
+            sys.stdout = StringIO()
+            eh = RemoteCallEventHandler(4)
+            eh.event_callback(TUNING_EVENT, 'tune', status, node=hostname)
+            eh.flush()
+            proxy.ev_read(FakeWorker(hostname, sys.stdout.getvalue().strip()))
+
+        self.assertEqual(sorted((status, str(nodes)) for status, nodes
+                                in fs.remote_tuning.items()),
+                         [('done', 'oss1'), ('failed', 'oss2')])
+        self.assertEqual(fs.event_handler.events, [])
+
+    def test_tuning_drift(self):
+        """nodes reporting the same tuning differences are gathered"""
+        fs = FileSystem('sum')
+        srv = Server('cli1', ['cli1@tcp'])
+        fs.new_client(srv, '/sum')
+        proxy = FSProxyAction(fs, 'tune', NodeSet('cli[1-3]'), False,
+                              fs.components, check=True)
+        self.assertTrue('--check' in proxy._prepare_cmd())
+
+        for hostname, value in (('cli1', '1'), ('cli2', '2'), ('cli3', '1')):
+            sys.stdout = StringIO()
+            eh = RemoteCallEventHandler(4)
+            eh.event_callback(TUNING_EVENT, 'check', 'drift', node=hostname,
+                              result=Result('/proc/x: %s (expected 3)' % value))
+            eh.flush()
+            proxy.ev_read(FakeWorker(hostname, sys.stdout.getvalue().strip()))
+
+        self.assertEqual(sorted((str(NodeSet.fromlist(nodes)), str(msg))
+                                for msg, nodes in fs.tuning_drift.walk()),
+                         [('cli2', '/proc/x: 2 (expected 3)'),
+                          ('cli[1,3]', '/proc/x: 1 (expected 3)')])
+        self.assertEqual(fs.remote_tuning, {})
@@ -7,7 +7,11 @@
 
 import unittest
 
+from ClusterShell.NodeSet import NodeSet
+
 from Shine.Lustre.FileSystem import FileSystem
+from Shine.Lustre.Component import MOUNTED, OFFLINE, RUNTIME_ERROR
+from Shine.Lustre.Actions.Proxy import DistantComponent
 from Shine.Lustre.Server import Server
 from Shine.Lustre.Client import Client
 
@@ -43,3 +47,77 @@ class ClientTest(unittest.TestCase):
         client2 = fs2.new_client(srv2, '/foo2')
 
         self.assertNotEqual(client1.uniqueid(), client2.uniqueid())
+
+
+class ClientGroupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = FileSystem('grp')
+        self.grp = self.fs.new_client_group(NodeSet('foo[1-10]'), '/grp')
+
+    def _distant(self, state, proc_states=None):
+        """Return a client, like the ones sent by remote nodes."""
+        return DistantComponent('client', 'x',
+                                {'state': state, 'mount_path': '/grp',
+                                 'proc_states': proc_states or {}})
+
+    def test_single_instance(self):
+        """a group stands for all its nodes"""
+        self.assertEqual(len(self.fs.components), 1)
+        self.assertEqual(self.grp.instances(), 10)
+        self.assertEqual(self.fs.components.instances(), 10)
+        self.assertEqual(str(self.fs.components.servers()), 'foo[1-10]')
+        self.assertEqual(self.fs.client_group('foo3', '/grp'), self.grp)
+        self.assertRaises(KeyError, self.fs.client_group, 'foo3', '/other')
+        self.assertRaises(KeyError, self.fs.client_group, 'bar', '/grp')
+
+    def test_states(self):
+        """node states are gathered per state"""
+        self.grp.state = OFFLINE
+        self.assertEqual(self.grp.state, OFFLINE)
+        self.grp.update_nodes(NodeSet('foo[2-3]'), self._distant(MOUNTED))
+        self.assertEqual(self.grp.state, OFFLINE)
+        self.assertEqual(str(self.grp.nodes(MOUNTED)), 'foo[2-3]')
+        self.assertEqual(str(self.grp.nodes(OFFLINE)), 'foo[1,4-10]')
+
+        views = sorted(self.grp.by_state(), key=lambda comp: comp.state)
+        self.assertEqual([(str(view.server.hostname), view.state)
+                          for view in views],
+                         [('foo[2-3]', MOUNTED), ('foo[1,4-10]', OFFLINE)])
+        self.assertEqual(len(self.fs.components.unfold()), 2)
+
+        # Back to a single state
+        self.grp.update_nodes(NodeSet('foo[2-3]'), self._distant(OFFLINE))
+        self.assertEqual(self.grp.by_state(), [self.grp])
+
+    def test_proc_states(self):
+        """nodes with different connection states are split"""
+        self.grp.state = MOUNTED
+        self.grp.update_nodes('foo1', self._distant(MOUNTED, {'DISCONN': 1}))
+        texts = sorted(view.text_status() for view in self.grp.by_state())
+        self.assertEqual(texts, ['mounted', 'mounted (disconn=1)'])
+
+    def test_mark_unknown(self):
+        """only nodes without state are set"""
+        self.grp.update_nodes(NodeSet('foo[1-5]'), self._distant(MOUNTED))
+        self.assertEqual(str(self.grp.mark_unknown(RUNTIME_ERROR)),
+                         'foo[6-10]')
+        self.assertEqual(str(self.grp.nodes(MOUNTED)), 'foo[1-5]')
+        self.assertEqual(str(self.grp.mark_unknown(RUNTIME_ERROR)), '')
+
+    def test_carve(self):
+        """nodes are moved to their own group"""
+        self.grp.update_nodes(NodeSet('foo[1-5]'), self._distant(MOUNTED))
+        other = self.grp.carve(NodeSet('foo[5-6]'))
+        self.assertEqual(str(other.server.hostname), 'foo[5-6]')
+        self.assertEqual(str(other.nodes(MOUNTED)), 'foo5')
+        self.assertEqual(str(self.grp.server.hostname), 'foo[1-4,7-10]')
+        self.assertEqual(len(self.fs.components), 2)
+        self.assertEqual(self.fs.client_group('foo6', '/grp'), other)
+        self.assertEqual(self.fs.components.instances(), 10)
+
+    def test_distant_event(self):
+        """distant client events update their group"""
+        self.fs.distant_event('client', 'mount', 'done', node='foo4',
+                              comp=self._distant(MOUNTED))
+        self.assertEqual(str(self.grp.nodes(MOUNTED)), 'foo4')
@@ -8,9 +8,12 @@
 
 import unittest
 
+from ClusterShell.NodeSet import NodeSet
+
 from Shine.Lustre.FileSystem import FileSystem
 from Shine.Lustre.Server import Server
-from Shine.Lustre.Component import ComponentGroup, Component, MOUNTED, OFFLINE
+from Shine.Lustre.Component import ComponentGroup, LazyComponentGroup, \
+                                   Component, MOUNTED, OFFLINE
 from Shine.Lustre.Target import Target
 
 class ComponentGroupTest(unittest.TestCase):
@@ -220,3 +223,106 @@ class ComponentGroupTest(unittest.TestCase):
         self.assertEqual(len(results), 2)
         self.assertTrue([srv1, [comp1, comp3]] in results)
         self.assertTrue([srv2, [comp2, comp4]] in results)
+
+    def testFilterIndexes(self):
+        """test ComponentGroup.filter(types, indexes, servers)"""
+        fs = FileSystem('comp')
+        srv1 = Server('foo1', ['foo1@tcp'])
+        srv2 = Server('foo2', ['foo2@tcp'])
+        ost0 = fs.new_target(srv1, 'ost', 0, '/dev/sda')
+        ost1 = fs.new_target(srv2, 'ost', 1, '/dev/sda')
+        ost2 = fs.new_target(srv2, 'ost', 2, '/dev/sdb', enabled=False)
+        mdt0 = fs.new_target(srv1, 'mdt', 0, '/dev/sdb')
+        grp = fs.components
+
+        self.assertEqual(sorted(grp.filter(types=['ost'])),
+                         sorted([ost0, ost1, ost2]))
+        self.assertEqual(sorted(grp.filter(indexes=[0])), sorted([ost0, mdt0]))
+        self.assertEqual(list(grp.filter(types=['ost'], indexes=[0])), [ost0])
+        self.assertEqual(list(grp.filter(types=['mgt'])), [])
+        # Chained filters
+        view = grp.enabled().filter(types=['ost'], servers=NodeSet('foo2'))
+        self.assertEqual(list(view), [ost1])
+        self.assertEqual(list(view.filter(indexes=[0])), [])
+
+    def testServerIndex(self):
+        """test ComponentGroup server index follows remove() and failover"""
+        fs = FileSystem('comp')
+        srv1 = Server('foo1', ['foo1@tcp'])
+        srv2 = Server('foo2', ['foo2@tcp'])
+        ost0 = fs.new_target(srv1, 'ost', 0, '/dev/sda')
+        ost0.add_server(srv2)
+        ost1 = fs.new_target(srv2, 'ost', 1, '/dev/sda')
+        grp = fs.components
+        self.assertEqual(list(grp.filter(servers=NodeSet('foo1'))), [ost0])
+
+        # Target moves to its failover server
+        self.assertTrue(ost0.failover(NodeSet('foo2')))
+        self.assertEqual(list(grp.filter(servers=NodeSet('foo1'))), [])
+        self.assertEqual(sorted(grp.filter(servers=NodeSet('foo2'))),
+                         sorted([ost0, ost1]))
+        self.assertEqual([srv for srv, comps in grp.groupbyserver()], [srv2])
+
+        grp.remove(ost1)
+        self.assertFalse(ost1 in grp)
+        self.assertEqual(list(grp.filter(servers=NodeSet('foo2'))), [ost0])
+        self.assertEqual(list(grp.filter(indexes=[1])), [])
+        self.assertRaises(KeyError, grp.remove, ost1)
+
+    def testViewIsLazy(self):
+        """test ComponentGroup filters are lazy"""
+        fs = FileSystem('comp')
+        comp = Component(fs, Server('foo1', ['foo1@tcp']))
+        grp = ComponentGroup([comp])
+        calls = []
+        def key(comp):
+            calls.append(comp)
+            return True
+        view = grp.filter(key=key).filter(supports='state')
+        self.assertEqual(calls, [])
+        self.assertEqual(len(view), 1)
+        self.assertEqual(list(view), [comp])
+        self.assertEqual(calls, [comp])
+        self.assertEqual(len(view.filter(key=key)), 1)
+        self.assertEqual(calls, [comp, comp])
+
+    def testGroupByType(self):
+        """test ComponentGroup.groupby(attr='TYPE')"""
+        fs = FileSystem('comp')
+        srv = Server('foo1', ['foo1@tcp'])
+        ost = fs.new_target(srv, 'ost', 0, '/dev/sda')
+        mdt = fs.new_target(srv, 'mdt', 0, '/dev/sdb')
+        results = [(comptype, list(comps))
+                   for comptype, comps in fs.components.groupby(attr='TYPE')]
+        self.assertEqual(results, [('mdt', [mdt]), ('ost', [ost])])
+
+    def testLazyGroup(self):
+        """test LazyComponentGroup only creates deferred components if needed"""
+        fs = FileSystem('comp')
+        srv = Server('foo1', ['foo1@tcp'])
+        grp = LazyComponentGroup()
+        fs.components = grp
+        mdt = fs.new_target(srv, 'mdt', 0, '/dev/sdb')
+        created = []
+        def factory(index):
+            created.append(index)
+            fs.new_target(srv, 'ost', index, '/dev/sda', enabled=False)
+        grp.defer('comp-OST0000', factory, 0)
+        grp.defer('comp-OST0001', factory, 1)
+        self.assertRaises(KeyError, grp.defer, 'comp-OST0001', factory, 1)
+        self.assertRaises(KeyError, fs.new_target, srv, 'ost', 1, '/dev/sdc')
+
+        # Deferred components are disabled
+        self.assertEqual(list(grp.managed()), [mdt])
+        self.assertEqual(list(grp.enabled()), [mdt])
+        self.assertEqual(created, [])
+
+        # Looking up one component only creates it
+        self.assertEqual(grp['comp-OST0001'].index, 1)
+        self.assertEqual(created, [1])
+        self.assertFalse(grp['comp-OST0001'].action_enabled)
+
+        # Other uses need them all
+        self.assertEqual(len(grp.filter(types=['ost'])), 2)
+        self.assertEqual(created, [1, 0])
+        self.assertEqual(len(grp), 3)
@@ -5,11 +5,17 @@
 
 """Unit test for Shine.Lustre.Disk"""
 
+import os
+import time
+import marshal
+import shutil
 import unittest
 from subprocess import Popen, PIPE, STDOUT
 
 import Utils
-from Shine.Lustre.Disk import Disk, DiskDeviceError
+from Shine.Configuration.Globals import Globals
+from Shine.Lustre.Disk import Disk, DiskDeviceError, MountdataCache, \
+                              flush_mountdata_cache
 
 class DiskLoopbackTest(unittest.TestCase):
 
@@ -164,3 +170,88 @@ class DiskOtherTest(unittest.TestCase):
         disk = Disk(dev="foo")
         exp = DiskDeviceError(disk=disk, message="Something")
         self.assertEqual(str(exp), "Something")
+
+
+class MountdataCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = Utils.make_tempdir()
+        self._status_dir = Globals().get('status_dir')
+        Globals().replace('status_dir', self.dir)
+        self.disk = Disk(dev=Utils.makeTempFilename())
+        self.key = self.disk._mountdata_key()
+        self.cache = MountdataCache()
+
+    def tearDown(self):
+        Globals().replace('status_dir', self._status_dir)
+        Globals().replace('mountdata_cache_ttl', 600)
+        os.unlink(self.disk.dev)
+        shutil.rmtree(self.dir)
+
+    def test_store_lookup(self):
+        """cached output is shared through the cache file"""
+        self.assertEqual(self.cache.lookup(self.key), None)
+        self.cache.store(self.key, "Target: foo-MDT0000\n")
+        self.assertEqual(self.cache.lookup(self.key), "Target: foo-MDT0000\n")
+        # Only written by flush()
+        self.assertEqual(MountdataCache().lookup(self.key), None)
+        self.cache.flush()
+        self.assertEqual(MountdataCache().lookup(self.key),
+                         "Target: foo-MDT0000\n")
+        self.assertTrue(self.disk._mountdata_cached('foo-MDT0000'))
+        self.assertEqual(self.disk.ldd_svname, 'foo-MDT0000')
+        self.assertRaises(DiskDeviceError, self.disk._mountdata_cached,
+                          'foo-OST0000')
+
+        self.disk.invalidate_mountdata()
+        self.assertFalse(self.disk._mountdata_cached())
+        flush_mountdata_cache()
+        self.assertEqual(self.cache.lookup(self.key), None)
+
+    def test_remove(self):
+        """removed entries are only written by flush()"""
+        self.cache.store(self.key, "foo")
+        self.cache.flush()
+        self.cache.remove(self.key)
+        self.assertEqual(self.cache.lookup(self.key), None)
+        self.assertEqual(MountdataCache().lookup(self.key), "foo")
+        self.cache.flush()
+        self.assertEqual(MountdataCache().lookup(self.key), None)
+        # A new entry replaces a removed one
+        self.cache.remove(self.key)
+        self.cache.store(self.key, "bar")
+        self.cache.flush()
+        self.assertEqual(MountdataCache().lookup(self.key), "bar")
+
+    def test_ttl(self):
+        """expired or disabled cache returns nothing"""
+        self.cache.store(self.key, "foo")
+        self.cache.flush()
+        Globals().replace('mountdata_cache_ttl', 0)
+        self.assertEqual(self.cache.lookup(self.key), None)
+        Globals().replace('mountdata_cache_ttl', 600)
+        self.cache._save({self.key: (time.time() - 601, "foo")})
+        self.assertEqual(self.cache.lookup(self.key), None)
+
+    def test_bad_file(self):
+        """an unexpected cache file content is an empty cache"""
+        self.cache.store(self.key, "foo")
+        self.cache.flush()
+        for content in ("I12\n.", "", "\x00garbage",
+                        marshal.dumps(12), marshal.dumps({self.key: "foo"}),
+                        marshal.dumps({self.key: (1, 2, 3)})):
+            fobj = open(self.cache.path(), 'wb')
+            fobj.write(content)
+            fobj.close()
+            self.assertEqual(MountdataCache().lookup(self.key), None)
+        # It is replaced by the next write
+        self.cache.store(self.key, "foo")
+        self.cache.flush()
+        self.assertEqual(MountdataCache().lookup(self.key), "foo")
+
+    def test_device_change(self):
+        """a modified image file is no more cached"""
+        self.cache.store(self.key, "foo")
+        os.utime(self.disk.dev, (0, 0))
+        self.assertNotEqual(self.disk._mountdata_key(), self.key)
+        self.assertFalse(self.disk._mountdata_cached())
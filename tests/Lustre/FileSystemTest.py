@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# Shine.Lustre.FileSystem test suite
+# Copyright (C) 2013 CEA
+
+"""Unit test for FileSystem"""
+
+import unittest
+
+from Shine.Configuration.Globals import Globals
+from Shine.Lustre.FileSystem import FileSystem, FileSystemGroup, \
+                                    _merge_groups
+from Shine.Lustre.Server import Server
+from Shine.Lustre.EventHandler import EventHandler
+from Shine.Lustre.Component import MOUNTED, OFFLINE
+from Shine.Lustre.Actions.Proxy import shine_msg_pack, shine_msg_record, \
+                                       shine_msg_pack_v4, shine_msg_unpack, \
+                                       DistantComponent
+
+
+class PrepareTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = FileSystem('prepare')
+        srv = {}
+        for name in ('mgs1', 'mds1', 'oss1', 'oss2', 'rtr1'):
+            srv[name] = Server(name, ['%s@tcp' % name])
+        self.fs.new_target(srv['mgs1'], 'mgt', 0, '/dev/sda')
+        self.fs.new_target(srv['mds1'], 'mdt', 0, '/dev/sda')
+        self.fs.new_target(srv['oss1'], 'ost', 0, '/dev/sda')
+        self.fs.new_target(srv['oss1'], 'ost', 1, '/dev/sdb')
+        self.fs.new_target(srv['oss2'], 'ost', 2, '/dev/sda')
+        self.fs.new_router(srv['rtr1'])
+
+    def _groups(self, graph):
+        """Return a dict of per-type action groups of `graph'."""
+        groups = {}
+        for grp in graph:
+            proxy = list(grp)[0]
+            groups[list(proxy._comps)[0].TYPE] = grp
+        return groups
+
+    def _dep_types(self, groups, comptype):
+        """Return the types the proxies of `comptype' wait for."""
+        deptypes = set()
+        for proxy in groups[comptype]:
+            deptypes.update(list(dep._comps)[0].TYPE for dep in proxy.deps)
+        return sorted(deptypes)
+
+    def test_start_deps(self):
+        """start actions only wait for the types they depend on"""
+        graph = self.fs._prepare('start', self.fs.components,
+                                 deps=FileSystem.START_DEPS)
+        groups = self._groups(graph)
+        self.assertEqual(sorted(groups), ['mdt', 'mgt', 'ost', 'router'])
+        # One proxy for all servers
+        self.assertEqual(len(groups['ost']), 1)
+        self.assertEqual(str(list(groups['ost'])[0].nodes), 'oss[1-2]')
+        self.assertEqual(self._dep_types(groups, 'mgt'), [])
+        self.assertEqual(self._dep_types(groups, 'router'), [])
+        self.assertEqual(self._dep_types(groups, 'ost'), ['mgt', 'router'])
+        self.assertEqual(self._dep_types(groups, 'mdt'),
+                         ['mgt', 'ost', 'router'])
+
+    def test_first_start_deps(self):
+        """MDT is started before OSTs the first time"""
+        graph = self.fs._prepare('start', self.fs.components,
+                                 deps=FileSystem.FIRST_START_DEPS)
+        groups = self._groups(graph)
+        self.assertEqual(self._dep_types(groups, 'mdt'), ['mgt', 'router'])
+        self.assertEqual(self._dep_types(groups, 'ost'),
+                         ['mdt', 'mgt', 'router'])
+
+    def test_stop_deps(self):
+        """stop actions are run in reverse order"""
+        graph = self.fs._prepare('stop', self.fs.components,
+                                 deps=FileSystem.START_DEPS, reverse=True)
+        groups = self._groups(graph)
+        self.assertEqual(self._dep_types(groups, 'mdt'), [])
+        self.assertEqual(self._dep_types(groups, 'ost'), ['mdt'])
+        self.assertEqual(self._dep_types(groups, 'mgt'), ['mdt', 'ost'])
+        self.assertEqual(self._dep_types(groups, 'router'), ['mdt', 'ost'])
+
+    def test_start_tuning(self):
+        """start proxies ask remote servers to apply tuning"""
+        graph = self.fs._prepare('start', self.fs.components,
+                                 deps=FileSystem.START_DEPS, tuning='abc')
+        for grp in graph:
+            for proxy in grp:
+                self.assertEqual(proxy.tuning, 'abc')
+        graph = self.fs._prepare('start', self.fs.components)
+        self.assertEqual(list(list(graph)[0])[0].tuning, None)
+
+    def test_tune_persistent(self):
+        """tune proxies ask remote servers to set persistent tunings"""
+        distant = list(self.fs.components.groupbyserver())
+        for persistent in (True, False):
+            for proxy in self.fs._distant_actions('tune', distant,
+                                                  persistent=persistent):
+                self.assertEqual(proxy.persistent, persistent)
+
+    def test_no_deps(self):
+        """without deps, all components are in one group"""
+        graph = self.fs._prepare('status', self.fs.components)
+        self.assertEqual(len(graph), 1)
+        self.assertEqual(len(list(graph)[0]), 1)
+
+    def test_same_command(self):
+        """distant servers share one command line"""
+        for idx in range(3):
+            self.fs.new_client(Server('cli%d' % idx, ['cli%d@tcp' % idx]),
+                               '/prepare')
+        comps = self.fs.components.filter(supports='mount')
+        graph = self.fs._prepare('mount', comps)
+        proxy = list(list(graph)[0])[0]
+        self.assertEqual(str(proxy.nodes), 'cli[0-2]')
+        self.assertTrue('-l prepare-client' in proxy._prepare_cmd())
+
+    def test_summary_proxy(self):
+        """many client and router nodes are asked for a summary"""
+        for idx in range(3):
+            self.fs.new_client(Server('cli%d' % idx, ['cli%d@tcp' % idx]),
+                               '/prepare')
+        threshold = Globals().get_summary_threshold()
+        try:
+            Globals().replace('summary_threshold', 3)
+            graph = self.fs._prepare('status', self.fs.components)
+            proxies = sorted((proxy.summary, str(proxy.nodes))
+                             for proxy in list(graph)[0])
+            self.assertEqual(proxies, [(False, 'mds1,mgs1,oss[1-2]'),
+                                       (True, 'cli[0-2],rtr1')])
+
+            Globals().replace('summary_threshold', 5)
+            graph = self.fs._prepare('status', self.fs.components)
+            self.assertEqual(len(list(graph)[0]), 1)
+        finally:
+            Globals().replace('summary_threshold', threshold)
+
+
+class GroupEH(EventHandler):
+    def __init__(self):
+        EventHandler.__init__(self)
+        self.events = []
+    def event_callback(self, compname, action, status, **kwargs):
+        self.events.append((compname, action, status, kwargs['comp']))
+
+
+class GroupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fs1 = FileSystem('grp1')
+        self.fs2 = FileSystem('grp2')
+        srv = {}
+        for name in ('mds1', 'oss1', 'oss2'):
+            srv[name] = Server.get(name, ['%s@tcp' % name])
+        self.fs1.new_target(srv['mds1'], 'mdt', 0, '/dev/sda')
+        self.fs1.new_target(srv['oss1'], 'ost', 0, '/dev/sda')
+        self.fs2.new_target(srv['mds1'], 'mdt', 0, '/dev/sdb')
+        self.fs2.new_target(srv['oss2'], 'ost', 0, '/dev/sda')
+        self.group = FileSystemGroup([self.fs1, self.fs2])
+
+    def _proxies(self):
+        comps = _merge_groups([self.fs1.components, self.fs2.components])
+        graph = self.group._prepare('status', comps)
+        return sorted((str(proxy.nodes), ' '.join(proxy._prepare_cmd()))
+                      for proxy in list(graph)[0])
+
+    def test_merged_proxy(self):
+        """servers of several filesystems run one command for all of them"""
+        proxies = self._proxies()
+        self.assertEqual([nodes for nodes, cmd in proxies],
+                         ['mds1', 'oss1', 'oss2'])
+        self.assertTrue('-f grp1,grp2 ' in proxies[0][1])
+        self.assertTrue('-f grp1 ' in proxies[1][1])
+        self.assertTrue('-f grp2 ' in proxies[2][1])
+
+    def test_distant_event(self):
+        """distant events are sent to the filesystem of their component"""
+        self.fs1.event_handler = GroupEH()
+        self.fs2.event_handler = GroupEH()
+        remote = FileSystem('grp2')
+        tgt = remote.new_target(Server('oss2', ['oss2@tcp']), 'ost', 0,
+                                '/dev/sda')
+        tgt.state = MOUNTED
+        self.group.distant_event('ost', 'status', 'done', node='oss2',
+                                 comp=tgt)
+        local = self.fs2.components[tgt.uniqueid()]
+        self.assertEqual(local.state, MOUNTED)
+        self.assertEqual(self.fs1.event_handler.events, [])
+        self.assertEqual(self.fs2.event_handler.events,
+                         [('ost', 'status', 'done', local)])
+
+    def test_proxy_fs(self):
+        """proxies get a filesystem or a group of filesystems"""
+        self.assertTrue(self.group._proxy_fs(self.fs1.components) is self.fs1)
+        comps = _merge_groups([self.fs1.components, self.fs2.components])
+        subgroup = self.group._proxy_fs(comps)
+        self.assertEqual(subgroup.fs_name, 'grp1,grp2')
+        self.assertTrue(self.group._proxy_fs(comps) is subgroup)
+
+    def test_start_deps(self):
+        """targets only wait for the targets of their own filesystem"""
+        for fs, idx in ((self.fs1, 1), (self.fs2, 2)):
+            fs.new_target(Server.get('mgs%d' % idx, ['mgs%d@tcp' % idx]),
+                          'mgt', 0, '/dev/sda')
+        comps = _merge_groups([self.fs1.components, self.fs2.components])
+        graph = self.group._prepare('start', comps, deps=FileSystem.START_DEPS)
+        deps = {}
+        for grp in graph:
+            for proxy in grp:
+                deps[str(proxy.nodes)] = sorted(str(dep.nodes)
+                                                for dep in proxy.deps)
+        self.assertEqual(deps, {'mgs1': [], 'mgs2': [],
+                                'oss1': ['mgs1'],
+                                'oss2': ['mgs2'],
+                                'mds1': ['mgs1', 'mgs2', 'oss1', 'oss2']})
+
+    def test_shared_mgt(self):
+        """filesystems could share their MGT server"""
+        self.fs1.new_target(Server.get('mgs1', ['mgs1@tcp']), 'mgt', 0,
+                            '/dev/sda')
+        self.fs2.new_target(Server.get('mgs1', ['mgs1@tcp']), 'mgt', 0,
+                            '/dev/sda')
+        proxies = self._proxies()
+        self.assertEqual([nodes for nodes, cmd in proxies],
+                         ['mds1,mgs1', 'oss1', 'oss2'])
+        self.assertTrue('-f grp1,grp2 ' in proxies[0][1])
+        self.assertTrue('MGS' in proxies[0][1])
+
+    def test_shared_local_mgt(self):
+        """local MGT of several filesystems are run once each"""
+        srv = Server.get(Server.hostname_short(), ['localhost@tcp'])
+        fs1 = FileSystem('grp1')
+        fs2 = FileSystem('grp2')
+        fs1.new_target(srv, 'mgt', 0, '/dev/sda')
+        fs2.new_target(srv, 'mgt', 0, '/dev/sda')
+        group = FileSystemGroup([fs1, fs2])
+        results = group.status({fs1: None, fs2: None})
+        self.assertEqual(sorted(results), sorted([fs1, fs2]))
+
+    def test_distant_event_messages(self):
+        """events of a merged proxy are routed through all protocols"""
+        self.fs1.event_handler = GroupEH()
+        self.fs2.event_handler = GroupEH()
+        srv = Server.get('mds1', ['mds1@tcp'])
+        mgt1 = self.fs1.new_target(srv, 'mgt', 0, '/dev/sdc')
+        mgt2 = self.fs2.new_target(srv, 'mgt', 0, '/dev/sdc')
+
+        # Remote instances, as seen by the remote shine command
+        remote1 = FileSystem('grp1')
+        remote2 = FileSystem('grp2')
+        rmgt1 = remote1.new_target(Server('mds1', ['mds1@tcp']), 'mgt', 0,
+                                   '/dev/sdc')
+        rmgt2 = remote2.new_target(Server('mds1', ['mds1@tcp']), 'mgt', 0,
+                                   '/dev/sdc')
+        rmgt1.state = MOUNTED
+        rmgt2.state = OFFLINE
+
+        schema = {}
+        records = [shine_msg_record(schema, 'mgt', 'status', 'done', comp=comp)
+                   for comp in (rmgt1, rmgt2)]
+        for msg in (shine_msg_pack_v4(schema, records),
+                    shine_msg_pack(compname='mgt', action='status',
+                                   status='done', comp=rmgt1) +
+                    shine_msg_pack(compname='mgt', action='status',
+                                   status='done', comp=rmgt2)):
+            mgt1.state = mgt2.state = None
+            self.fs1.event_handler.events = []
+            self.fs2.event_handler.events = []
+            for line in msg.splitlines():
+                for event in shine_msg_unpack(line):
+                    self.group.distant_event(event.pop('compname'),
+                                             event.pop('action'),
+                                             event.pop('status'),
+                                             node='mds1', **event)
+            self.assertEqual(mgt1.state, MOUNTED)
+            self.assertEqual(mgt2.state, OFFLINE)
+            self.assertEqual(self.fs1.event_handler.events,
+                             [('mgt', 'status', 'done', mgt1)])
+            self.assertEqual(self.fs2.event_handler.events,
+                             [('mgt', 'status', 'done', mgt2)])
+
+    def test_distant_event_no_fs_name(self):
+        """events of older remote commands go to all matching filesystems"""
+        srv = Server.get('mds1', ['mds1@tcp'])
+        mgt1 = self.fs1.new_target(srv, 'mgt', 0, '/dev/sdc')
+        mgt2 = self.fs2.new_target(srv, 'mgt', 0, '/dev/sdc')
+        def distant(comp, state):
+            fields = dict((name, getattr(comp, name))
+                          for name in comp.UPDATE_FIELDS)
+            fields['state'] = state
+            return DistantComponent(comp.TYPE, comp.uniqueid(), fields)
+        ost = distant(list(self.fs1.components.filter(types=['ost']))[0],
+                      OFFLINE)
+        mgt = distant(mgt1, MOUNTED)
+        self.group.distant_event('ost', 'status', 'done', node='oss1',
+                                 comp=ost)
+        self.group.distant_event('mgt', 'status', 'done', node='mds1',
+                                 comp=mgt)
+        self.assertEqual(mgt1.state, MOUNTED)
+        self.assertEqual(mgt2.state, MOUNTED)
+        self.assertEqual([comp.state for comp in self.fs1.components
+                          if comp.TYPE == 'ost'], [OFFLINE])
+        self.assertEqual([comp.state for comp in self.fs2.components
+                          if comp.TYPE == 'ost'], [None])
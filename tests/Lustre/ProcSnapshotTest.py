@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# Shine.Lustre.ProcSnapshot test suite
+# Copyright (C) 2013 CEA
+
+"""Unit test for ProcSnapshot"""
+
+import os
+import glob
+import shutil
+import unittest
+
+import Utils
+from Shine.Lustre.ProcSnapshot import ProcSnapshot, proc_snapshot
+from Shine.Lustre.FileSystem import FileSystem
+from Shine.Lustre.Server import Server
+from Shine.Lustre.Component import MOUNTED, OFFLINE, ComponentError
+
+
+class ProcSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = Utils.make_tempdir()
+        self._write('mounts',
+                    "rootfs / rootfs rw 0 0\n"
+                    "/dev/sdb /lustre/proc/ost/proc-OST0000 lustre ro 0 0\n"
+                    "proc-srv@tcp:/proc /proc/client lustre rw 0 0\n")
+        self._write('modules',
+                    "lustre 922 2 - Live 0xffffffffa0d0c000\n"
+                    "ldiskfs 353 0 - Live 0xffffffffa0c5d000\n")
+        self._write('partitions',
+                    "major minor  #blocks  name\n\n"
+                    "   8       16   1024 sdb\n")
+        self._write('fs/lustre/obdfilter/proc-OST0000/mntdev', "/dev/sdb\n")
+        self._write('fs/lustre/obdfilter/proc-OST0000/recovery_status',
+                    "status: COMPLETE\n")
+        self._write('fs/lustre/lov/proc-clilov-ffff8800/numobd', "1\n")
+        self._write('fs/lustre/osc/proc-OST0000-osc-ffff8800/state',
+                    "current_state: FULL\n")
+        self.proc = ProcSnapshot(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _write(self, relpath, content):
+        path = os.path.join(self.root, relpath)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        fobj = open(path, 'w')
+        fobj.write(content)
+        fobj.close()
+
+    def test_mounts(self):
+        """mount table is indexed by device and mount point"""
+        entry = ('/dev/sdb', '/lustre/proc/ost/proc-OST0000', 'lustre')
+        self.assertEqual(self.proc.mounts_by_dev('/dev/sdb'), [entry])
+        self.assertEqual(self.proc.mounts_by_dev('/dev/sdb', 'ext4'), [])
+        self.assertEqual(self.proc.mounts_by_path('/proc/client', 'lustre'),
+                   [('proc-srv@tcp:/proc', '/proc/client', 'lustre')])
+        self.assertEqual(self.proc.mounts_by_path('/foo'), [])
+
+    def test_obds(self):
+        """obd tree is listed and indexed by name"""
+        self.assertEqual(sorted(self.proc.obd_types()),
+                         ['lov', 'obdfilter', 'osc'])
+        self.assertEqual(self.proc.obd_names('lov'), ['proc-clilov-ffff8800'])
+        self.assertEqual(self.proc.obd_names('mdt'), [])
+        self.assertEqual(self.proc.obd_files('proc-OST0000', 'mntdev'),
+                    [os.path.join(self.root,
+                                  'fs/lustre/obdfilter/proc-OST0000/mntdev')])
+        self.assertEqual(self.proc.obd_files('proc-OST0000', 'foo'), [])
+        self.assertEqual(self.proc.obd_files('proc-MDT0000', 'mntdev'), [])
+
+    def test_modules_and_partitions(self):
+        """modules and partitions are parsed"""
+        self.assertEqual(self.proc.modules(), {'lustre': 2, 'ldiskfs': 0})
+        self.assertEqual(self.proc.partition_size('sdb'), 1024 * 1024)
+        self.assertEqual(self.proc.partition_size('sdc'), None)
+
+    def test_invalidate(self):
+        """files are read once until invalidate() is called"""
+        self.assertEqual(len(self.proc.mounts_by_dev('/dev/sdb')), 1)
+        self._write('mounts', "rootfs / rootfs rw 0 0\n")
+        self.assertEqual(len(self.proc.mounts_by_dev('/dev/sdb')), 1)
+        self.proc.invalidate()
+        self.assertEqual(len(self.proc.mounts_by_dev('/dev/sdb')), 0)
+
+    def test_glob(self):
+        """path patterns are expanded like glob does"""
+        self._write('fs/lustre/obdfilter/proc-OST0001/.hidden', "")
+        topdir = os.path.join(self.root, 'fs/lustre')
+        for pattern in ('*/proc-OST*/mntdev', 'obdfilter/*/*',
+                        'obdfilter/*/.*', 'o[bs]*/proc-OST000?',
+                        'lov/../osc/*/state', 'osc//*', 'foo/*',
+                        'obdfilter/proc-OST0000/mntdev/foo'):
+            pattern = os.path.join(topdir, pattern)
+            self.assertEqual(sorted(self.proc.glob(pattern)),
+                             sorted(glob.glob(pattern)), pattern)
+
+    def test_listdir_cache(self):
+        """directories are listed once until invalidate() is called"""
+        pattern = os.path.join(self.root, 'fs/lustre/obdfilter/*/foo')
+        self.assertEqual(self.proc.glob(pattern), [])
+        self._write('fs/lustre/obdfilter/proc-OST0000/foo', "")
+        self.assertEqual(self.proc.glob(pattern), [])
+        self.assertEqual(self.proc.obd_files('proc-OST0000', 'foo'), [])
+        self.proc.invalidate()
+        self.assertEqual(len(self.proc.glob(pattern)), 1)
+        self.assertEqual(len(self.proc.obd_files('proc-OST0000', 'foo')), 1)
+        self.assertEqual(self.proc.listdir(os.path.join(self.root, 'foo')), [])
+
+    def test_component_checks(self):
+        """target and client checks use the shared snapshot"""
+        shared = proc_snapshot()
+        oldroot = shared.root
+        shared.root = self.root
+        shared.invalidate()
+        try:
+            fs = FileSystem('proc')
+            srv = Server('proc-srv', ['proc-srv@tcp'])
+            ost = fs.new_target(srv, 'ost', 0, '/dev/sdb')
+            ost.lustre_check()
+            self.assertEqual(ost.state, MOUNTED)
+
+            client = fs.new_client(srv, '/proc/client')
+            client.lustre_check()
+            self.assertEqual(client.state, MOUNTED)
+            self.assertEqual(client.proc_states, {'FULL': 1})
+
+            # Loaded but not mounted there
+            client = fs.new_client(srv, '/proc/other')
+            self.assertRaises(ComponentError, client.lustre_check)
+
+            client = FileSystem('other').new_client(srv, '/proc/client')
+            client.lustre_check()
+            self.assertEqual(client.state, OFFLINE)
+        finally:
+            shared.root = oldroot
+            shared.invalidate()
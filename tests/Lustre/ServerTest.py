@@ -6,6 +6,7 @@
 """Unit test for Server"""
 
 import unittest
+import pickle
 import socket
 
 from Shine.Lustre.Server import Server, ServerGroup
@@ -69,6 +70,29 @@ class ServerTest(unittest.TestCase):
         self.assertEqual(Server.distant_servers(nodes_long), nodes)
 
 
+    def testGet(self):
+        """test shared instances"""
+        srv = Server.get('foo1', ['foo1@tcp'])
+        self.assertTrue(Server.get('foo1', ['foo1@tcp']) is srv)
+        self.assertTrue(Server.get('foo2', ['foo1@tcp']).nids is srv.nids)
+        self.assertFalse(Server.get('foo1', ['foo1@o2ib']) is srv)
+        self.assertEqual(type(srv.hostname), str)
+        self.assertRaises(AttributeError, setattr, srv, 'foo', 1)
+
+    def testNodeSetHostname(self):
+        """test server standing for several nodes"""
+        srv = Server(NodeSet('foo[1-4]'), [])
+        self.assertEqual(len(srv.hostname), 4)
+        self.assertFalse(srv.is_local())
+
+    def testPickle(self):
+        """test server pickling"""
+        srv = Server('foo1', ['foo1@tcp'])
+        for protocol in (0, 2):
+            other = pickle.loads(pickle.dumps(srv, protocol))
+            self.assertEqual(str(other), str(srv))
+
+
 class ServerGroupTest(unittest.TestCase):
 
     def testSimple(self):
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# Shine.SshPool test suite
+# Copyright (C) 2014 CEA
+
+"""Unit test for SshPool"""
+
+import os
+import shutil
+import unittest
+
+import Utils
+from ClusterShell.Task import task_self
+
+from Shine.SshPool import SshPool
+
+
+class SshPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        # Fake ssh, which logs its arguments.
+        self.tmpdir = Utils.make_tempdir()
+        self.log = os.path.join(self.tmpdir, 'ssh.log')
+        self.ssh = os.path.join(self.tmpdir, 'ssh')
+        fobj = open(self.ssh, 'w')
+        fobj.write('#!/bin/sh\necho "$@" >> %s\n' % self.log)
+        fobj.close()
+        os.chmod(self.ssh, 0755)
+
+        self.task = task_self()
+        self._ssh_path = self.task.info('ssh_path')
+        self.task.set_info('ssh_path', self.ssh)
+
+    def tearDown(self):
+        self.task.set_info('ssh_path', self._ssh_path)
+        shutil.rmtree(self.tmpdir)
+
+    def _calls(self):
+        """Return the fake ssh command lines."""
+        fobj = open(self.log)
+        try:
+            return sorted(fobj.read().splitlines())
+        finally:
+            fobj.close()
+
+    def test_pool(self):
+        """ssh commands use master connections, stopped at close"""
+        options = self.task.info('ssh_options')
+        pool = SshPool(self.task)
+        pool.enable()
+        try:
+            self.task.shell('true', nodes='node[1-2]')
+            self.task.resume()
+            ctlpath = '-oControlPath=%s/%%h' % pool.path
+            for call in self._calls():
+                self.assertTrue('-oControlMaster=auto' in call.split(), call)
+                self.assertTrue(ctlpath in call.split(), call)
+
+            # Control sockets created by ssh
+            for node in ('node1', 'node2'):
+                open(os.path.join(pool.path, node), 'w').close()
+            path = pool.path
+        finally:
+            pool.close()
+
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.task.info('ssh_options'), options)
+        self.assertEqual([call for call in self._calls() if '-O' in call],
+                         ['-S %s/node1 -O exit node1' % path,
+                          '-S %s/node2 -O exit node2' % path])